@@ -15,8 +15,31 @@ class Config:
     # Mock server configuration
     MOCK_SERVER_HOST = os.getenv('MOCK_SERVER_HOST', 'localhost')
     MOCK_SERVER_PORT = int(os.getenv('MOCK_SERVER_PORT', '8888'))
+    MOCK_JOURNAL_CAPACITY = int(os.getenv('MOCK_JOURNAL_CAPACITY', '10000'))  # Requests kept in memory
+    MOCK_JOURNAL_MAX_BODY = int(os.getenv('MOCK_JOURNAL_MAX_BODY', '4096'))  # Bytes of each body kept
+    MOCK_JOURNAL_SAMPLE_RATE = float(os.getenv('MOCK_JOURNAL_SAMPLE_RATE', '1.0'))
+    MOCK_JOURNAL_SPILL_PATH = os.getenv('MOCK_JOURNAL_SPILL_PATH', '')  # JSONL file for full capture
+    MOCK_MODE = os.getenv('MOCK_MODE', '').lower()  # 'record' proxies unmatched requests upstream, 'replay' serves the archive
+    MOCK_ARCHIVE_PATH = os.getenv('MOCK_ARCHIVE_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "test_data", ENV.lower(), "mock_recordings.json.gz"))
+    # Volatile parts of a request left out when matching recordings (comma separated)
+    MOCK_REPLAY_IGNORE_QUERY = [name for name in os.getenv('MOCK_REPLAY_IGNORE_QUERY', '_,cacheBuster').split(',') if name]
+    MOCK_REPLAY_IGNORE_FIELDS = [name for name in os.getenv('MOCK_REPLAY_IGNORE_FIELDS', 'timestamp,requestId').split(',') if name]
+    MOCK_REPLAY_MATCH_HEADERS = [name for name in os.getenv('MOCK_REPLAY_MATCH_HEADERS', '').split(',') if name]
+    MOCK_REPLAY_STRICT = os.getenv('MOCK_REPLAY_STRICT', 'True').lower() == 'true'  # False falls back to method + path
+    MOCK_NETWORK_PROFILE = os.getenv('MOCK_NETWORK_PROFILE', '')  # Name from mocks.profiles.PROFILES, e.g. 3g, flaky
+    MOCK_NETWORK_SEED = int(os.getenv('MOCK_NETWORK_SEED', '0'))  # Same seed, same latencies and faults
+    MOCK_CLUSTER_WORKERS = int(os.getenv('MOCK_CLUSTER_WORKERS', str(os.cpu_count() or 2)))  # Processes in a MockServerCluster
     BASELINE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "baseline_images", ENV.lower())
     DIFF_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "diff_images", ENV.lower())
+    BASELINE_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "baseline_images")
+    VISUAL_POOL_WORKERS = int(os.getenv('VISUAL_POOL_WORKERS', '0'))  # 0 compares inline, N uses a process pool per worker
+    VISUAL_REPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports", "visual")
+    # Skip element screenshots whose DOM/style fingerprint matches the one stored with the baseline
+    VISUAL_FINGERPRINT = os.getenv('VISUAL_FINGERPRINT', 'False').lower() == 'true'
+    VISUAL_FINGERPRINT_MAX_SKIPS = int(os.getenv('VISUAL_FINGERPRINT_MAX_SKIPS', '20'))  # Force a capture after N skips
+    VISUAL_FINGERPRINT_MAX_AGE_HOURS = float(os.getenv('VISUAL_FINGERPRINT_MAX_AGE_HOURS', '24'))
+    VISUAL_FINGERPRINT_PATH = os.path.join(VISUAL_REPORT_DIR, "fingerprints.json")  # Gitignored, unlike the baseline index
 
     # Browser configuration
     BROWSER_TYPE = os.getenv('BROWSER_TYPE', 'chromium')  # chromium, firefox, or webkit
@@ -63,6 +86,44 @@ class Config:
     # API configuration
     API_BASE_URL = os.getenv('API_BASE_URL', BASE_URL)
     API_TIMEOUT = int(os.getenv('API_TIMEOUT', '10000'))  # 10 seconds
+    API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', '100'))  # Open connections of an AsyncAPI client
+    API_POOL_PER_HOST = int(os.getenv('API_POOL_PER_HOST', '50'))  # 0 means no per-host limit
+    API_KEEPALIVE_TIMEOUT = float(os.getenv('API_KEEPALIVE_TIMEOUT', '30'))  # Seconds an idle connection is kept
+    API_BATCH_CONCURRENCY = int(os.getenv('API_BATCH_CONCURRENCY', '20'))  # Requests in flight in AsyncAPI.gather
+    API_LOG_LEVEL = os.getenv('API_LOG_LEVEL', 'DEBUG')  # Level of per-call log entries; formatted only if enabled
+    API_LOG_MAX_BODY = int(os.getenv('API_LOG_MAX_BODY', '1024'))  # Bytes of each body logged
+    API_LOG_SAMPLE_RATE = float(os.getenv('API_LOG_SAMPLE_RATE', '1.0'))  # Fraction of calls logged
+    API_LOG_KEEP_ON_FAILURE = int(os.getenv('API_LOG_KEEP_ON_FAILURE', '20'))  # Calls attached in full to failed tests
+    API_LOG_REDACT_KEYS = [key for key in os.getenv(
+        'API_LOG_REDACT_KEYS', 'authorization,cookie,password,passwd,secret,token,api_key,apikey').split(',') if key]
+    API_CACHE_ENABLED = os.getenv('API_CACHE_ENABLED', 'False').lower() == 'true'  # HTTP cache for API GETs (opt-in)
+    API_CACHE_MAX_ENTRIES = int(os.getenv('API_CACHE_MAX_ENTRIES', '256'))  # Responses kept in the in-memory LRU
+    API_CACHE_MAX_ENTRY_KB = int(os.getenv('API_CACHE_MAX_ENTRY_KB', '1024'))  # Larger responses are not cached
+    API_CACHE_DIR = os.getenv('API_CACHE_DIR', '')  # Disk tier shared by xdist workers; empty keeps the cache in memory
+    API_CACHE_DEFAULT_TTL = float(os.getenv('API_CACHE_DEFAULT_TTL', '0'))  # Seconds fresh without Cache-Control/Expires
+    API_CACHE_STATS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports", "api_cache")
+    API_AUTH_ROLE = os.getenv('API_AUTH_ROLE', '')  # Role API clients log in as through the shared token cache
+    API_LOGIN_ENDPOINT = os.getenv('API_LOGIN_ENDPOINT', '/api/login')
+    API_TOKEN_CACHE_DIR = os.getenv('API_TOKEN_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), ".auth_cache"))
+    API_TOKEN_REFRESH_MARGIN = float(os.getenv('API_TOKEN_REFRESH_MARGIN', '60'))  # Seconds before expiry a token is replaced
+    API_TOKEN_DEFAULT_TTL = float(os.getenv('API_TOKEN_DEFAULT_TTL', '900'))  # Seconds, when the login response has no expiry
+    API_TIMING_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports", "api_timings")
+    # Latency budgets checked at the end of the run, e.g. 'p95 GET /api/home < 300ms; p99 GET /api/claims < 1000ms'
+    API_LATENCY_BUDGETS = [spec.strip() for spec in os.getenv('API_LATENCY_BUDGETS', '').split(';') if spec.strip()]
+    API_SCHEMA_VALIDATION = os.getenv('API_SCHEMA_VALIDATION', 'warn').lower()  # off, warn (log violations) or strict (fail the call)
+    API_SCHEMA_DIR = os.getenv('API_SCHEMA_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_data", "schemas"))
+    API_SCHEMA_MAX_ERRORS = int(os.getenv('API_SCHEMA_MAX_ERRORS', '10'))  # Violations listed per response
+    API_STREAM_CHUNK_KB = int(os.getenv('API_STREAM_CHUNK_KB', '64'))  # Read size of API.stream(); bounds its memory with the item size
+    API_STREAM_MAX_ITEM_KB = int(os.getenv('API_STREAM_MAX_ITEM_KB', '1024'))  # A larger single item fails the stream
+    LOAD_MAX_IN_FLIGHT = int(os.getenv('LOAD_MAX_IN_FLIGHT', '1000'))  # Open-loop iterations running at once, more are dropped
+    LOAD_REPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports", "load")
+    TEST_DATA_RUN_ID = os.getenv('TEST_DATA_RUN_ID', '')  # Shared by runs that must not collide; default is the xdist run id
+    TEST_DATA_ID_RUN_SLOTS = int(os.getenv('TEST_DATA_ID_RUN_SLOTS', '8'))  # Concurrent runs with disjoint ID ranges
+    DATA_POOL_DIR = os.getenv('DATA_POOL_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), ".data_pools"))
+    DATA_POOL_LEASE_TTL = float(os.getenv('DATA_POOL_LEASE_TTL', '600'))  # Seconds before an unreturned lease is retired
+    DATA_POOL_LOW_WATERMARK = int(os.getenv('DATA_POOL_LOW_WATERMARK', '20'))  # Free records below which a kind is refilled
+    DATA_POOL_REFILL_BATCH = int(os.getenv('DATA_POOL_REFILL_BATCH', '100'))  # Records generated per refill
+    DATA_POOL_WAIT_TIMEOUT = float(os.getenv('DATA_POOL_WAIT_TIMEOUT', '60'))  # Seconds a lease waits on an empty pool
 
     # Report configuration
     REPORT_PORTAL = {
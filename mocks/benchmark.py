@@ -0,0 +1,108 @@
+"""
+Throughput benchmark for the mock server
+
+Starts a MockServerCluster, drives it from several client processes with a fixed number of
+concurrent keep-alive connections each, and reports requests per second and latency percentiles.
+
+Usage:
+    python -m mocks.benchmark [--workers N] [--clients N] [--concurrency N] [--duration SECONDS]
+
+Examples:
+    # Compare a single server process with four
+    python -m mocks.benchmark --workers 1
+    python -m mocks.benchmark --workers 4 --clients 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+from typing import Any, Dict, List
+
+import aiohttp
+
+from mocks.cluster import MockServerCluster
+from utils.api_timing import percentile
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+BENCHMARK_BODY = {'claims': [{'id': index, 'status': 'open', 'amount': 125.5} for index in range(20)]}
+
+
+def run_benchmark(workers: int = 2, clients: int = 2, concurrency: int = 32, duration: float = 5.0,
+                  path: str = '/api/claims/{id}') -> Dict[str, Any]:
+    """Run the benchmark and return requests, errors, rps and latency percentiles in milliseconds"""
+    with MockServerCluster(workers=workers) as cluster:
+        cluster.add_mock('GET', path, BENCHMARK_BODY)
+        url = cluster.url + path.replace('{id}', '42')
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(clients) as pool:
+            started = time.perf_counter()
+            results = pool.starmap(_client_main, [(url, concurrency, duration)] * clients)
+            elapsed = time.perf_counter() - started
+        served = cluster.count_requests()
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    errors = sum(client_errors for _, client_errors in results)
+    return {
+        'workers': workers,
+        'clients': clients,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'served': served,
+        'errors': errors,
+        'rps': len(latencies) / min(elapsed, duration) if latencies else 0.0,
+        'latency_ms': {f"p{p:g}": percentile(latencies, p) * 1000 for p in PERCENTILES},
+    }
+
+
+def _client_main(url: str, concurrency: int, duration: float):
+    return asyncio.run(_drive(url, concurrency, duration))
+
+
+async def _drive(url: str, concurrency: int, duration: float):
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def connection(session: aiohttp.ClientSession) -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(connection(session) for _ in range(concurrency)))
+    return latencies, errors
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure mock server throughput and latency")
+    parser.add_argument("--workers", type=int, default=2, help="Mock server processes (default: 2)")
+    parser.add_argument("--clients", type=int, default=2, help="Load generating processes (default: 2)")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Concurrent connections per client process (default: 32)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run (default: 5)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    result = run_benchmark(args.workers, args.clients, args.concurrency, args.duration)
+    print(f"Mock server: {result['workers']} worker(s), {result['clients']} client(s) x "
+          f"{result['concurrency']} connections")
+    print(f"  requests: {result['requests']}  errors: {result['errors']}  rps: {result['rps']:.0f}")
+    print("  latency:  " + "  ".join(f"{name}={value:.2f}ms" for name, value in result['latency_ms'].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Multi-process mock server for load scenarios
+
+MockServerCluster starts N worker processes that each run a MockServer on the same port, using
+SO_REUSEPORT so the kernel spreads incoming connections across them. The parent process owns the
+mock definitions: every add/remove writes a new read-only snapshot file which the workers poll and
+load, so runtime changes reach all workers (add_mock waits until they have). Each worker reports
+its journal counters in a status file next to the snapshot, and count_requests() sums them.
+
+Only counts are aggregated; full request details stay in each worker's own journal. Requires a
+platform with SO_REUSEPORT (Linux, macOS).
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import shutil
+import socket
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.config import Config
+from mocks.journal import RequestJournal
+from mocks.mock_server import MockServer
+from utils.file_lock import atomic_write
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.pickle"
+
+
+class MockServerCluster:
+    def __init__(self, host: str = 'localhost', port: int = 0, workers: Optional[int] = None,
+                 poll_interval: float = 0.05, start_timeout: float = 15.0):
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError("MockServerCluster requires SO_REUSEPORT, which this platform does not support")
+        self.host = host
+        self.port = port
+        self.workers = workers or Config.MOCK_CLUSTER_WORKERS
+        self.poll_interval = poll_interval
+        self.start_timeout = start_timeout
+        # Never started: validates mock definitions and assigns the ids every worker reuses
+        self.definitions = MockServer(host, port)
+        self._specs: Dict[str, Tuple[str, tuple, Dict[str, Any]]] = {}
+        self._version = 0
+        self._requests_epoch = 0
+        self._state_dir: Optional[str] = None
+        self._processes: List[multiprocessing.Process] = []
+        self._stop_event = None
+        self._socket: Optional[socket.socket] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def is_running(self) -> bool:
+        return any(process.is_alive() for process in self._processes)
+
+    def start(self) -> 'MockServerCluster':
+        """Reserve the port, start the workers and wait until all of them serve the current mocks"""
+        self._state_dir = tempfile.mkdtemp(prefix="mock-cluster-")
+        # Bound but never listening: keeps the port reserved without receiving connections itself
+        self._socket = _reuseport_socket(self.host, self.port)
+        self.port = self._socket.getsockname()[1]
+        self._publish()
+
+        context = multiprocessing.get_context("spawn")
+        self._stop_event = context.Event()
+        for index in range(self.workers):
+            process = context.Process(
+                target=_worker_main, name=f"mock-cluster-{index}", daemon=True,
+                args=(index, self.host, self.port, self._state_dir, self.poll_interval, self._stop_event)
+            )
+            process.start()
+            self._processes.append(process)
+        self.wait_synced(self.start_timeout)
+        logger.info("Mock server cluster with %d workers started at %s", self.workers, self.url)
+        return self
+
+    def stop(self) -> None:
+        """Stop all workers and remove the shared state"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join(5)
+        self._processes = []
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self._state_dir:
+            shutil.rmtree(self._state_dir, ignore_errors=True)
+            self._state_dir = None
+
+    def __enter__(self) -> 'MockServerCluster':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def add_mock(self, method: str, path: str, response: Any, wait: bool = True, **kwargs: Any) -> str:
+        """Add a mock on every worker (see MockServer.add_mock); waits until all workers serve it"""
+        mock_id = self.definitions.add_mock(method, path, response, **kwargs)
+        self._keep(mock_id, 'add_mock', (method, path, response), kwargs)
+        self._changed(wait)
+        return mock_id
+
+    def add_file_mock(self, method: str, path: str, file_path: str, wait: bool = True, **kwargs: Any) -> str:
+        mock_id = self.definitions.add_file_mock(method, path, file_path, **kwargs)
+        self._keep(mock_id, 'add_file_mock', (method, path, file_path), kwargs)
+        self._changed(wait)
+        return mock_id
+
+    def add_generator_mock(self, method: str, path: str, items: Any, wait: bool = True, **kwargs: Any) -> str:
+        """items must be picklable, i.e. a module-level function, to reach the worker processes"""
+        mock_id = self.definitions.add_generator_mock(method, path, items, **kwargs)
+        self._keep(mock_id, 'add_generator_mock', (method, path, items), kwargs)
+        self._changed(wait)
+        return mock_id
+
+    def remove_mock(self, mock_id: str, wait: bool = True) -> bool:
+        removed = self.definitions.remove_mock(mock_id)
+        if removed:
+            self._specs.pop(mock_id, None)
+            self._changed(wait)
+        return removed
+
+    def clear_mocks(self, wait: bool = True) -> None:
+        self.definitions.clear_mocks()
+        self._specs.clear()
+        self._changed(wait)
+
+    def set_profile(self, profile: Any, seed: Optional[int] = None, wait: bool = True) -> None:
+        """Apply a network profile on every worker (see MockServer.set_profile)"""
+        self.definitions.set_profile(profile, seed)
+        self._changed(wait)
+
+    def clear_requests(self, wait: bool = True) -> None:
+        """Reset every worker's journal"""
+        self._requests_epoch += 1
+        self._changed(wait)
+
+    def count_requests(self, method: Optional[str] = None, path: Optional[str] = None,
+                       mock_id: Optional[str] = None, timeout: float = 5.0) -> int:
+        """
+        Requests counted by all workers. Waits for a status report from every worker written after
+        this call, so every request that completed before it is included.
+        """
+        merged = RequestJournal(capacity=1)
+        for status in self._fresh_statuses(time.time(), timeout):
+            merged.merge_counts(status['journal'])
+        return merged.count(method, path, mock_id)
+
+    def wait_synced(self, timeout: float = 5.0) -> None:
+        """Block until every worker has loaded the latest snapshot"""
+        deadline = time.monotonic() + timeout
+        while True:
+            statuses = self._statuses()
+            if len(statuses) == self.workers and all(status['version'] >= self._version for status in statuses):
+                return
+            self._check_workers()
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Mock cluster workers did not load snapshot {self._version} within {timeout}s")
+            time.sleep(self.poll_interval / 2)
+
+    def _keep(self, mock_id: str, kind: str, args: tuple, kwargs: Dict[str, Any]) -> None:
+        """Store a mock's definition, dropping any it replaced by taking over its route"""
+        for replaced in [spec_id for spec_id in self._specs if self.definitions.router.get(spec_id) is None]:
+            del self._specs[replaced]
+        self._specs[mock_id] = (kind, args, kwargs)
+
+    def _changed(self, wait: bool) -> None:
+        self._version += 1
+        if self._state_dir:
+            self._publish()
+            if wait:
+                self.wait_synced()
+
+    def _publish(self) -> None:
+        snapshot = {
+            'version': self._version,
+            'requests_epoch': self._requests_epoch,
+            'profile': self.definitions.profile,
+            'mocks': [(mock_id, *spec) for mock_id, spec in self._specs.items()],
+        }
+        atomic_write(os.path.join(self._state_dir, SNAPSHOT_FILE), pickle.dumps(snapshot))
+
+    def _statuses(self) -> List[Dict[str, Any]]:
+        statuses = []
+        for index in range(self.workers):
+            try:
+                with open(_status_path(self._state_dir, index), 'r') as f:
+                    statuses.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return statuses
+
+    def _fresh_statuses(self, since: float, timeout: float) -> List[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        while True:
+            statuses = self._statuses()
+            if len(statuses) == self.workers and all(status['time'] > since for status in statuses):
+                return statuses
+            self._check_workers()
+            if time.monotonic() >= deadline:
+                raise TimeoutError("Mock cluster workers did not report their request counts in time")
+            time.sleep(self.poll_interval / 2)
+
+    def _check_workers(self) -> None:
+        dead = [process.name for process in self._processes if not process.is_alive()]
+        if dead:
+            raise RuntimeError(f"Mock cluster workers exited: {', '.join(dead)}")
+
+
+def _reuseport_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+def _status_path(state_dir: str, index: int) -> str:
+    return os.path.join(state_dir, f"worker-{index}.json")
+
+
+def _worker_main(index: int, host: str, port: int, state_dir: str, poll_interval: float, stop_event: Any) -> None:
+    """Entry point of a worker process"""
+    asyncio.run(_serve(index, host, port, state_dir, poll_interval, stop_event))
+
+
+async def _serve(index: int, host: str, port: int, state_dir: str, poll_interval: float, stop_event: Any) -> None:
+    from aiohttp import web
+
+    server = MockServer(host, port)
+    sock = _reuseport_socket(host, port)
+    sock.listen(1024)
+    runner = web.AppRunner(server.app, access_log=None)
+    await runner.setup()
+    await web.SockSite(runner, sock).start()
+
+    snapshot_path = os.path.join(state_dir, SNAPSHOT_FILE)
+    loaded_mtime, version, epoch = None, -1, 0
+    try:
+        while not stop_event.is_set():
+            stat = os.stat(snapshot_path)
+            mtime = (stat.st_mtime_ns, stat.st_ino)
+            if mtime != loaded_mtime:
+                with open(snapshot_path, 'rb') as f:
+                    snapshot = pickle.load(f)
+                loaded_mtime = mtime
+                if snapshot['version'] != version:
+                    _apply_snapshot(server, snapshot)
+                    version = snapshot['version']
+                if snapshot['requests_epoch'] != epoch:
+                    server.clear_requests()
+                    epoch = snapshot['requests_epoch']
+            status = {'version': version, 'time': time.time(), 'pid': os.getpid(),
+                      'journal': server.journal.export_counts()}
+            atomic_write(_status_path(state_dir, index), json.dumps(status).encode())
+            await asyncio.sleep(poll_interval)
+    finally:
+        await runner.cleanup()
+        server.journal.close()
+
+
+def _apply_snapshot(server: MockServer, snapshot: Dict[str, Any]) -> None:
+    """Rebuild the worker's routes from the parent's definitions, keeping the parent's mock ids"""
+    server.router.clear()
+    server.profile = snapshot['profile']
+    for mock_id, kind, args, kwargs in snapshot['mocks']:
+        getattr(server, kind)(*args, mock_id=mock_id, **kwargs)
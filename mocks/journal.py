@@ -0,0 +1,144 @@
+"""
+Bounded request journal for the mock server
+
+Keeps the most recent requests in a ring buffer with truncated bodies, and exact per method / path /
+mock id counters that survive eviction and sampling, so assertions such as
+"POST /api/login was called twice" are O(1) however long the server runs.
+With a spill path, every request is additionally appended untruncated to a JSON lines file.
+"""
+import json
+import random
+import threading
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Hashable, Iterator, List, Optional
+
+
+class RequestJournal:
+    def __init__(self, capacity: int = 10000, max_body_bytes: int = 4096, sample_rate: float = 1.0,
+                 spill_path: Optional[str] = None, seed: Optional[int] = None):
+        if capacity <= 0:
+            raise ValueError("Journal capacity must be positive")
+        self.capacity = capacity
+        self.max_body_bytes = max_body_bytes
+        self.sample_rate = sample_rate
+        self.spill_path = spill_path
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._spill_file = open(spill_path, "a") if spill_path else None
+        self._entries: Deque[Dict[str, Any]] = deque()
+        self._indexes: Dict[Hashable, Deque[Dict[str, Any]]] = {}
+        self._counts: Counter = Counter()
+        self.total = 0
+
+    def record(self, entry: Dict[str, Any]) -> bool:
+        """Count a request and keep it unless it is sampled out; returns True if it was kept"""
+        method, path, mock_id = entry.get('method'), entry.get('path'), entry.get('mock_id')
+        keys = _index_keys(method, path, mock_id)
+        with self._lock:
+            self.total += 1
+            self._counts.update(keys)
+            if self._spill_file:
+                self._spill_file.write(json.dumps(entry, default=str) + "\n")
+                self._spill_file.flush()
+            if self.sample_rate < 1.0 and self._random.random() >= self.sample_rate:
+                return False
+
+            kept = self._truncate(entry)
+            kept['_keys'] = keys
+            if len(self._entries) >= self.capacity:
+                self._evict()
+            self._entries.append(kept)
+            for key in keys:
+                self._indexes.setdefault(key, deque()).append(kept)
+            return True
+
+    def count(self, method: Optional[str] = None, path: Optional[str] = None,
+              mock_id: Optional[str] = None) -> int:
+        """
+        Exact number of requests recorded for the filter, including evicted and sampled-out ones.
+        A mock id already identifies one route, so it takes precedence over method and path.
+        """
+        if mock_id is not None:
+            return self._counts[('mock', mock_id)]
+        if method is None and path is None:
+            return self.total
+        return self._counts[_key(method, path)]
+
+    def find(self, method: Optional[str] = None, path: Optional[str] = None,
+             mock_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Retained requests matching the filter, oldest first"""
+        with self._lock:
+            if mock_id is not None:
+                candidates = self._indexes.get(('mock', mock_id), ())
+                return [_public(entry) for entry in candidates
+                        if (method is None or entry['method'] == method) and (path is None or entry['path'] == path)]
+            if method is None and path is None:
+                return [_public(entry) for entry in self._entries]
+            return [_public(entry) for entry in self._indexes.get(_key(method, path), ())]
+
+    def export_counts(self) -> Dict[str, Any]:
+        """Counters in a JSON-friendly form, to be merged by another process with merge_counts()"""
+        with self._lock:
+            return {'total': self.total, 'counts': [[list(key), count] for key, count in self._counts.items()]}
+
+    def merge_counts(self, exported: Dict[str, Any]) -> None:
+        """Add counters exported by another journal, e.g. one per server process"""
+        with self._lock:
+            self.total += exported['total']
+            for key, count in exported['counts']:
+                self._counts[tuple(key)] += count
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._indexes.clear()
+            self._counts.clear()
+            self.total = 0
+
+    def close(self) -> None:
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.find())
+
+    def _evict(self) -> None:
+        """Drop the oldest entry; it is also the oldest entry of each of its indexes"""
+        oldest = self._entries.popleft()
+        for key in oldest['_keys']:
+            index = self._indexes[key]
+            index.popleft()
+            if not index:
+                del self._indexes[key]
+
+    def _truncate(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        kept = dict(entry)
+        body = kept.get('body')
+        if isinstance(body, (str, bytes)) and len(body) > self.max_body_bytes:
+            kept['body'] = body[:self.max_body_bytes]
+            kept['body_size'] = len(body)
+            kept['body_truncated'] = True
+        return kept
+
+
+def _key(method: Optional[str], path: Optional[str]) -> Hashable:
+    if path is None:
+        return ('method', method)
+    if method is None:
+        return ('path', path)
+    return ('route', method, path)
+
+
+def _index_keys(method: Optional[str], path: Optional[str], mock_id: Optional[str]) -> List[Hashable]:
+    keys = [_key(method, None), _key(None, path), _key(method, path)]
+    if mock_id is not None:
+        keys.append(('mock', mock_id))
+    return keys
+
+
+def _public(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: value for name, value in entry.items() if name != '_keys'}
@@ -1,132 +1,616 @@
 try:
+    import aiohttp
     from aiohttp import web
 except ImportError:
     import warnings
     warnings.warn("aiohttp is not installed properly, mock server functionality will be limited")
     raise
 
+import os
 import json
-from typing import Dict, Any, Optional, Union
+import hashlib
+import mimetypes
+from typing import Callable, Dict, Any, Iterable, List, Mapping, Optional, Tuple, Union
+import atexit
 import logging
 import asyncio
+import threading
 from datetime import datetime
+from config.config import Config
+from mocks.journal import RequestJournal
+from mocks.profiles import ERROR, RESET, TIMEOUT, NetworkProfile, Plan, get_profile
+from mocks.recording import Exchange, Recorder, ReplayMatcher, TrafficArchive
+from mocks.responses import IDENTITY, prepare_response
+from mocks.router import Router, RouteMatch
+from mocks.streaming import (CHUNK_SIZE, ItemFactory, MappedFile, RangeNotSatisfiable, iter_json_array, paginate,
+                             parse_range)
 
 logger = logging.getLogger(__name__)
 
+NOT_FOUND = prepare_response({'error': 'No mock found for this request'}, 404, {'Content-Type': 'application/json'})
+
 class MockServer:
-    def __init__(self, host: str = 'localhost', port: int = 8000):
+    def __init__(self, host: str = 'localhost', port: int = 8000, journal: Optional[RequestJournal] = None):
         self.host = host
         self.port = port
         self.app = web.Application()
-        self.mocked_responses: Dict[str, Dict[str, Any]] = {}
-        self.request_log: list = []
+        self.router = Router()
+        self.journal = journal or RequestJournal(
+            capacity=Config.MOCK_JOURNAL_CAPACITY,
+            max_body_bytes=Config.MOCK_JOURNAL_MAX_BODY,
+            sample_rate=Config.MOCK_JOURNAL_SAMPLE_RATE,
+            spill_path=Config.MOCK_JOURNAL_SPILL_PATH or None
+        )
+        self.recorder: Optional[Recorder] = None
+        self.replay: Optional[TrafficArchive] = None
+        self.replay_strict = True
+        self.profile: Optional[NetworkProfile] = None
+        if Config.MOCK_NETWORK_PROFILE:
+            self.set_profile(Config.MOCK_NETWORK_PROFILE)
         self._setup_routes()
         
+    @property
+    def mocked_responses(self) -> Dict[str, Dict[str, Any]]:
+        """Registered mock definitions by mock id"""
+        return {route.id: route.payload for route in self.router.routes}
+
     def _setup_routes(self) -> None:
         """Set up the mock server routes"""
         self.app.router.add_route('*', '/{tail:.*}', self._handle_request)
         
     async def _handle_request(self, request: web.Request) -> web.Response:
         """Handle incoming requests and return mocked responses"""
-        # Log request
-        request_time = datetime.now()
-        body = await request.text()
-        request_data = {
-            'method': request.method,
-            'path': request.path,
-            'headers': dict(request.headers),
-            'query': dict(request.query),
-            'body': body,
-            'timestamp': request_time.isoformat()
-        }
-        self.request_log.append(request_data)
-        
-        # Find matching mock
-        mock_key = f"{request.method}:{request.path}"
-        if mock_key in self.mocked_responses:
-            mock = self.mocked_responses[mock_key]
+        if self.recorder or self.replay:
+            # Forwarding and matching recordings need the whole body
+            raw_body = await request.read()
+            body = raw_body.decode(request.charset or 'utf-8', errors='replace')
+            body_info = None
+        else:
+            body, body_info = await self._consume_body(request)
+        match, plan = self.resolve(request.method, request.path, request.query, request.headers, body, body_info)
+
+        if plan:
+            await asyncio.sleep(plan.delay)
+            fault = await self._inject_fault(request, plan)
+            if fault is not None:
+                return fault
+
+        if match:
+            mock = match.route.payload
             await asyncio.sleep(mock.get('delay', 0))
+
+            if 'mapped' in mock:
+                return await self._stream_mapped(request, mock, plan)
+            if 'items' in mock:
+                return await self._stream_items(request, match, plan)
+            if 'file' in mock:
+                if plan and plan.bytes_per_second:
+                    return await self._stream_file(request, mock, plan.bytes_per_second)
+                # Files are streamed by aiohttp with sendfile (and its own ETag/Range handling)
+                return web.FileResponse(mock['file'], status=mock['status'], headers=mock['headers'])
+
+            prepared = mock['prepared']
+            if prepared.is_not_modified(request.headers.get('If-None-Match')):
+                return web.Response(status=304, headers=prepared.not_modified_headers)
+            body, headers = prepared.negotiate(request.headers.get('Accept-Encoding'))
+            return await self._respond(request, prepared.status, body, headers, plan)
             
-            content_type = mock.get('headers', {}).get('Content-Type', 'application/json')
-            body = mock.get('body', {})
-            
-            if 'html' in body and content_type == 'text/html':
-                return web.Response(
-                    status=mock.get('status', 200),
-                    text=body['html'],
-                    headers=mock.get('headers', {'Content-Type': 'text/html'})
-                )
-            elif content_type == 'application/json':
-                return web.Response(
-                    status=mock.get('status', 200),
-                    body=json.dumps(body),
-                    headers=mock.get('headers', {'Content-Type': 'application/json'})
-                )
-            else:
-                return web.Response(
-                    status=mock.get('status', 200),
-                    body=str(body),
-                    headers=mock.get('headers', {'Content-Type': 'text/plain'})
-                )
-            
+        # Record or replay real backend traffic for requests no mock covers
+        if self.recorder:
+            try:
+                exchange = await self.recorder.forward(request.method, request.path, list(request.query.items()),
+                                                       request.headers, raw_body)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error("Recording upstream failed for %s %s: %s", request.method, request.path, e)
+                return web.json_response({'error': f'Upstream request failed: {e}'}, status=502)
+            return await self._respond(request, exchange.status, exchange.response_body, exchange.response_headers, plan)
+        if self.replay:
+            exchange = self.lookup_recording(request.method, request.path, list(request.query.items()),
+                                             request.headers, body)
+            if exchange:
+                return await self._respond(request, exchange.status, exchange.response_body,
+                                           exchange.response_headers, plan)
+
         # No mock found
         logger.warning("No mock found for request: %s %s", request.method, request.path)
-        return web.Response(
-            status=404,
-            body=json.dumps({'error': 'No mock found for this request'}),
-            headers={'Content-Type': 'application/json'}
-        )
+        return web.Response(status=404, body=NOT_FOUND.body, headers=NOT_FOUND.headers[IDENTITY])
+        
+    async def _consume_body(self, request: web.Request) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Read the request body in chunks, keeping only what the journal stores, so large uploads are
+        never buffered. The full size and a SHA-256 digest are recorded for upload assertions.
+        """
+        if not request.body_exists:
+            return '', None
+        keep = self.journal.max_body_bytes
+        head = bytearray()
+        digest = hashlib.sha256()
+        size = 0
+        async for chunk in request.content.iter_chunked(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+            if len(head) < keep:
+                head.extend(chunk[:keep - len(head)])
+        body = bytes(head).decode(request.charset or 'utf-8', errors='replace')
+        body_info = {'body_size': size, 'body_sha256': digest.hexdigest()}
+        if size > len(head):
+            body_info['body_truncated'] = True
+        return body, body_info
+
+    def resolve(self, method: str, path: str, query: Mapping[str, str], headers: Mapping[str, str],
+                body: str, body_info: Optional[Dict[str, Any]] = None) -> Tuple[Optional[RouteMatch], Optional[Plan]]:
+        """
+        Match a request against the mocks, record it in the journal and draw its network plan.
+        Shared by the HTTP handler and the in-process Playwright bridge (mocks.playwright_bridge).
+        """
+        request_data = {
+            'method': method,
+            'path': path,
+            'headers': dict(headers),
+            'query': dict(query),
+            'body': body,
+            'timestamp': datetime.now().isoformat()
+        }
+        if body_info:
+            request_data.update(body_info)
         
+        # Find matching mock
+        match = self.router.match(method, path, query, headers)
+        if match:
+            request_data['mock_id'] = match.route.id
+            request_data['params'] = match.params
+        self.journal.record(request_data)
+
+        profile = (match.route.payload.get('profile') if match else None) or self.profile
+        plan = profile.plan(method, path) if profile else None
+        return match, plan
+
+    def lookup_recording(self, method: str, path: str, query: List[Tuple[str, str]], headers: Mapping[str, str],
+                         body: str) -> Optional[Exchange]:
+        """The next recorded exchange for a request in replay mode, otherwise None"""
+        if not self.replay:
+            return None
+        return self.replay.lookup(method, path, query, headers, body, strict=self.replay_strict)
+
+    async def _respond(self, request: web.Request, status: int, body: bytes, headers: Dict[str, str],
+                       plan: Optional[Plan]) -> web.StreamResponse:
+        """Send a response at full speed, or throttled to the profile's bandwidth"""
+        if not plan or not plan.bytes_per_second:
+            return web.Response(status=status, body=body, headers=headers)
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = len(body)
+        await response.prepare(request)
+        chunk_size = _throttle_chunk_size(plan.bytes_per_second)
+        for start in range(0, len(body), chunk_size):
+            chunk = body[start:start + chunk_size]
+            await response.write(chunk)
+            await asyncio.sleep(len(chunk) / plan.bytes_per_second)
+        await response.write_eof()
+        return response
+
+    async def _stream_file(self, request: web.Request, mock: Dict[str, Any], bytes_per_second: int) -> web.StreamResponse:
+        """Throttled file mocks are read chunk by chunk instead of sendfile'd"""
+        response = web.StreamResponse(status=mock['status'], headers=mock['headers'])
+        response.content_length = os.path.getsize(mock['file'])
+        await response.prepare(request)
+        chunk_size = _throttle_chunk_size(bytes_per_second)
+        with open(mock['file'], 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                await response.write(chunk)
+                await asyncio.sleep(len(chunk) / bytes_per_second)
+        await response.write_eof()
+        return response
+
+    async def _stream_mapped(self, request: web.Request, mock: Dict[str, Any],
+                             plan: Optional[Plan]) -> web.StreamResponse:
+        """Stream a memory-mapped file mock, honouring a single byte range"""
+        mapped: MappedFile = mock['mapped']
+        headers = {**mock['headers'], 'Accept-Ranges': 'bytes'}
+        try:
+            byte_range = parse_range(request.headers.get('Range'), mapped.size)
+        except RangeNotSatisfiable:
+            return web.Response(status=416, headers={'Content-Range': f'bytes */{mapped.size}'})
+
+        status, start, end = mock['status'], 0, mapped.size - 1
+        if byte_range:
+            status, (start, end) = 206, byte_range
+            headers['Content-Range'] = f'bytes {start}-{end}/{mapped.size}'
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = end - start + 1 if mapped.size else 0
+        await response.prepare(request)
+        if request.method != 'HEAD' and mapped.size:
+            await self._write_chunks(response, mapped.chunks(start, end), plan)
+        await response.write_eof()
+        return response
+
+    async def _stream_items(self, request: web.Request, match: RouteMatch,
+                            plan: Optional[Plan]) -> web.StreamResponse:
+        """Serve a generator mock: one lazily built page, or the whole sequence as a streamed JSON array"""
+        mock = match.route.payload
+        items = mock['items'](match.params, request.query)
+        if mock['page_size']:
+            body = json.dumps(paginate(items, request.query, mock['page_size'])).encode()
+            return await self._respond(request, mock['status'], body, mock['headers'], plan)
+        response = web.StreamResponse(status=mock['status'], headers=mock['headers'])
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        await self._write_chunks(response, iter_json_array(items), plan)
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    async def _write_chunks(response: web.StreamResponse, chunks: Iterable[Any], plan: Optional[Plan]) -> None:
+        bytes_per_second = plan.bytes_per_second if plan else None
+        for chunk in chunks:
+            await response.write(chunk)
+            if bytes_per_second:
+                await asyncio.sleep(len(chunk) / bytes_per_second)
+
+    @staticmethod
+    async def _inject_fault(request: web.Request, plan: Plan) -> Optional[web.StreamResponse]:
+        """Apply the plan's fault; returns the response to send, or None to answer normally"""
+        if plan.fault == ERROR:
+            logger.info("Injecting %s for %s %s", plan.error_status, request.method, request.path)
+            return web.json_response({'error': 'Injected fault'}, status=plan.error_status)
+        if plan.fault == TIMEOUT:
+            logger.info("Hanging %s %s for %ss", request.method, request.path, plan.hang_seconds)
+            await asyncio.sleep(plan.hang_seconds)
+        if plan.fault in (RESET, TIMEOUT):
+            logger.info("Resetting connection for %s %s", request.method, request.path)
+            if request.transport is not None:
+                request.transport.abort()
+            # Nothing reaches the client any more; this only ends the handler
+            return web.Response(status=499)
+        return None
+
+    def set_profile(self, profile: Union[str, NetworkProfile, None], seed: Optional[int] = None) -> None:
+        """
+        Apply a network profile (a name from mocks.profiles.PROFILES or a NetworkProfile) to every
+        request whose mock has no profile of its own; None turns network simulation off
+        """
+        self.profile = get_profile(profile, Config.MOCK_NETWORK_SEED if seed is None else seed)
+        logger.info("Network profile set to %s", self.profile)
+
+    def start_recording(self, archive_path: Optional[str] = None, upstream: Optional[str] = None,
+                        matcher: Optional[ReplayMatcher] = None) -> None:
+        """
+        Proxy requests that no mock matches to upstream (default Config.API_BASE_URL) and record them.
+        Recordings are merged into the archive when recording stops or the server stops.
+        """
+        archive = TrafficArchive(archive_path or Config.MOCK_ARCHIVE_PATH, matcher or ReplayMatcher.from_config())
+        self.recorder = Recorder(upstream or Config.API_BASE_URL, archive, timeout=Config.API_TIMEOUT / 1000)
+        logger.info("Recording unmatched requests from %s into %s", self.recorder.upstream, archive.path)
+
+    async def stop_recording(self) -> None:
+        """Stop proxying and write the recorded exchanges to the archive"""
+        if self.recorder:
+            recorder, self.recorder = self.recorder, None
+            await recorder.close()
+
+    def start_replay(self, archive_path: Optional[str] = None, matcher: Optional[ReplayMatcher] = None,
+                     strict: Optional[bool] = None) -> int:
+        """Serve requests that no mock matches from a recorded archive; returns the number of exchanges"""
+        self.replay = TrafficArchive(archive_path or Config.MOCK_ARCHIVE_PATH,
+                                     matcher or ReplayMatcher.from_config()).load()
+        self.replay_strict = Config.MOCK_REPLAY_STRICT if strict is None else strict
+        return len(self.replay)
+
+    def stop_replay(self) -> None:
+        self.replay = None
+
     def add_mock(self, method: str, path: str, 
-                response: Union[Dict[str, Any], str],
+                response: Union[Dict[str, Any], List[Any], str],
                 status: int = 200, delay: float = 0,
-                headers: Optional[Dict[str, str]] = None) -> None:
-        """Add a mock response for a specific endpoint"""
-        mock_key = f"{method}:{path}"
-        
+                headers: Optional[Dict[str, str]] = None,
+                priority: int = 0,
+                query: Optional[Dict[str, Optional[str]]] = None,
+                match_headers: Optional[Dict[str, Optional[str]]] = None,
+                profile: Union[str, NetworkProfile, None] = None,
+                mock_id: Optional[str] = None) -> str:
+        """
+        Add a mock response for an endpoint and return its mock id.
+        path may be exact or a pattern ('/api/claims/{id}', '/assets/*.css', '/files/**', 're:...'),
+        see mocks.router. query/match_headers restrict the mock to requests carrying those values,
+        and priority decides between several matching mocks. profile overrides the server's network
+        profile for this mock (see mocks.profiles). mock_id reuses an id assigned elsewhere, e.g. by
+        the process that replicates its mocks to a cluster (see mocks.cluster).
+        """
         # Auto-detect content type if not provided
         if headers is None:
             if isinstance(response, dict) and 'html' in response:
                 headers = {'Content-Type': 'text/html'}
-            elif isinstance(response, dict):
+            elif isinstance(response, (dict, list)):
                 headers = {'Content-Type': 'application/json'}
             else:
                 headers = {'Content-Type': 'text/plain'}
                 
-        self.mocked_responses[mock_key] = {
+        mock = {
             'body': response,
             'status': status,
             'delay': delay,
-            'headers': headers
+            'headers': headers,
+            'profile': get_profile(profile, Config.MOCK_NETWORK_SEED),
+            # Serialized, compressed and ETag-ed once here instead of on every hit
+            'prepared': prepare_response(response, status, headers)
+        }
+        return self._register_mock(method, path, mock, priority, query, match_headers, mock_id)
+
+    def add_file_mock(self, method: str, path: str, file_path: str,
+                      status: int = 200, delay: float = 0,
+                      headers: Optional[Dict[str, str]] = None,
+                      priority: int = 0,
+                      query: Optional[Dict[str, Optional[str]]] = None,
+                      match_headers: Optional[Dict[str, Optional[str]]] = None,
+                      profile: Union[str, NetworkProfile, None] = None,
+                      mock_id: Optional[str] = None,
+                      mmap: bool = False) -> str:
+        """
+        Serve a file from disk for an endpoint without loading it. By default the body is sent with
+        sendfile; with mmap=True the file is mapped once and every request streams slices of the
+        mapping in chunks, with Range support.
+        """
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"Mock file not found: {file_path}")
+        mock = {
+            'file': file_path,
+            'status': status,
+            'delay': delay,
+            'headers': headers or {},
+            'profile': get_profile(profile, Config.MOCK_NETWORK_SEED)
+        }
+        if mmap:
+            mock['mapped'] = MappedFile(file_path)
+            mock['headers'].setdefault('Content-Type', mimetypes.guess_type(file_path)[0] or 'application/octet-stream')
+        return self._register_mock(method, path, mock, priority, query, match_headers, mock_id)
+
+    def add_generator_mock(self, method: str, path: str, items: ItemFactory,
+                           page_size: Optional[int] = None,
+                           status: int = 200, delay: float = 0,
+                           headers: Optional[Dict[str, str]] = None,
+                           priority: int = 0,
+                           query: Optional[Dict[str, Optional[str]]] = None,
+                           match_headers: Optional[Dict[str, Optional[str]]] = None,
+                           profile: Union[str, NetworkProfile, None] = None,
+                           mock_id: Optional[str] = None) -> str:
+        """
+        Serve JSON items produced on demand by items(path_params, query), e.g. a generator.
+        With page_size, responses are pages selected by the page/page_size query parameters and only
+        that page is generated; without it, the whole sequence is streamed as a JSON array.
+        """
+        mock = {
+            'items': items,
+            'page_size': page_size,
+            'status': status,
+            'delay': delay,
+            'headers': headers or {'Content-Type': 'application/json'},
+            'profile': get_profile(profile, Config.MOCK_NETWORK_SEED)
         }
-        logger.info("Added mock for %s %s with content type %s", 
-                   method, path, headers.get('Content-Type'))
+        return self._register_mock(method, path, mock, priority, query, match_headers, mock_id)
+
+    def _register_mock(self, method: str, path: str, mock: Dict[str, Any], priority: int,
+                       query: Optional[Dict[str, Optional[str]]],
+                       match_headers: Optional[Dict[str, Optional[str]]], mock_id: Optional[str] = None) -> str:
+        route = self.router.add(method, path, mock, priority=priority, query=query, headers=match_headers,
+                                route_id=mock_id)
+        logger.info("Added mock %s for %s %s with content type %s", 
+                   route.id, method, path, mock['headers'].get('Content-Type', 'auto'))
+        return route.id
+
+    def remove_mock(self, mock_id: str) -> bool:
+        """Remove a single mock by the id add_mock returned"""
+        return self.router.remove(mock_id)
         
     def clear_mocks(self) -> None:
         """Clear all mock responses"""
-        self.mocked_responses.clear()
+        self.router.clear()
         logger.info("Cleared all mocks")
         
-    def get_requests(self) -> list:
-        """Get all recorded requests"""
-        return self.request_log
+    @property
+    def request_log(self) -> list:
+        """Retained requests, oldest first"""
+        return self.journal.find()
+
+    def get_requests(self, method: Optional[str] = None, path: Optional[str] = None,
+                     mock_id: Optional[str] = None) -> list:
+        """Get recorded requests, optionally only those for a method, path or mock id"""
+        return self.journal.find(method, path, mock_id)
+
+    def count_requests(self, method: Optional[str] = None, path: Optional[str] = None,
+                       mock_id: Optional[str] = None) -> int:
+        """Exact number of requests for a method, path or mock id, even if evicted from the journal"""
+        return self.journal.count(method, path, mock_id)
         
     def clear_requests(self) -> None:
         """Clear request history"""
-        self.request_log.clear()
+        self.journal.clear()
         logger.info("Cleared request history")
         
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
     async def start(self) -> None:
-        """Start the mock server"""
-        runner = web.AppRunner(self.app)
-        await runner.setup()
-        site = web.TCPSite(runner, self.host, self.port)
+        """Start the mock server; port 0 binds an OS-assigned port, available as self.port afterwards"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
         await site.start()
+        self.port = self._runner.addresses[0][1]
         logger.info("Mock server started at http://%s:%s", self.host, self.port)
+
+    async def stop(self) -> None:
+        """Stop serving and release the port"""
+        await self.stop_recording()
+        if getattr(self, '_runner', None) is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            self.journal.close()
+            logger.info("Mock server at http://%s:%s stopped", self.host, self.port)
         
     @classmethod
     async def create(cls, host: str = 'localhost', port: int = 8000) -> 'MockServer':
         """Create and start a mock server"""
         server = cls(host, port)
         await server.start()
-        return server
\ No newline at end of file
+        return server
+
+
+class MockServerThread:
+    """
+    Runs a MockServer on a private event loop in a background thread, with a synchronous
+    control API so regular (non-async) tests and fixtures can register and reset mocks.
+    Every call is executed on the server's loop, so mocks never change under a running request.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 0, start_timeout: float = 10.0):
+        self.host = host
+        self.requested_port = port
+        self.start_timeout = start_timeout
+        self.server: Optional[MockServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server.port
+
+    @property
+    def url(self) -> str:
+        return self.server.url
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> 'MockServerThread':
+        """Start the loop thread and block until the server accepts connections"""
+        if self.is_running:
+            return self
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        self.server = self._run(self._create(), timeout=self.start_timeout)
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down and join the loop thread"""
+        if not self.is_running:
+            return
+        self._run(self.server.stop(), timeout=self.start_timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(self.start_timeout)
+        self._loop.close()
+        self._thread = None
+
+    def add_mock(self, method: str, path: str, response: Union[Dict[str, Any], str], **kwargs: Any) -> str:
+        return self._call(self.server.add_mock, method, path, response, **kwargs)
+
+    def add_file_mock(self, method: str, path: str, file_path: str, **kwargs: Any) -> str:
+        return self._call(self.server.add_file_mock, method, path, file_path, **kwargs)
+
+    def add_generator_mock(self, method: str, path: str, items: ItemFactory, **kwargs: Any) -> str:
+        return self._call(self.server.add_generator_mock, method, path, items, **kwargs)
+
+    def remove_mock(self, mock_id: str) -> bool:
+        return self._call(self.server.remove_mock, mock_id)
+
+    def clear_mocks(self) -> None:
+        self._call(self.server.clear_mocks)
+
+    def get_requests(self, method: Optional[str] = None, path: Optional[str] = None,
+                     mock_id: Optional[str] = None) -> list:
+        return self._call(self.server.get_requests, method, path, mock_id)
+
+    def count_requests(self, method: Optional[str] = None, path: Optional[str] = None,
+                       mock_id: Optional[str] = None) -> int:
+        return self._call(self.server.count_requests, method, path, mock_id)
+
+    def clear_requests(self) -> None:
+        self._call(self.server.clear_requests)
+
+    def resolve(self, method: str, path: str, query: Mapping[str, str], headers: Mapping[str, str],
+                body: str) -> Tuple[Optional[RouteMatch], Optional[Plan]]:
+        return self._call(self.server.resolve, method, path, query, headers, body)
+
+    def lookup_recording(self, method: str, path: str, query: List[Tuple[str, str]], headers: Mapping[str, str],
+                         body: str) -> Optional[Exchange]:
+        return self._call(self.server.lookup_recording, method, path, query, headers, body)
+
+    def start_recording(self, archive_path: Optional[str] = None, upstream: Optional[str] = None,
+                        matcher: Optional[ReplayMatcher] = None) -> None:
+        self._call(self.server.start_recording, archive_path, upstream, matcher)
+
+    def stop_recording(self) -> None:
+        self._run(self.server.stop_recording())
+
+    def start_replay(self, archive_path: Optional[str] = None, matcher: Optional[ReplayMatcher] = None,
+                     strict: Optional[bool] = None) -> int:
+        return self._call(self.server.start_replay, archive_path, matcher, strict)
+
+    def stop_replay(self) -> None:
+        self._call(self.server.stop_replay)
+
+    def set_profile(self, profile: Union[str, NetworkProfile, None], seed: Optional[int] = None) -> None:
+        self._call(self.server.set_profile, profile, seed)
+
+    def reset(self) -> None:
+        """
+        Remove all mocks and recorded requests, e.g. between tests; replayed sequences and the
+        network profile's per-endpoint decisions start over
+        """
+        self._call(self.server.clear_mocks)
+        self._call(self.server.clear_requests)
+        if self.server.replay:
+            self._call(self.server.replay.rewind)
+        if self.server.profile:
+            self._call(self.server.profile.reset)
+
+    async def _create(self) -> MockServer:
+        return await MockServer.create(self.host, self.requested_port)
+
+    def _call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        async def call() -> Any:
+            return func(*args, **kwargs)
+        return self._run(call())
+
+    def _run(self, coroutine: Any, timeout: Optional[float] = None) -> Any:
+        if not self.is_running:
+            coroutine.close()
+            raise RuntimeError("Mock server thread is not running")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+
+def _throttle_chunk_size(bytes_per_second: int) -> int:
+    """About 20 writes per second, so throttled bodies arrive smoothly rather than in bursts"""
+    return max(256, bytes_per_second // 20)
+
+
+_worker_server: Optional[MockServerThread] = None
+
+
+def get_worker_mock_server() -> MockServerThread:
+    """Return this process's (i.e. this xdist worker's) mock server, starting it on first use"""
+    global _worker_server
+    if _worker_server is None or not _worker_server.is_running:
+        _worker_server = MockServerThread(host=Config.MOCK_SERVER_HOST, port=0).start()
+        if Config.MOCK_MODE == 'record':
+            _worker_server.start_recording()
+        elif Config.MOCK_MODE == 'replay':
+            _worker_server.start_replay()
+        atexit.register(stop_worker_mock_server)
+    return _worker_server
+
+
+def stop_worker_mock_server() -> None:
+    """Stop this process's mock server if one was started"""
+    global _worker_server
+    if _worker_server is not None:
+        _worker_server.stop()
+        _worker_server = None
+
+
+def setup_mock_endpoint(path: str, method: str = 'GET', status: int = 200,
+                        response: Union[Dict[str, Any], List[Any], str, None] = None, **kwargs: Any) -> str:
+    """Register a mock on this worker's mock server and return its mock id"""
+    return get_worker_mock_server().add_mock(method, path, response if response is not None else {},
+                                             status=status, **kwargs)
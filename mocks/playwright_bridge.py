@@ -0,0 +1,111 @@
+"""
+Serve mocks to the browser in-process through Playwright route interception
+
+The bridge registers a MockServer's route table as a context.route() handler. Requests that match a
+mock (or a recording, in replay mode) are fulfilled directly by Playwright, without a socket, a port
+or a round trip through aiohttp; they are recorded in the same journal and get the same network
+profile decisions as requests to the HTTP server. Everything else falls through to the next route
+handler or the network, so real pages and assets keep loading from the real server.
+
+Playwright's sync API runs route handlers one at a time, so profile latency and bandwidth are applied
+as a blocking delay before fulfilling, and a 'timeout' fault aborts with 'timedout' instead of hanging.
+"""
+import json
+import logging
+import time
+from typing import Any, Dict, Optional, Union
+from urllib.parse import parse_qsl, urlsplit
+
+from mocks.mock_server import MockServer, MockServerThread
+from mocks.profiles import ERROR, RESET, TIMEOUT
+from mocks.router import RouteMatch
+from mocks.streaming import iter_json_array, paginate
+
+logger = logging.getLogger(__name__)
+
+
+class PlaywrightMockBridge:
+    def __init__(self, server: Union[MockServer, MockServerThread], url_pattern: str = "**/*"):
+        """
+        server: a MockServer (it doesn't need to be started) or the worker's MockServerThread
+        url_pattern: the Playwright URL glob intercepted, e.g. '**/api/**' to leave pages alone
+        """
+        self.server = server
+        self.url_pattern = url_pattern
+        self.fulfilled = 0
+        self.passed_through = 0
+
+    def install(self, target: Any) -> 'PlaywrightMockBridge':
+        """Register on a BrowserContext (all its pages) or a single Page"""
+        target.route(self.url_pattern, self.handle)
+        self._target = target
+        return self
+
+    def uninstall(self) -> None:
+        target = getattr(self, '_target', None)
+        if target is not None:
+            target.unroute(self.url_pattern, self.handle)
+            self._target = None
+
+    def handle(self, route: Any) -> None:
+        """context.route() handler: fulfill from the mocks or fall back to the network"""
+        request = route.request
+        url = urlsplit(request.url)
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+        headers = request.headers
+        body = request.post_data or ''
+        match, plan = self.server.resolve(request.method, url.path or '/', query, headers, body)
+
+        if match:
+            status, response_headers, response_body, file_path = self._mock_response(match, query, headers)
+        else:
+            exchange = self.server.lookup_recording(request.method, url.path or '/', list(query.items()), headers, body)
+            if exchange is None:
+                self.passed_through += 1
+                route.fallback()
+                return
+            status, response_headers, response_body, file_path = (
+                exchange.status, exchange.response_headers, exchange.response_body, None)
+
+        if plan:
+            delay = plan.delay
+            if plan.bytes_per_second and response_body:
+                delay += len(response_body) / plan.bytes_per_second
+            if delay:
+                time.sleep(delay)
+            if plan.fault in (RESET, TIMEOUT):
+                logger.info("Aborting %s %s with injected %s", request.method, url.path, plan.fault)
+                route.abort("connectionreset" if plan.fault == RESET else "timedout")
+                return
+            if plan.fault == ERROR:
+                status, response_headers, response_body, file_path = (
+                    plan.error_status, {'Content-Type': 'application/json'}, b'{"error": "Injected fault"}', None)
+
+        self.fulfilled += 1
+        if file_path:
+            route.fulfill(status=status, headers=response_headers, path=file_path)
+        else:
+            route.fulfill(status=status, headers=response_headers, body=response_body)
+
+    @staticmethod
+    def _mock_response(match: RouteMatch, query: Dict[str, str], request_headers: Dict[str, str]):
+        """(status, headers, body, file path) for a mock; Playwright handles encoding, so send identity"""
+        mock = match.route.payload
+        if mock.get('delay'):
+            time.sleep(mock['delay'])
+        if 'file' in mock:
+            return mock['status'], mock['headers'], None, mock['file']
+        if 'items' in mock:
+            items = mock['items'](match.params, query)
+            body = (json.dumps(paginate(items, query, mock['page_size'])).encode() if mock['page_size']
+                    else b''.join(iter_json_array(items)))
+            return mock['status'], mock['headers'], body, None
+        prepared = mock['prepared']
+        if prepared.is_not_modified(_header(request_headers, 'If-None-Match')):
+            return 304, prepared.not_modified_headers, b'', None
+        body, headers = prepared.negotiate(None)
+        return prepared.status, headers, body, None
+
+
+def _header(headers: Dict[str, str], name: str) -> Optional[str]:
+    return headers.get(name) or headers.get(name.lower())
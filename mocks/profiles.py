@@ -0,0 +1,161 @@
+"""
+Network and fault-injection profiles for the mock server
+
+A profile decides, for every request, how long the server waits before answering, how fast the
+body is streamed and whether the request fails instead: an injected error status, a connection
+reset, or a hang that runs the client into its timeout.
+
+Latency models:
+    {'fixed': 120}                              always 120 ms
+    {'normal': [120, 30]}                       mean 120 ms, standard deviation 30 ms (never negative)
+    {'percentiles': {50: 80, 90: 300, 99: 2000}} long tail, interpolated between the given percentiles
+
+Every decision is drawn from a random generator seeded with (seed, method, path, n) where n counts the
+requests to that method and path, so the nth call to an endpoint behaves the same in every run no
+matter how concurrent requests interleave.
+"""
+import bisect
+import hashlib
+import random
+from collections import Counter
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple, Union
+
+# Faults a plan can carry
+ERROR = "error"
+RESET = "reset"
+TIMEOUT = "timeout"
+
+
+class LatencyModel:
+    """Draws a latency in milliseconds"""
+
+    def __init__(self, fixed: Optional[float] = None, normal: Optional[Tuple[float, float]] = None,
+                 percentiles: Optional[Mapping[float, float]] = None):
+        self.fixed = fixed
+        self.normal = tuple(normal) if normal else None
+        self._points = sorted((float(p), float(ms)) for p, ms in (percentiles or {}).items())
+        if self._points and self._points[0][0] > 0:
+            self._points.insert(0, (0.0, 0.0))
+        self._cumulative = [p for p, _ in self._points]
+
+    @classmethod
+    def parse(cls, spec: Union[None, float, Mapping[str, Any], 'LatencyModel']) -> Optional['LatencyModel']:
+        """Build a model from a number of milliseconds or a {'fixed'|'normal'|'percentiles': ...} dict"""
+        if spec is None or isinstance(spec, LatencyModel):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls(fixed=spec)
+        return cls(**spec)
+
+    def sample(self, rng: random.Random) -> float:
+        if self._points:
+            return self._inverse_cdf(rng.random() * 100)
+        if self.normal:
+            return max(0.0, rng.gauss(*self.normal))
+        return self.fixed or 0.0
+
+    def _inverse_cdf(self, percentile: float) -> float:
+        index = bisect.bisect_left(self._cumulative, percentile)
+        if index >= len(self._points):
+            return self._points[-1][1]
+        if index == 0:
+            return self._points[0][1]
+        (p0, ms0), (p1, ms1) = self._points[index - 1], self._points[index]
+        return ms0 + (ms1 - ms0) * (percentile - p0) / (p1 - p0)
+
+
+class Plan(NamedTuple):
+    """What the server does for one request"""
+    delay: float                       # seconds before the response starts
+    fault: Optional[str]               # None, ERROR, RESET or TIMEOUT
+    error_status: int
+    bytes_per_second: Optional[int]    # throttle for the body, None for full speed
+    hang_seconds: float
+
+
+class NetworkProfile:
+    def __init__(self, name: str = "custom", latency: Any = None, jitter_ms: float = 0.0,
+                 bandwidth_kbps: Optional[float] = None, error_rate: float = 0.0, error_status: int = 503,
+                 reset_rate: float = 0.0, timeout_rate: float = 0.0, hang_seconds: float = 30.0,
+                 seed: int = 0):
+        """
+        latency: milliseconds or a latency model spec (see module docstring)
+        jitter_ms: uniform +/- jitter added to every latency sample
+        bandwidth_kbps: body throughput in kilobytes per second, None for unthrottled
+        error_rate, reset_rate, timeout_rate: fraction of requests failing that way
+        hang_seconds: how long a 'timeout' request hangs before the connection is dropped
+        """
+        if error_rate + reset_rate + timeout_rate > 1:
+            raise ValueError("error_rate + reset_rate + timeout_rate must not exceed 1")
+        self.name = name
+        self.latency = LatencyModel.parse(latency)
+        self.jitter_ms = jitter_ms
+        self.bandwidth_kbps = bandwidth_kbps
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reset_rate = reset_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.seed = seed
+        self._calls: Counter = Counter()
+
+    def plan(self, method: str, path: str) -> Plan:
+        """Decide latency, throttling and faults for the next request to method and path"""
+        route = (method.upper(), path)
+        call = self._calls[route]
+        self._calls[route] += 1
+        rng = random.Random(_stable_seed(self.seed, method.upper(), path, call))
+
+        delay_ms = self.latency.sample(rng) if self.latency else 0.0
+        if self.jitter_ms:
+            delay_ms = max(0.0, delay_ms + rng.uniform(-self.jitter_ms, self.jitter_ms))
+
+        draw = rng.random()
+        fault = None
+        if draw < self.error_rate:
+            fault = ERROR
+        elif draw < self.error_rate + self.reset_rate:
+            fault = RESET
+        elif draw < self.error_rate + self.reset_rate + self.timeout_rate:
+            fault = TIMEOUT
+
+        bytes_per_second = int(self.bandwidth_kbps * 1024) if self.bandwidth_kbps else None
+        return Plan(delay_ms / 1000, fault, self.error_status, bytes_per_second, self.hang_seconds)
+
+    def reset(self) -> None:
+        """Restart every endpoint's sequence of decisions"""
+        self._calls.clear()
+
+    def with_seed(self, seed: int) -> 'NetworkProfile':
+        return NetworkProfile(self.name, self.latency, self.jitter_ms, self.bandwidth_kbps, self.error_rate,
+                              self.error_status, self.reset_rate, self.timeout_rate, self.hang_seconds, seed)
+
+    def __repr__(self) -> str:
+        return f"NetworkProfile({self.name} seed={self.seed})"
+
+
+# Named profiles, loosely modelled on common network conditions and backend behaviour
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'lan': {'latency': 2},
+    'broadband': {'latency': {'normal': [40, 10]}, 'bandwidth_kbps': 5000},
+    '4g': {'latency': {'normal': [80, 25]}, 'jitter_ms': 20, 'bandwidth_kbps': 1500},
+    '3g': {'latency': {'normal': [300, 80]}, 'jitter_ms': 50, 'bandwidth_kbps': 200},
+    'slow_backend': {'latency': {'percentiles': {50: 400, 90: 1500, 99: 5000}}},
+    'long_tail': {'latency': {'percentiles': {50: 60, 95: 400, 99: 2500, 100: 8000}}},
+    'flaky': {'latency': {'normal': [100, 30]}, 'error_rate': 0.05, 'reset_rate': 0.02, 'timeout_rate': 0.01},
+}
+
+
+def get_profile(profile: Union[str, NetworkProfile, None], seed: int = 0) -> Optional[NetworkProfile]:
+    """Resolve a profile name (see PROFILES) or pass a NetworkProfile through"""
+    if profile is None or isinstance(profile, NetworkProfile):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown network profile '{profile}'. Available: {', '.join(PROFILES)}")
+    return NetworkProfile(name=profile, seed=seed, **PROFILES[profile])
+
+
+def _stable_seed(*parts: Any) -> int:
+    """A seed that, unlike hash(), is the same in every process"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
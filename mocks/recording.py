@@ -0,0 +1,303 @@
+"""
+Record-and-replay of real backend traffic for the mock server
+
+In record mode the mock server forwards every request no mock matches to an upstream (by default
+Config.API_BASE_URL), returns the real response and keeps a normalized copy of the exchange. In replay
+mode the same exchanges are served from the archive, so tests run at local speed without the backend.
+
+Requests are matched on method, path, query and JSON body. Volatile parts are left out of the match:
+query parameters such as cache busters (ignore_query), JSON body fields such as timestamps or request
+ids (ignore_fields, by name at any depth) and every header except those listed in match_headers.
+Credentials never reach the archive: only the match_headers of a request are kept, secret-looking
+headers and JSON fields (Config.API_LOG_REDACT_KEYS) are masked, and a secret header that takes part
+in matching is stored as a digest of its value.
+Several recordings of the same request are replayed in the order they were recorded, repeating the
+last one, so create-then-read sequences come back the way the backend answered them.
+
+Archive format: one gzip-compressed JSON document with bodies stored once per content digest:
+    {"version": 1, "bodies": {digest: {"text"|"base64": ...}}, "exchanges": [{request..., response...}]}
+Workers merge their recordings into the archive under a file lock, replacing re-recorded requests.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import aiohttp
+
+from config.config import Config
+from utils.api_logging import Redactor
+from utils.file_lock import FileLock, atomic_write
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_VERSION = 1
+
+# Never forwarded or replayed: they describe one connection, not the exchange
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailer',
+    'transfer-encoding', 'upgrade', 'host', 'content-length', 'content-encoding',
+}
+# Dropped from recorded responses because they differ on every call
+VOLATILE_RESPONSE_HEADERS = {'date', 'server', 'x-request-id', 'x-correlation-id', 'age', 'via'}
+
+# Prefix of a secret header value that was replaced by its digest
+DIGEST_PREFIX = 'blake2b:'
+
+
+class ReplayMatcher:
+    """Builds the lookup key of a request, leaving volatile query parameters, fields and headers out"""
+
+    def __init__(self, ignore_query: Iterable[str] = (), ignore_fields: Iterable[str] = (),
+                 match_headers: Iterable[str] = (), redact_keys: Optional[Iterable[str]] = None):
+        self.ignore_query = set(ignore_query)
+        self.ignore_fields = set(ignore_fields)
+        self.match_headers = sorted(name.lower() for name in match_headers)
+        self.redactor = Redactor(list(Config.API_LOG_REDACT_KEYS if redact_keys is None else redact_keys))
+
+    @classmethod
+    def from_config(cls) -> 'ReplayMatcher':
+        return cls(Config.MOCK_REPLAY_IGNORE_QUERY, Config.MOCK_REPLAY_IGNORE_FIELDS, Config.MOCK_REPLAY_MATCH_HEADERS)
+
+    def key(self, method: str, path: str, query: Sequence[Tuple[str, str]],
+            headers: Mapping[str, str], body: str) -> str:
+        lowered = {name.lower(): value for name, value in headers.items()}
+        parts = {
+            'method': method.upper(),
+            'path': '/' + path.strip('/'),
+            'query': sorted([name, value] for name, value in query if name not in self.ignore_query),
+            'headers': [[name, self._header_value(name, lowered[name]) if name in lowered else None]
+                        for name in self.match_headers],
+            'body': self._normalize_body(body),
+        }
+        return hashlib.blake2b(json.dumps(parts, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+    def route_key(self, method: str, path: str) -> str:
+        """Loose key used when no exact recording exists and strict matching is off"""
+        return f"{method.upper()} /{path.strip('/')}"
+
+    def kept_headers(self, headers: Mapping[str, str]) -> Dict[str, str]:
+        """The request headers worth storing: those taking part in matching, with secrets digested"""
+        return {name: self._header_value(name, value) for name, value in headers.items()
+                if name.lower() in self.match_headers}
+
+    def redact_body(self, body: str) -> str:
+        """Mask secret fields of a JSON or form request body"""
+        try:
+            value = json.loads(body)
+        except ValueError:
+            return self.redactor.body(body, None)
+        redacted = self.redactor.value(value)
+        return body if redacted == value else json.dumps(redacted)
+
+    def redact_response_body(self, body: bytes) -> bytes:
+        """Mask secret fields of a JSON response body; anything else is kept byte for byte"""
+        try:
+            value = json.loads(body)
+        except ValueError:
+            return body
+        redacted = self.redactor.value(value)
+        return body if redacted == value else json.dumps(redacted).encode()
+
+    def _header_value(self, name: str, value: str) -> str:
+        if not self.redactor.is_secret(name) or value.startswith(DIGEST_PREFIX):
+            return value
+        return DIGEST_PREFIX + hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+
+    def _normalize_body(self, body: str) -> Any:
+        if not body:
+            return None
+        try:
+            return _drop_fields(self.redactor.value(json.loads(body)), self.ignore_fields)
+        except ValueError:
+            return self.redactor.body(body, None)
+
+
+class Exchange:
+    """One normalized request/response pair"""
+
+    __slots__ = ('method', 'path', 'query', 'headers', 'body', 'status', 'response_headers', 'response_body')
+
+    def __init__(self, method: str, path: str, query: Sequence[Tuple[str, str]], headers: Mapping[str, str],
+                 body: str, status: int, response_headers: Mapping[str, str], response_body: bytes):
+        self.method = method.upper()
+        self.path = path
+        self.query = [tuple(pair) for pair in query]
+        self.headers = dict(headers)
+        self.body = body
+        self.status = status
+        self.response_headers = dict(response_headers)
+        self.response_body = response_body
+
+    @classmethod
+    def capture(cls, method: str, path: str, query: Sequence[Tuple[str, str]], headers: Mapping[str, str],
+                body: str, status: int, response_headers: Mapping[str, str], response_body: bytes,
+                matcher: Optional[ReplayMatcher] = None) -> 'Exchange':
+        """Normalize a live exchange and strip its credentials before it is kept"""
+        matcher = matcher or ReplayMatcher()
+        response_headers = _filter_headers(response_headers, HOP_BY_HOP_HEADERS | VOLATILE_RESPONSE_HEADERS)
+        return cls(method, path, query, matcher.kept_headers(headers), matcher.redact_body(body) if body else body,
+                   status, matcher.redactor.headers(response_headers), matcher.redact_response_body(response_body))
+
+    def key(self, matcher: ReplayMatcher) -> str:
+        return matcher.key(self.method, self.path, self.query, self.headers, self.body)
+
+
+class TrafficArchive:
+    """Recorded exchanges on disk, loaded into a lookup table for replay"""
+
+    def __init__(self, path: str, matcher: Optional[ReplayMatcher] = None):
+        self.path = path
+        self.matcher = matcher or ReplayMatcher()
+        self.exchanges: List[Exchange] = []
+        self._by_key: Dict[str, List[Exchange]] = {}
+        self._by_route: Dict[str, List[Exchange]] = {}
+        self._served: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.exchanges)
+
+    def load(self) -> 'TrafficArchive':
+        """Read the archive; a missing file is an empty archive"""
+        self.exchanges = _read_archive(self.path)
+        self._index()
+        logger.info("Loaded %d recorded exchanges from %s", len(self.exchanges), self.path)
+        return self
+
+    def add(self, exchange: Exchange) -> None:
+        self.exchanges.append(exchange)
+        self._by_key.setdefault(exchange.key(self.matcher), []).append(exchange)
+        self._by_route.setdefault(self.matcher.route_key(exchange.method, exchange.path), []).append(exchange)
+
+    def lookup(self, method: str, path: str, query: Sequence[Tuple[str, str]], headers: Mapping[str, str],
+               body: str, strict: bool = True) -> Optional[Exchange]:
+        """Return the next recording for a request, or None if it was never recorded"""
+        key = self.matcher.key(method, path, query, headers, body)
+        candidates = self._by_key.get(key)
+        if not candidates and not strict:
+            key = self.matcher.route_key(method, path)
+            candidates = self._by_route.get(key)
+        if not candidates:
+            return None
+        served = self._served.get(key, 0)
+        self._served[key] = served + 1
+        return candidates[min(served, len(candidates) - 1)]
+
+    def rewind(self) -> None:
+        """Start every recorded sequence from its first response again"""
+        self._served.clear()
+
+    def save(self) -> None:
+        """
+        Merge this archive's exchanges into the file. Requests recorded here replace their earlier
+        recordings; everything else on disk is kept, so xdist workers can record into one archive.
+        """
+        with FileLock(f"{self.path}.lock"):
+            recorded = {exchange.key(self.matcher) for exchange in self.exchanges}
+            kept = [exchange for exchange in _read_archive(self.path) if exchange.key(self.matcher) not in recorded]
+            _write_archive(self.path, kept + self.exchanges)
+        logger.info("Saved %d recorded exchanges to %s", len(self.exchanges), self.path)
+
+    def _index(self) -> None:
+        self._by_key.clear()
+        self._by_route.clear()
+        self._served.clear()
+        exchanges, self.exchanges = self.exchanges, []
+        for exchange in exchanges:
+            self.add(exchange)
+
+
+class Recorder:
+    """Forwards unmatched mock server requests to the upstream and records the exchanges"""
+
+    def __init__(self, upstream: str, archive: TrafficArchive, timeout: float = 30.0):
+        self.upstream = upstream.rstrip('/')
+        self.archive = archive
+        self.timeout = timeout
+        self._session = None
+
+    async def forward(self, method: str, path: str, query: Sequence[Tuple[str, str]], headers: Mapping[str, str],
+                      body: bytes) -> Exchange:
+        """Send the request upstream, record the exchange and return the live one unredacted"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        forwarded = _filter_headers(headers, HOP_BY_HOP_HEADERS)
+        text = body.decode('utf-8', errors='replace')
+        async with self._session.request(method, f"{self.upstream}{path}", params=list(query), headers=forwarded,
+                                         data=body or None, allow_redirects=False) as response:
+            response_body = await response.read()
+            response_headers = _filter_headers(response.headers, HOP_BY_HOP_HEADERS)
+        self.archive.add(Exchange.capture(method, path, query, headers, text, response.status, response_headers,
+                                          response_body, self.archive.matcher))
+        return Exchange(method, path, query, forwarded, text, response.status, response_headers, response_body)
+
+    async def close(self) -> None:
+        """Close the upstream connection pool and persist the recordings"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self.archive.exchanges:
+            self.archive.save()
+
+
+def _filter_headers(headers: Mapping[str, str], excluded: Iterable[str]) -> Dict[str, str]:
+    excluded = set(excluded)
+    return {name: value for name, value in headers.items() if name.lower() not in excluded}
+
+
+def _drop_fields(value: Any, fields: set) -> Any:
+    if not fields:
+        return value
+    if isinstance(value, dict):
+        return {name: _drop_fields(item, fields) for name, item in value.items() if name not in fields}
+    if isinstance(value, list):
+        return [_drop_fields(item, fields) for item in value]
+    return value
+
+
+def _read_archive(path: str) -> List[Exchange]:
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        document = json.load(f)
+    if document.get('version') != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported mock archive version {document.get('version')} in {path}")
+    bodies = document['bodies']
+    return [
+        Exchange(item['method'], item['path'], item['query'], item['headers'], item['body'], item['status'],
+                 item['response_headers'], _decode_body(bodies[item['response_body']]))
+        for item in document['exchanges']
+    ]
+
+
+def _write_archive(path: str, exchanges: List[Exchange]) -> None:
+    bodies: Dict[str, Dict[str, str]] = OrderedDict()
+    items = []
+    for exchange in exchanges:
+        digest = hashlib.blake2b(exchange.response_body, digest_size=16).hexdigest()
+        bodies.setdefault(digest, _encode_body(exchange.response_body))
+        items.append({
+            'method': exchange.method, 'path': exchange.path, 'query': exchange.query,
+            'headers': exchange.headers, 'body': exchange.body, 'status': exchange.status,
+            'response_headers': exchange.response_headers, 'response_body': digest,
+        })
+    document = {'version': ARCHIVE_VERSION, 'bodies': bodies, 'exchanges': items}
+    data = json.dumps(document, separators=(',', ':')).encode()
+    atomic_write(path, gzip.compress(data, compresslevel=9, mtime=0))
+
+
+def _encode_body(body: bytes) -> Dict[str, str]:
+    try:
+        return {'text': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(body).decode('ascii')}
+
+
+def _decode_body(encoded: Dict[str, str]) -> bytes:
+    if 'text' in encoded:
+        return encoded['text'].encode('utf-8')
+    return base64.b64decode(encoded['base64'])
@@ -0,0 +1,74 @@
+"""
+Mock responses serialized once, when the mock is added
+
+PreparedResponse holds the encoded body, its gzip variant, an ETag and the full header set for
+each encoding, so serving a hit is a dict lookup plus a socket write, with no json.dumps per request.
+"""
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Bodies smaller than this are cheaper to send as-is than to compress
+MIN_COMPRESS_SIZE = 512
+
+IDENTITY = "identity"
+
+
+class PreparedResponse:
+    def __init__(self, status: int, body: bytes, headers: Dict[str, str]):
+        self.status = status
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self.bodies: Dict[str, bytes] = {IDENTITY: body}
+
+        if len(body) >= MIN_COMPRESS_SIZE and "Content-Encoding" not in headers:
+            self.bodies["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+
+        self.headers: Dict[str, Dict[str, str]] = {}
+        for encoding in self.bodies:
+            encoded_headers = {**headers, "ETag": self.etag}
+            if len(self.bodies) > 1:
+                encoded_headers["Vary"] = "Accept-Encoding"
+            if encoding != IDENTITY:
+                encoded_headers["Content-Encoding"] = encoding
+            self.headers[encoding] = encoded_headers
+        self.not_modified_headers = {"ETag": self.etag}
+
+    def is_not_modified(self, if_none_match: Optional[str]) -> bool:
+        """Check an If-None-Match header against this response's ETag"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return any(tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == self.etag for tag in tags)
+
+    def negotiate(self, accept_encoding: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+        """Return the body and headers for the best encoding the client accepts"""
+        if len(self.bodies) > 1 and accept_encoding:
+            if "gzip" in _accepted_encodings(accept_encoding):
+                return self.bodies["gzip"], self.headers["gzip"]
+        return self.body, self.headers[IDENTITY]
+
+
+def prepare_response(body: Any, status: int, headers: Dict[str, str]) -> PreparedResponse:
+    """Serialize a mock body the way its Content-Type requires"""
+    content_type = headers.get('Content-Type', 'application/json')
+    if isinstance(body, dict) and 'html' in body and content_type == 'text/html':
+        encoded = body['html'].encode()
+    elif content_type == 'application/json':
+        encoded = json.dumps(body).encode()
+    elif isinstance(body, bytes):
+        encoded = body
+    else:
+        encoded = str(body).encode()
+    return PreparedResponse(status, encoded, headers)
+
+
+def _accepted_encodings(accept_encoding: str) -> List[str]:
+    accepted = []
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.append(name.strip().lower())
+    return accepted
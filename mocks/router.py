@@ -0,0 +1,266 @@
+"""
+Precompiled route table for the mock server
+
+Patterns supported by Router.add():
+    /api/claims                 exact path
+    /api/claims/{id}            named parameter matching one path segment
+    /api/claims/{id:\\d+}        named parameter constrained by a regex
+    /static/*/logo.png          '*' matches exactly one segment
+    /assets/*.css               glob within one segment (fnmatch syntax)
+    /files/**                   '**' as last segment matches the rest of the path (param 'tail')
+    re:^/api/v\\d+/.*$           full regular expression, named groups become parameters
+
+Exact paths are resolved with a dict lookup and all other non-regex patterns are compiled into a
+segment trie, so lookups cost O(path depth) regardless of how many mocks are registered. Only
+'re:' routes are scanned linearly. When several routes match, the highest priority wins, then the
+most specific pattern, then the most recently added route.
+"""
+import fnmatch
+import itertools
+import re
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+ANY_METHOD = "*"
+REGEX_PREFIX = "re:"
+
+_PARAM_SEGMENT = re.compile(r"^\{(\w+)(?::(.+))?\}$")
+_GLOB_CHARS = set("*?[")
+
+
+class RouteMatch(NamedTuple):
+    route: 'Route'
+    params: Dict[str, str]
+
+
+class _ValueMatcher:
+    """Matches a query or header value: exact string, 're:' regex, or None for 'present'"""
+
+    def __init__(self, expected: Optional[str]):
+        self.expected = expected
+        self.regex = re.compile(expected[len(REGEX_PREFIX):]) if expected and expected.startswith(REGEX_PREFIX) else None
+
+    def __call__(self, actual: Optional[str]) -> bool:
+        if actual is None:
+            return False
+        if self.expected is None:
+            return True
+        if self.regex:
+            return self.regex.fullmatch(actual) is not None
+        return actual == self.expected
+
+
+class Route:
+    _ids = itertools.count(1)
+
+    def __init__(self, method: str, pattern: str, payload: Any, priority: int = 0,
+                 query: Optional[Mapping[str, Optional[str]]] = None,
+                 headers: Optional[Mapping[str, Optional[str]]] = None, route_id: Optional[str] = None):
+        self.id = route_id or f"mock-{next(Route._ids)}"
+        self.method = method.upper()
+        self.pattern = pattern
+        self.payload = payload
+        self.priority = priority
+        self.order = 0
+        self.query = dict(query or {})
+        self.headers = {name.lower(): value for name, value in (headers or {}).items()}
+        self._query_matchers = {name: _ValueMatcher(value) for name, value in self.query.items()}
+        self._header_matchers = {name: _ValueMatcher(value) for name, value in self.headers.items()}
+        self.regex = re.compile(pattern[len(REGEX_PREFIX):]) if pattern.startswith(REGEX_PREFIX) else None
+        self.segments = [] if self.regex else _split(pattern)
+        self.specificity = self._specificity()
+
+    @property
+    def key(self) -> Tuple:
+        """Routes with the same key replace each other, like re-adding a mock for the same endpoint"""
+        return (self.method, self.pattern, tuple(sorted(self.query.items())), tuple(sorted(self.headers.items())))
+
+    @property
+    def is_static(self) -> bool:
+        return not self.regex and all(_segment_kind(segment) == "literal" for segment in self.segments)
+
+    def matches_request(self, query: Mapping[str, str], headers: Mapping[str, str]) -> bool:
+        """Check the query and header matchers; headers must already be keyed by lower-case name"""
+        return (all(matcher(query.get(name)) for name, matcher in self._query_matchers.items())
+                and all(matcher(headers.get(name)) for name, matcher in self._header_matchers.items()))
+
+    def _specificity(self) -> Tuple[int, int, int]:
+        """(literal segments, constrained segments, request matchers): higher is more specific"""
+        if self.regex:
+            return (-1, 0, len(self.query) + len(self.headers))
+        kinds = [_segment_kind(segment) for segment in self.segments]
+        constrained = sum(1 for kind in kinds if kind in ("regex_param", "glob"))
+        return (kinds.count("literal"), constrained, len(self.query) + len(self.headers))
+
+    def __repr__(self) -> str:
+        return f"Route({self.id} {self.method} {self.pattern} priority={self.priority})"
+
+
+class _Node:
+    __slots__ = ("literal", "dynamic", "rest", "routes")
+
+    def __init__(self):
+        self.literal: Dict[str, '_Node'] = {}
+        self.dynamic: Dict[str, Tuple[Optional[str], Any, '_Node']] = {}  # segment -> (param, matcher, child)
+        self.rest: List[Route] = []
+        self.routes: List[Route] = []
+
+
+class Router:
+    def __init__(self):
+        self._static: Dict[Tuple[str, str], List[Route]] = {}
+        self._tries: Dict[str, _Node] = {}
+        self._regex: Dict[str, List[Route]] = {}
+        self._by_id: Dict[str, Route] = {}
+        self._by_key: Dict[Tuple, Route] = {}
+        self._order = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    @property
+    def routes(self) -> List[Route]:
+        return list(self._by_id.values())
+
+    def get(self, route_id: str) -> Optional[Route]:
+        return self._by_id.get(route_id)
+
+    def add(self, method: str, pattern: str, payload: Any, priority: int = 0,
+            query: Optional[Mapping[str, Optional[str]]] = None,
+            headers: Optional[Mapping[str, Optional[str]]] = None, route_id: Optional[str] = None) -> Route:
+        """
+        Compile and register a route, replacing any route with the same method, pattern and matchers.
+        route_id keeps an existing id, e.g. when the same routes are rebuilt in another process.
+        """
+        route = Route(method, pattern, payload, priority, query, headers, route_id)
+        existing = self._by_key.get(route.key)
+        if existing:
+            self.remove(existing.id)
+        route.order = next(self._order)
+
+        if route.regex:
+            self._regex.setdefault(route.method, []).append(route)
+        elif route.is_static:
+            self._static.setdefault((route.method, _normalize(pattern)), []).append(route)
+        else:
+            node = self._tries.setdefault(route.method, _Node())
+            for index, segment in enumerate(route.segments):
+                kind = _segment_kind(segment)
+                if kind == "rest":
+                    if index != len(route.segments) - 1:
+                        raise ValueError(f"'**' must be the last segment of {pattern}")
+                    node.rest.append(route)
+                    break
+                node = self._child(node, segment, kind)
+            else:
+                node.routes.append(route)
+
+        self._by_id[route.id] = route
+        self._by_key[route.key] = route
+        return route
+
+    def remove(self, route_id: str) -> bool:
+        """Unregister a route by id; returns False if it was not registered"""
+        route = self._by_id.pop(route_id, None)
+        if route is None:
+            return False
+        del self._by_key[route.key]
+        if route.regex:
+            self._regex[route.method].remove(route)
+        elif route.is_static:
+            self._static[(route.method, _normalize(route.pattern))].remove(route)
+        else:
+            node = self._tries[route.method]
+            for segment in route.segments:
+                if _segment_kind(segment) == "rest":
+                    node.rest.remove(route)
+                    return True
+                node = node.literal[segment] if segment in node.literal else node.dynamic[segment][2]
+            node.routes.remove(route)
+        return True
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def match(self, method: str, path: str, query: Optional[Mapping[str, str]] = None,
+              headers: Optional[Mapping[str, str]] = None) -> Optional[RouteMatch]:
+        """Return the best route for a request, or None if no route matches"""
+        query = query or {}
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        path = _normalize(path)
+        segments = _split(path)
+        best: Optional[RouteMatch] = None
+
+        for route_method in (method.upper(), ANY_METHOD):
+            candidates: List[RouteMatch] = [
+                RouteMatch(route, {}) for route in self._static.get((route_method, path), ())
+            ]
+            trie = self._tries.get(route_method)
+            if trie:
+                self._walk(trie, segments, 0, {}, candidates)
+            for route in self._regex.get(route_method, ()):
+                found = route.regex.fullmatch(path)
+                if found:
+                    candidates.append(RouteMatch(route, {k: v for k, v in found.groupdict().items() if v is not None}))
+
+            for candidate in candidates:
+                if not candidate.route.matches_request(query, headers):
+                    continue
+                if best is None or _rank(candidate.route) > _rank(best.route):
+                    best = candidate
+        return best
+
+    def _walk(self, node: _Node, segments: List[str], index: int, params: Dict[str, str],
+              candidates: List[RouteMatch]) -> None:
+        for route in node.rest:
+            candidates.append(RouteMatch(route, {**params, "tail": "/".join(segments[index:])}))
+        if index == len(segments):
+            candidates.extend(RouteMatch(route, dict(params)) for route in node.routes)
+            return
+        segment = segments[index]
+        child = node.literal.get(segment)
+        if child:
+            self._walk(child, segments, index + 1, params, candidates)
+        for param, matcher, child in node.dynamic.values():
+            if matcher is None or matcher(segment):
+                self._walk(child, segments, index + 1, {**params, param: segment} if param else params, candidates)
+
+    @staticmethod
+    def _child(node: _Node, segment: str, kind: str) -> _Node:
+        if kind == "literal":
+            return node.literal.setdefault(segment, _Node())
+        if segment not in node.dynamic:
+            param, matcher = None, None
+            if kind in ("param", "regex_param"):
+                param, constraint = _PARAM_SEGMENT.match(segment).groups()
+                if constraint:
+                    matcher = re.compile(constraint).fullmatch
+            elif kind == "glob":
+                matcher = re.compile(fnmatch.translate(segment)).match
+            node.dynamic[segment] = (param, matcher, _Node())
+        return node.dynamic[segment][2]
+
+
+def _rank(route: Route) -> Tuple[int, Tuple[int, int, int], int]:
+    return (route.priority, route.specificity, route.order)
+
+
+def _normalize(path: str) -> str:
+    return "/" + path.strip("/")
+
+
+def _split(path: str) -> List[str]:
+    stripped = path.strip("/")
+    return stripped.split("/") if stripped else []
+
+
+def _segment_kind(segment: str) -> str:
+    if segment == "**":
+        return "rest"
+    param = _PARAM_SEGMENT.match(segment)
+    if param:
+        return "regex_param" if param.group(2) else "param"
+    if segment == "*":
+        return "wildcard"
+    if _GLOB_CHARS & set(segment):
+        return "glob"
+    return "literal"
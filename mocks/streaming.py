@@ -0,0 +1,109 @@
+"""
+Large and lazily produced mock bodies
+
+MappedFile maps a file into memory once, when the mock is added. Every request then streams slices
+of the same mapping, so concurrent downloads share the page cache and no request reads or copies the
+whole file. Single byte ranges (Range: bytes=start-end, start-, -suffix) are answered with 206.
+
+Generator mocks produce JSON items on demand. With a page size, only the items of the requested page
+are generated; without one, the whole sequence is streamed as a JSON array in chunks, so a
+million-row claim list never exists in memory at once.
+"""
+import itertools
+import json
+import mmap
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+# Bytes written per chunk when streaming
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class MappedFile:
+    def __init__(self, path: str):
+        self.path = path
+        self.size = os.path.getsize(path)
+        if self.size:
+            with open(path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+        else:  # empty files cannot be mapped
+            self._map = None
+            self._view = memoryview(b'')
+
+    def chunks(self, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+        """Zero-copy slices of the mapping for bytes start..end (inclusive)"""
+        stop = self.size if end is None else end + 1
+        for offset in range(start, stop, chunk_size):
+            yield self._view[offset:min(offset + chunk_size, stop)]
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range Range header into an inclusive (start, end); None means serve the whole body.
+    Multiple ranges are not supported and are answered with the whole body, as RFC 9110 allows.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if not first:  # suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+ItemFactory = Callable[[Mapping[str, str], Mapping[str, str]], Iterable[Any]]
+
+
+def paginate(items: Iterable[Any], query: Mapping[str, str], page_size: int,
+             max_page_size: int = 1000) -> Dict[str, Any]:
+    """
+    Build one page from a lazy item sequence using the page (1-based) and page_size query parameters.
+    Only the items up to the end of the requested page, plus one to detect a next page, are produced.
+    """
+    page = max(1, _int(query.get('page'), 1))
+    size = max(1, min(_int(query.get('page_size'), page_size), max_page_size))
+    window = list(itertools.islice(items, (page - 1) * size, page * size + 1))
+    has_more = len(window) > size
+    return {
+        'items': window[:size],
+        'page': page,
+        'page_size': size,
+        'has_more': has_more,
+        'next_page': page + 1 if has_more else None,
+    }
+
+
+def iter_json_array(items: Iterable[Any], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Encode a sequence as a JSON array, yielding roughly chunk_size bytes at a time"""
+    buffer = [b'[']
+    buffered = 1
+    for index, item in enumerate(items):
+        encoded = (b',' if index else b'') + json.dumps(item).encode()
+        buffer.append(encoded)
+        buffered += len(encoded)
+        if buffered >= chunk_size:
+            yield b''.join(buffer)
+            buffer, buffered = [], 0
+    buffer.append(b']')
+    yield b''.join(buffer)
+
+
+def _int(value: Optional[str], default: int) -> int:
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        return default
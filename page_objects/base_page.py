@@ -52,6 +52,23 @@ class BasePage:
         element = self.page.locator(selector)
         return element.get_attribute(attr_name)
 
+    def wait_for_layout_stable(self, stable_frames: int = 3, max_frames: int = 120) -> None:
+        """Wait for web fonts and until the document size stays the same for several animation frames"""
+        self.logger.info("Waiting for layout to settle")
+        self.page.evaluate("""
+            async ([stableFrames, maxFrames]) => {
+                await document.fonts.ready;
+                const size = () => [document.documentElement.scrollWidth, document.documentElement.scrollHeight].join('x');
+                let last = size(), stable = 0;
+                for (let frame = 0; frame < maxFrames && stable < stableFrames; frame++) {
+                    await new Promise(resolve => requestAnimationFrame(resolve));
+                    const current = size();
+                    stable = current === last ? stable + 1 : 0;
+                    last = current;
+                }
+            }
+        """, [stable_frames, max_frames])
+
     def execute_script(self, script: str, *args: Any) -> Any:
         self.logger.info(f"Executing JavaScript")
         return self.page.evaluate(script, *args)
\ No newline at end of file
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Load Runner - Capacity checks of an environment with the framework's own API client, auth and config
+
+Usage:
+    python run_load.py SCENARIOS [SCENARIOS ...] (--users N | --rate R) [--duration S] [--env ENV] [options]
+
+SCENARIOS is a load feature file (see utils.load.load_feature) or a Python file whose SCENARIOS list or
+async scenario_* functions (taking an AsyncAPI) define the scenarios; file.py:function picks one function.
+
+Examples:
+    # 20 virtual users browsing claims on SYS for two minutes
+    python run_load.py tests/load/claims.feature --users 20 --duration 120 --env SYS
+
+    # 50 iterations per second, failing if p95 of the claim lookup exceeds 300ms
+    python run_load.py tests/load/claims.py --rate 50 --duration 60 --budget "p95 GET /api/claims/{id} < 300ms"
+
+    # Offline against a mock server
+    python run_load.py tests/load/claims.feature --users 5 --duration 10 --base-url http://localhost:8888
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import inspect
+import os
+import sys
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Generate load with the framework's API client")
+    parser.add_argument("scenarios", nargs="+", help="Load feature files or Python scenario files")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--users", type=int, help="Closed loop: number of virtual users")
+    mode.add_argument("--rate", type=float, help="Open loop: scenario iterations started per second")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run (default: 60)")
+    parser.add_argument("--iterations", type=int, help="Stop after this many scenario iterations")
+    parser.add_argument("--env", choices=["DEV", "SYS", "QA"], help="Environment to load (default: ENV or SYS)")
+    parser.add_argument("--base-url", help="API base URL (default: the environment's API_BASE_URL)")
+    parser.add_argument("--role", help="Authenticate every request as this role (see utils.auth)")
+    parser.add_argument("--think-time", type=float, default=0, help="Closed loop: seconds between iterations of a user")
+    parser.add_argument("--ramp-up", type=float, default=0, help="Closed loop: seconds over which users start")
+    parser.add_argument("--max-in-flight", type=int, help="Open loop: iterations running at once before arrivals are dropped")
+    parser.add_argument("--seed", type=int, help="Seed of the scenario mix")
+    parser.add_argument("--budget", action="append", default=[],
+                        help="Latency budget like 'p95 GET /api/home < 300ms'; exit 1 when exceeded (repeatable)")
+    parser.add_argument("--report", help="JSON report path (default: reports/load/<env>_<timestamp>.json)")
+    return parser.parse_args(argv)
+
+
+def load_scenarios(spec, base_url):
+    """Scenarios of a feature file, a Python file, or one function of a Python file (file.py:function)"""
+    from utils.load import Scenario, load_feature
+
+    path, _, function = spec.partition(".py:")
+    if function:
+        path += ".py"
+    if path.endswith(".feature"):
+        return load_feature(path, base_url)
+    module_spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    if function:
+        return [Scenario(function, getattr(module, function))]
+    if hasattr(module, "SCENARIOS"):
+        return list(module.SCENARIOS)
+    return [Scenario(name[len("scenario_"):], value, getattr(value, "weight", 1))
+            for name, value in inspect.getmembers(module, inspect.iscoroutinefunction) if name.startswith("scenario_")]
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    if args.env:
+        # Before the config is imported, so API_BASE_URL and credentials are the environment's
+        os.environ["ENV"] = args.env
+    from config.config import Config
+    from utils.api_timing import LatencyBudget
+    from utils.load import run_load
+
+    budgets = [LatencyBudget.parse(spec) for spec in args.budget + Config.API_LATENCY_BUDGETS]
+    base_url = args.base_url or Config.API_BASE_URL
+    scenarios = [scenario for spec in args.scenarios for scenario in load_scenarios(spec, base_url)]
+    if not scenarios:
+        print("No scenarios found")
+        return 2
+
+    print(f"\nRunning {len(scenarios)} scenarios against {base_url} ({Config.ENV})")
+    for scenario in scenarios:
+        print(f"  - {scenario.name} (weight {scenario.weight:g})")
+    report = asyncio.run(run_load(scenarios, users=args.users, rate=args.rate, duration=args.duration,
+                                  iterations=args.iterations, base_url=base_url, role=args.role,
+                                  think_time=args.think_time, ramp_up=args.ramp_up,
+                                  max_in_flight=args.max_in_flight, seed=args.seed))
+    print(f"\n{report.format()}")
+
+    report_path = args.report or os.path.join(Config.LOAD_REPORT_DIR, f"{Config.ENV.lower()}_{int(report.stats.started_at)}.json")
+    report.write(report_path)
+    print(f"\nReport: {report_path}")
+
+    violations = report.check(budgets)
+    for violation in violations:
+        print(f"Latency budget exceeded: {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,18 @@
+import html
+import json
 import os
 from datetime import datetime
 from typing import Generator, Any
-import asyncio
 import warnings
 from playwright.sync_api import Browser, BrowserContext, Page, sync_playwright
 import pytest
 from config.config import Config
 from utils.api_client import API
-from mocks.mock_server import MockServer
+from utils.api_logging import api_call_log
+from utils.api_timing import timing_store
+from utils.data_pool import DataPool
+from mocks.mock_server import MockServerThread, get_worker_mock_server, stop_worker_mock_server
+from mocks.playwright_bridge import PlaywrightMockBridge
 from utils.env_manager import env_manager
 from utils.test_matrix import get_active_matrix
 
@@ -53,6 +58,13 @@ def pytest_addoption(parser):
         help="Skip matrix testing even if it's enabled by default"
     )
 
+    parser.addoption(
+        "--visual-pool-workers",
+        action="store",
+        default=None,
+        help="Processes per worker for visual comparisons (0 compares inline on the test thread)"
+    )
+
 
 def pytest_configure(config):
     """Configure the test environment based on command line options"""
@@ -69,7 +81,23 @@ def pytest_configure(config):
     if env not in ["DEV", "SYS", "QA"]:
         raise ValueError(f"Invalid environment: {env}. Must be one of: DEV, SYS, QA")
     
+    # Must be exported before the config reload below so Config picks it up
+    visual_pool_workers = config.getoption("--visual-pool-workers")
+    if visual_pool_workers is not None:
+        os.environ["VISUAL_POOL_WORKERS"] = str(int(visual_pool_workers))
+
     env_manager.set_environment(env)
+
+    # Start a fresh visual report and diff images once, on the controller, before any xdist worker writes to them
+    if not hasattr(config, "workerinput"):
+        from utils.visual_report import VisualReport
+        from utils.visual_comparison import clear_submission_images
+        from utils.http_cache import reset_stats
+        from utils.api_timing import reset_run
+        VisualReport().reset()
+        clear_submission_images(Config.DIFF_DIR)
+        reset_stats()
+        reset_run()
     
     # When not using matrix, set browser and device from command line
     if not config.getoption("--matrix"):
@@ -108,8 +136,8 @@ def pytest_generate_tests(metafunc):
     Generate tests for each browser/device combination in the active matrix
     when matrix testing is enabled
     """
-    # Apply matrix if it's active based on default or commandline
-    if metafunc.config.getoption("--matrix"):
+    # Apply matrix if it's active based on default or commandline, only to tests that use the combo
+    if metafunc.config.getoption("--matrix") and "browser_device_combo" in metafunc.fixturenames:
         # Get active matrix combinations
         active_matrix = get_active_matrix()
         
@@ -200,10 +228,30 @@ def page(page_fixture, base_url) -> Page:
     page_fixture.goto(base_url)
     return page_fixture
 
-@pytest.fixture(scope="function")
-async def mock_server_fixture():
+@pytest.fixture(scope="session")
+def mock_server_session() -> Generator[MockServerThread, Any, None]:
+    """One mock server per xdist worker, on an OS-assigned port in a background event loop thread."""
+    server = get_worker_mock_server()
+    yield server
+    stop_worker_mock_server()
+
+@pytest.fixture
+def mock_server(mock_server_session) -> MockServerThread:
+    """The worker's mock server with mocks and recorded requests reset for this test."""
+    mock_server_session.reset()
+    return mock_server_session
+
+@pytest.fixture
+def mock_routes(context, mock_server) -> Generator[PlaywrightMockBridge, Any, None]:
+    """Serve the worker's mocks to the browser in-process via context.route; unmatched requests go to the network."""
+    bridge = PlaywrightMockBridge(mock_server).install(context)
+    yield bridge
+    bridge.uninstall()
+
+@pytest.fixture
+def mock_server_fixture(mock_server) -> MockServerThread:
     """Setup mock server with UI and API endpoints."""
-    server = await MockServer.create(host=Config.MOCK_SERVER_HOST, port=Config.MOCK_SERVER_PORT)
+    server = mock_server
 
     # Mock UI pages
     server.add_mock(
@@ -273,9 +321,7 @@ async def mock_server_fixture():
         }
     )
 
-    yield server
-    # Clean up
-    await asyncio.sleep(0.1)  # Allow pending tasks to complete
+    return server
 
 @pytest.fixture
 def api_client() -> API:
@@ -284,6 +330,14 @@ def api_client() -> API:
     api_base_url = env_manager.get_env_specific_value("API_BASE_URL", Config.API_BASE_URL)
     return API(base_url=api_base_url)
 
+@pytest.fixture(scope="session")
+def data_pool() -> Generator[DataPool, Any, None]:
+    """Leased, pre-generated test data of the current environment (see utils/data_pool.py)"""
+    pool = DataPool()
+    pool.seed()
+    yield pool
+    pool.close()
+
 @pytest.fixture(autouse=True)
 def test_context(request) -> Generator[None, Any, None]:
     """Provide test context information and handle failures."""
@@ -291,6 +345,8 @@ def test_context(request) -> Generator[None, Any, None]:
     test_name = request.node.name
     test_start_time = datetime.now()
     current_env = env_manager.get_current_env()
+    api_call_log.clear()  # Only this test's API calls are attached if it fails
+    request.node.api_timing_mark = timing_store.mark()  # Only this test's timings are attached to its report
 
     yield
 
@@ -309,6 +365,46 @@ def test_context(request) -> Generator[None, Any, None]:
     except AttributeError:
         pass  # Node does not have rep_call attribute
 
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Attach the full (redacted) API calls of a failed test to the report"""
+    outcome = yield
+    report = outcome.get_result()
+    if report.when != "call":
+        return
+    _attach_api_timings(item)
+    if not report.failed:
+        return
+    calls = api_call_log.recent_calls()
+    if not calls:
+        return
+    payload = json.dumps(calls, indent=2, default=str)
+    report.sections.append(("API calls", payload))
+    try:
+        import allure
+        allure.attach(payload, name="API calls", attachment_type=allure.attachment_type.JSON)
+    except ImportError:
+        pass
+
+def _attach_api_timings(item):
+    """Attach the phase breakdown of the test's API calls to its allure report"""
+    timings = timing_store.records(getattr(item, "api_timing_mark", 0))
+    if not timings:
+        return
+    try:
+        import allure
+        allure.attach(json.dumps([timing.as_dict() for timing in timings], indent=2), name="API timings",
+                      attachment_type=allure.attachment_type.JSON)
+    except ImportError:
+        pass
+
+def pytest_collection_modifyitems(config, items):
+    """Register latency budgets declared with @pytest.mark.latency_budget"""
+    for item in items:
+        for marker in item.iter_markers("latency_budget"):
+            for spec in marker.args:
+                timing_store.add_budget(spec)
+
 @pytest.hookimpl(tryfirst=True)
 def pytest_runtest_logreport(report):
     """Hook to store test results on test item for later use."""
@@ -316,3 +412,97 @@ def pytest_runtest_logreport(report):
         # Only in setup phase, get the test item from the nodeid
         item = report.head_line  # Store the test name
         setattr(report, "test_name", item)  # Set an attribute on the report itself
+
+
+# Soft visual failures of the xdist workers, handed to the controller when each worker finishes
+worker_soft_failures = {}
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """Collect the soft visual failures a worker deferred to its session end"""
+    for test_id, messages in getattr(node, "workeroutput", {}).get("soft_visual_failures", {}).items():
+        worker_soft_failures.setdefault(test_id, []).extend(messages)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Assert soft visual checks deferred to session end, stop the comparison pool and merge the visual report"""
+    # Imported here so utils.visual_comparison binds Config after pytest_configure reloads it
+    from utils.visual_comparison import collect_soft_failures, shutdown_comparison_pool
+    from utils.visual_report import VisualReport
+
+    failures = collect_soft_failures()
+    shutdown_comparison_pool()
+
+    # Workers hand their API cache statistics, timings and soft visual failures to the controller, which
+    # reports them; a worker's terminal output and exit status never reach the run's
+    if hasattr(session.config, "workerinput"):
+        from utils.http_cache import write_worker_stats
+        write_worker_stats(session.config.workerinput["workerid"])
+        timing_store.write(session.config.workerinput["workerid"])
+        session.config.workeroutput["soft_visual_failures"] = failures
+        return
+    _check_latency_budgets(session)
+
+    # Workers only append entries; the controller merges them into one report
+    report_path = VisualReport().build_index()
+    if report_path:
+        print(f"\nVisual report: {report_path}")
+
+    for test_id, messages in worker_soft_failures.items():
+        failures.setdefault(test_id, []).extend(messages)
+    if not failures:
+        return
+
+    reporter = session.config.pluginmanager.get_plugin("terminalreporter")
+    for test_id, messages in failures.items():
+        for message in messages:
+            if reporter:
+                reporter.write_line(f"SOFT VISUAL FAILURE {test_id}: {message}", red=True)
+            else:
+                print(f"SOFT VISUAL FAILURE {test_id}: {message}")
+    session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+# Per-endpoint latency summary and budget violations of the run, set by the controller at session finish
+api_latency_summary = []
+api_latency_violations = []
+
+
+def _check_latency_budgets(session):
+    """Summarize the run's API timings and fail the run when a latency budget is exceeded"""
+    from utils.api_timing import check_budgets, load_run, summarize
+    records, budgets = load_run()
+    api_latency_summary[:] = summarize(records)
+    api_latency_violations[:] = check_budgets(records, budgets)
+    if api_latency_violations:
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Print API cache hit rates, latency percentiles and budget violations"""
+    from utils.http_cache import format_stats, merged_stats
+    from utils.api_timing import format_summary
+    stats = merged_stats()
+    if stats:
+        terminalreporter.write_line(format_stats(stats))
+    if api_latency_summary:
+        terminalreporter.write_sep("-", "API latency (ms)")
+        for line in format_summary(api_latency_summary):
+            terminalreporter.write_line(line)
+    for violation in api_latency_violations:
+        terminalreporter.write_line(f"LATENCY BUDGET EXCEEDED {violation}", red=True)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_html_results_summary(prefix, summary, postfix):
+    """Add API cache hit rates, latency percentiles and budget violations to the HTML report"""
+    from utils.http_cache import format_stats, merged_stats
+    from utils.api_timing import summary_html
+    stats = merged_stats()
+    if stats:
+        prefix.append(f"<p>{format_stats(stats)}</p>")
+    if api_latency_summary:
+        prefix.append(summary_html(api_latency_summary))
+    for violation in api_latency_violations:
+        prefix.append(f"<p style=\"color: red\">Latency budget exceeded: {html.escape(violation)}</p>")
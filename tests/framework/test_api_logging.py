@@ -0,0 +1,105 @@
+import json
+import logging
+import allure
+from utils.api_client import API
+from utils.api_logging import ApiCallLog, Redactor, REDACTED
+from utils.async_api_client import APIResponse
+
+
+class ExplodingResponse:
+    """Fails the test if anything tries to read it"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"response.{name} was read while logging is disabled")
+
+
+def make_response(content=b'{"id": 1}', url="http://api.local/api/claims?page=2", status=200, headers=None,
+                  request_headers=None):
+    return APIResponse('POST', url, status, headers or {'Content-Type': 'application/json'}, content, 0.0125,
+                       request_headers=request_headers or {})
+
+
+@allure.feature('API Client')
+@allure.story('Request logging')
+class TestApiLogging:
+    def test_disabled_logging_reads_nothing(self, caplog):
+        """With the logger above the level and nothing kept, a call is neither formatted nor inspected"""
+        call_log = ApiCallLog(level='DEBUG', keep=0)
+        with caplog.at_level(logging.INFO, logger="utils.api_client"):
+            call_log.record(ExplodingResponse(), {'password': 'hunter2'})
+        assert caplog.records == []
+
+    def test_enabled_logging_formats_lazily(self, caplog):
+        """The record carries the call, which is formatted into one line when emitted"""
+        call_log = ApiCallLog(level='INFO', keep=0)
+        with caplog.at_level(logging.INFO, logger="utils.api_client"):
+            call_log.record(make_response(), {'name': 'claim'})
+        assert len(caplog.records) == 1
+        message = caplog.records[0].getMessage()
+        assert message.startswith("POST http://api.local/api/claims?page=2 -> 200 in 12.5ms")
+        assert '"name": "claim"' in message and '{"id": 1}' in message
+
+    def test_bodies_are_truncated(self):
+        """Logged bodies are cut to max_body and report their full size"""
+        call_log = ApiCallLog(max_body=16, keep=0)
+        entry = call_log.describe(make_response(content=b'x' * 5000), {'items': list(range(100))})
+        assert entry['response_body'] == 'x' * 16 + '... (5000 bytes)'
+        assert entry['request_body'] == '{"items": [0, 1,... (401 chars)'
+
+    def test_secrets_are_redacted(self):
+        """Headers, query parameters, JSON and form bodies lose their secret values"""
+        call_log = ApiCallLog(keep=0)
+        response = make_response(
+            content=b'{"user": "jane", "access_token": "abc.def", "nested": {"password": "p@ss"}}',
+            url="http://api.local/login?api_key=123&page=1",
+            headers={'Set-Cookie': 'session=1', 'Content-Type': 'application/json'},
+            request_headers={'Authorization': 'Bearer abc.def', 'Accept': 'application/json'})
+        entry = call_log.describe(response, {'username': 'jane', 'password': 'hunter2'})
+
+        assert 'abc.def' not in json.dumps(entry)
+        assert entry['request_headers'] == {'Authorization': REDACTED, 'Accept': 'application/json'}
+        assert entry['response_headers']['Set-Cookie'] == REDACTED
+        assert entry['url'] == f"http://api.local/login?api_key={REDACTED}&page=1"
+        assert json.loads(entry['request_body']) == {'username': 'jane', 'password': REDACTED}
+        assert json.loads(entry['response_body']) == {
+            'user': 'jane', 'access_token': REDACTED, 'nested': {'password': REDACTED}}
+
+    def test_redaction_survives_truncation_and_forms(self):
+        """A secret cut by truncation is still masked, and form-encoded pairs are masked too"""
+        redactor = Redactor(['password', 'token'])
+        assert redactor.body('{"token": "abcdefghijkl', 14) == f'{{"token": "{REDACTED}"... (23 bytes)'
+        assert redactor.body('user=jane&password=hunter2&x=1', None) == f'user=jane&password={REDACTED}&x=1'
+
+    def test_sampling_is_seeded(self, caplog):
+        """In bulk runs only a sample of calls is logged, reproducibly for a seed"""
+        def logged(seed):
+            call_log = ApiCallLog(level='INFO', sample_rate=0.1, keep=0, seed=seed)
+            caplog.clear()
+            with caplog.at_level(logging.INFO, logger="utils.api_client"):
+                for _ in range(1000):
+                    call_log.record(make_response())
+            return len(caplog.records)
+
+        first = logged(7)
+        assert 50 < first < 150
+        assert logged(7) == first
+
+    def test_recent_calls_keep_full_payloads(self):
+        """Calls kept for failure reports are capped in number but not truncated"""
+        call_log = ApiCallLog(max_body=8, keep=2)
+        for index in range(3):
+            call_log.record(make_response(content=json.dumps({'index': index, 'token': 't'}).encode()))
+        calls = call_log.recent_calls()
+        assert [json.loads(call['response_body'])['index'] for call in calls] == [1, 2]
+        assert json.loads(calls[-1]['response_body'])['token'] == REDACTED
+        call_log.clear()
+        assert call_log.recent_calls() == []
+
+    def test_api_client_logs_through_call_log(self, mock_server, caplog):
+        """API requests go through the shared call log"""
+        mock_server.add_mock('POST', '/api/login', {'token': 'secret-value'})
+        with caplog.at_level(logging.DEBUG, logger="utils.api_client"):
+            API(base_url=mock_server.url).post('/api/login', json_data={'password': 'hunter2'})
+        messages = [record.getMessage() for record in caplog.records if record.name == "utils.api_client"]
+        assert len(messages) == 1
+        assert 'secret-value' not in messages[0] and 'hunter2' not in messages[0]
@@ -0,0 +1,111 @@
+import pytest
+import allure
+from mocks.profiles import NetworkProfile
+from utils.api_client import API
+from utils.api_timing import (LatencyBudget, RequestTiming, TimingStore, check_budgets, load_run,
+                              normalize_endpoint, summarize, timing_store)
+
+
+def record(endpoint, total_ms, env='QA', method='GET'):
+    timing = RequestTiming(method, f"http://api.local{endpoint}", env)
+    timing.total = total_ms / 1000
+    return timing.as_dict()
+
+
+@allure.feature('API Client')
+@allure.story('Request timing')
+class TestApiTiming:
+    def test_phases_of_new_and_reused_connections(self, mock_server):
+        """The first call pays for DNS and connect, the next one reuses the connection"""
+        mock_server.add_mock('GET', '/api/home', {'greeting': 'hello'})
+        api = API(base_url=mock_server.url)
+
+        first, second = api.get('/api/home').timing, api.get('/api/home').timing
+
+        assert not first.reused and first.connect > 0
+        assert second.reused and second.dns == second.connect == 0
+        for timing in (first, second):
+            assert timing.status == 200 and timing.endpoint == '/api/home'
+            phases = timing.dns + timing.connect + timing.tls + timing.server + timing.transfer
+            assert phases == pytest.approx(timing.total, abs=0.005)
+            assert timing.bytes_received == len(b'{"greeting": "hello"}')
+
+    def test_server_time_and_bytes_sent(self, mock_server):
+        """Time spent by the server is reported as server time, request bodies as bytes sent"""
+        mock_server.add_mock('POST', '/api/claims', {'id': 1}, delay=0.2)
+        api = API(base_url=mock_server.url)
+
+        timing = api.post('/api/claims', json_data={'vin': '1HGCM82633A004352'}).timing
+
+        assert timing.server >= 0.2
+        assert timing.bytes_sent == len(b'{"vin": "1HGCM82633A004352"}')
+
+    def test_transfer_time_of_a_throttled_body(self, mock_server):
+        """A slow body shows up as transfer time, not server time"""
+        mock_server.add_mock('GET', '/api/report', 'x' * 200_000,
+                             profile=NetworkProfile(bandwidth_kbps=500))
+        timing = API(base_url=mock_server.url).get('/api/report', headers={'Accept-Encoding': 'identity'}).timing
+
+        assert timing.transfer > 0.1
+        assert timing.bytes_received == 200_000
+
+    def test_calls_land_in_the_session_store(self, mock_server):
+        """Every call is recorded with ids folded out of the endpoint"""
+        mock_server.add_mock('GET', '/api/claims/{id}', {'status': 'open'})
+        mark = timing_store.mark()
+        api = API(base_url=mock_server.url)
+        for claim in (1, 2, 3):
+            api.get(f'/api/claims/{claim}')
+
+        assert [timing.endpoint for timing in timing_store.records(mark)] == ['/api/claims/{id}'] * 3
+
+    def test_normalize_endpoint(self):
+        """Numeric, UUID and long hex segments become {id}"""
+        assert normalize_endpoint('http://h/api/claims/42/photos/7?x=1') == '/api/claims/{id}/photos/{id}'
+        assert normalize_endpoint('/api/users/0b9e2f3c-1d2a-4c5b-8e7f-123456789abc') == '/api/users/{id}'
+        assert normalize_endpoint('/api/v2/home') == '/api/v2/home'
+
+    def test_budget_parsing(self):
+        """Budgets read like the sentence they express"""
+        budget = LatencyBudget.parse('p95 of GET /api/claims/{id} < 300 ms')
+        assert (budget.percentile, budget.method, budget.endpoint, budget.limit_ms) == (95, 'GET', '/api/claims/{id}', 300)
+        assert str(LatencyBudget.parse('p99.9 post /api/login<1000ms')) == 'p99.9 POST /api/login < 1000ms'
+        with pytest.raises(ValueError):
+            LatencyBudget.parse('GET /api/home fast please')
+
+    def test_budgets_are_checked_per_env(self):
+        """A budget fails for the env whose percentile is over the limit"""
+        records = [record('/api/home', 100) for _ in range(95)] + [record('/api/home', 900) for _ in range(5)]
+        records += [record('/api/home', 900, env='DEV') for _ in range(10)]
+        budget = LatencyBudget.parse('p95 GET /api/home < 300ms')
+
+        violations = check_budgets(records, [budget])
+
+        assert len(violations) == 1 and violations[0].startswith('p95 GET /api/home < 300ms on DEV')
+        assert check_budgets(records, [LatencyBudget.parse('p99 GET /api/home < 1000ms')]) == []
+
+    def test_summary_percentiles(self):
+        """Summaries group calls per env and endpoint"""
+        records = [record('/api/claims/1', total) for total in range(1, 101)] + [record('/api/home', 5)]
+        summary = {row['endpoint']: row for row in summarize(records)}
+
+        assert summary['/api/claims/{id}']['count'] == 100
+        assert (summary['/api/claims/{id}']['p50'], summary['/api/claims/{id}']['p95']) == (50, 95)
+        assert summary['/api/home']['max'] == 5
+
+    def test_worker_files_are_merged(self, tmp_path):
+        """Timings and budgets written by workers are merged by the controller"""
+        for worker, total in (('gw0', 10), ('gw1', 20)):
+            store = TimingStore()
+            timing = RequestTiming('GET', 'http://api.local/api/home', 'QA')
+            timing.total = total / 1000
+            store.add(timing)
+            store.add_budget('p95 GET /api/home < 15ms')
+            store.write(worker, str(tmp_path))
+
+        records, budgets = load_run(str(tmp_path))
+
+        worker_records = [r for r in records if r['endpoint'] == '/api/home' and r['total'] in (0.01, 0.02)]
+        assert len(worker_records) == 2
+        assert [str(budget) for budget in budgets if budget.endpoint == '/api/home'] == ['p95 GET /api/home < 15ms']
+        assert check_budgets(worker_records, budgets)
@@ -0,0 +1,125 @@
+import asyncio
+import aiohttp
+import pytest
+import pytest_asyncio
+import allure
+from aiohttp.test_utils import TestServer
+from mocks.mock_server import MockServer, MockServerThread
+from utils.async_api_client import AsyncAPI, BatchRequest, run_batch
+
+
+class CountingAsyncAPI(AsyncAPI):
+    """Tracks how many requests are in flight at once"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def request(self, method, endpoint, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await super().request(method, endpoint, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest_asyncio.fixture
+async def mock_api():
+    """A MockServer on a real port and an AsyncAPI client pointed at it"""
+    server = MockServer()
+    test_server = TestServer(server.app)
+    await test_server.start_server()
+    api = CountingAsyncAPI(base_url=str(test_server.make_url('')))
+    yield server, api
+    await api.close()
+    await test_server.close()
+
+
+@allure.feature('API Client')
+class TestAsyncAPIClient:
+
+    @allure.title('Verify the async client mirrors the synchronous API surface')
+    @pytest.mark.asyncio
+    async def test_verbs_and_token(self, mock_api):
+        """
+        Test get/post/put/patch/delete and that set_token adds the bearer header
+        """
+        server, api = mock_api
+        for method in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE'):
+            server.add_mock(method, '/api/claims/1', {'method': method})
+        api.set_token('secret')
+
+        assert (await api.get('/api/claims/1')).json() == {'method': 'GET'}
+        assert (await api.post('api/claims/1', json_data={'a': 1})).json() == {'method': 'POST'}
+        assert (await api.put('/api/claims/1', json_data={'a': 1})).ok
+        assert (await api.patch('/api/claims/1', json_data={'a': 1})).status_code == 200
+        assert (await api.delete('/api/claims/1')).json() == {'method': 'DELETE'}
+        assert server.get_requests('POST', '/api/claims/1')[0]['headers']['Authorization'] == 'Bearer secret'
+
+    @allure.title('Verify batches keep request order under bounded concurrency')
+    @pytest.mark.asyncio
+    async def test_gather_order_and_concurrency(self, mock_api):
+        """
+        Test that slower early requests don't reorder results and the in-flight limit holds
+        """
+        server, api = mock_api
+        for claim_id in range(40):
+            server.add_mock('GET', f'/api/claims/{claim_id}', {'id': claim_id}, delay=(40 - claim_id) * 0.001)
+
+        responses = await api.gather([('GET', f'/api/claims/{claim_id}') for claim_id in range(40)], concurrency=8)
+
+        assert [response.json()['id'] for response in responses] == list(range(40))
+        assert api.max_in_flight == 8
+
+    @allure.title('Verify failed batch requests can be returned in place')
+    @pytest.mark.asyncio
+    async def test_gather_return_exceptions(self, mock_api):
+        """
+        Test that a timed out request is returned at its position instead of aborting the batch
+        """
+        server, api = mock_api
+        server.add_mock('GET', '/api/ok', {'ok': True})
+        server.add_mock('GET', '/api/slow', {'ok': True}, delay=0.5)
+        batch = [BatchRequest('GET', '/api/ok'),
+                 BatchRequest('GET', '/api/slow', {'timeout': aiohttp.ClientTimeout(total=0.05)}),
+                 BatchRequest('GET', '/api/ok', {'params': {'x': '1'}})]
+
+        results = await api.gather(batch, concurrency=2, return_exceptions=True)
+        assert results[0].ok and results[2].ok
+        assert isinstance(results[1], asyncio.TimeoutError)
+
+    @allure.title('Verify a failed batch stops sending requests')
+    @pytest.mark.asyncio
+    async def test_gather_failure_cancels_the_rest(self, mock_api):
+        """
+        Test that without return_exceptions the first failure is raised and no further request goes out
+        """
+        server, api = mock_api
+        server.add_mock('GET', '/api/ok', {'ok': True}, delay=0.02)
+        server.add_mock('GET', '/api/slow', {'ok': True}, delay=0.5)
+        batch = [BatchRequest('GET', '/api/slow', {'timeout': aiohttp.ClientTimeout(total=0.05)})]
+        batch += [BatchRequest('GET', '/api/ok')] * 40
+
+        with pytest.raises(asyncio.TimeoutError):
+            await api.gather(batch, concurrency=4)
+        sent = server.count_requests('GET', '/api/ok')
+        await asyncio.sleep(0.3)
+
+        assert sent < 40 and server.count_requests('GET', '/api/ok') == sent
+        assert api.in_flight == 0
+
+    @allure.title('Verify batches can be run from synchronous tests')
+    def test_run_batch(self):
+        """
+        Test the synchronous helper against a threaded mock server
+        """
+        server = MockServerThread(port=0).start()
+        try:
+            server.add_mock('GET', '/api/claims/{id}', {'status': 'open'})
+            responses = run_batch([('GET', f'/api/claims/{i}') for i in range(25)], base_url=server.url, concurrency=5)
+            assert [response.status_code for response in responses] == [200] * 25
+            assert server.count_requests() == 25
+        finally:
+            server.stop()
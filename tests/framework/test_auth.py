@@ -0,0 +1,139 @@
+import base64
+import json
+import os
+import time
+import pytest
+import allure
+from utils.api_client import API
+from utils.auth import AuthError, TokenAuth, TokenProvider, _jwt_expiry
+
+
+@pytest.fixture
+def agent_credentials(monkeypatch):
+    monkeypatch.setenv('API_AGENT_EMAIL', 'agent@example.com')
+    monkeypatch.setenv('API_AGENT_PASSWORD', 'secret')
+
+
+def authenticated_api(mock_server, provider, role='agent'):
+    api = API(base_url=mock_server.url)
+    api.session.auth = TokenAuth(role, mock_server.url, provider)
+    return api
+
+
+def jwt(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b'=').decode()
+    return f"eyJhbGciOiJIUzI1NiJ9.{payload}.signature"
+
+
+@allure.feature('API Client')
+@allure.story('Shared auth tokens')
+class TestAuth:
+    def test_one_login_for_many_requests(self, mock_server, agent_credentials, tmp_path):
+        """Every request carries the token of a single login"""
+        mock_server.add_mock('POST', '/api/login', {'token': 't1', 'expires_in': 3600})
+        mock_server.add_mock('GET', '/api/claims', {'claims': []}, match_headers={'Authorization': 'Bearer t1'})
+        api = authenticated_api(mock_server, TokenProvider(cache_dir=str(tmp_path)))
+
+        assert [api.get('/api/claims').status_code for _ in range(5)] == [200] * 5
+        assert mock_server.count_requests('POST', '/api/login') == 1
+        assert json.loads(mock_server.get_requests('POST', '/api/login')[0]['body']) == {
+            'email': 'agent@example.com', 'password': 'secret'}
+
+    def test_token_is_shared_across_workers(self, mock_server, agent_credentials, tmp_path):
+        """A second process (here a second provider on the same directory) reuses the token file"""
+        mock_server.add_mock('POST', '/api/login', {'token': 't1', 'expires_in': 3600})
+        first, second = TokenProvider(cache_dir=str(tmp_path)), TokenProvider(cache_dir=str(tmp_path))
+
+        assert first.get_token('agent', mock_server.url) == second.get_token('agent', mock_server.url) == 't1'
+        assert (first.logins, second.logins) == (1, 0)
+
+    def test_token_file_is_never_readable_by_others(self, mock_server, agent_credentials, tmp_path, monkeypatch):
+        """The token is written to a file that is owner-only before it gets its final name"""
+        mock_server.add_mock('POST', '/api/login', {'token': 't1', 'expires_in': 3600})
+        modes = []
+        replace = os.replace
+
+        def checked_replace(source, target):
+            modes.append(os.stat(source).st_mode & 0o777)
+            replace(source, target)
+        monkeypatch.setattr(os, 'replace', checked_replace)
+
+        TokenProvider(cache_dir=str(tmp_path)).get_token('agent', mock_server.url)
+
+        assert modes == [0o600]
+
+    def test_tokens_are_refreshed_before_expiry(self, mock_server, agent_credentials, tmp_path):
+        """A token inside the refresh margin is replaced before it is used"""
+        mock_server.add_mock('POST', '/api/login', {'token': 't1', 'expires_in': 30})
+        provider = TokenProvider(cache_dir=str(tmp_path), refresh_margin=60)
+
+        provider.get_token('agent', mock_server.url)
+        provider.get_token('agent', mock_server.url)
+
+        assert provider.logins == 2
+
+    def test_reauthenticates_once_on_401(self, mock_server, agent_credentials, tmp_path):
+        """A rejected token is re-issued and the request retried with the new one"""
+        login = mock_server.add_mock('POST', '/api/login', {'token': 'revoked', 'expires_in': 3600})
+        mock_server.add_mock('GET', '/api/claims', {'error': 'unauthorized'}, status=401)
+        mock_server.add_mock('GET', '/api/claims', {'claims': [1]}, priority=1,
+                             match_headers={'Authorization': 'Bearer fresh'})
+        api = authenticated_api(mock_server, TokenProvider(cache_dir=str(tmp_path)))
+        api.session.auth.provider.get_token('agent', mock_server.url)
+        mock_server.remove_mock(login)
+        mock_server.add_mock('POST', '/api/login', {'token': 'fresh', 'expires_in': 3600})
+
+        response = api.get('/api/claims')
+
+        assert response.status_code == 200 and response.json() == {'claims': [1]}
+        assert [r.status_code for r in response.history] == [401]
+        assert mock_server.count_requests('POST', '/api/login') == 2
+
+    def test_persistent_401_is_not_retried_forever(self, mock_server, agent_credentials, tmp_path):
+        """If the new token is rejected too, the 401 is returned after one retry"""
+        mock_server.add_mock('POST', '/api/login', {'token': 't1', 'expires_in': 3600})
+        mock_server.add_mock('GET', '/api/admin', {'error': 'forbidden'}, status=401)
+        api = authenticated_api(mock_server, TokenProvider(cache_dir=str(tmp_path)))
+
+        assert api.get('/api/admin').status_code == 401
+        assert mock_server.count_requests('GET', '/api/admin') == 2
+        assert mock_server.count_requests('POST', '/api/login') == 2
+
+    def test_reissue_uses_a_token_another_worker_refreshed(self, mock_server, agent_credentials, tmp_path):
+        """Only one worker logs in again when several see the same stale token rejected"""
+        mock_server.add_mock('POST', '/api/login', {'token': 't1', 'expires_in': 3600})
+        worker_a, worker_b = TokenProvider(cache_dir=str(tmp_path)), TokenProvider(cache_dir=str(tmp_path))
+        stale = worker_a.get_token('agent', mock_server.url)
+        worker_b.get_token('agent', mock_server.url)
+
+        mock_server.clear_mocks()
+        mock_server.add_mock('POST', '/api/login', {'token': 't2', 'expires_in': 3600})
+        assert worker_a.reissue('agent', stale, mock_server.url) == 't2'
+        assert worker_b.reissue('agent', stale, mock_server.url) == 't2'
+        assert (worker_a.logins, worker_b.logins) == (2, 0)
+
+    def test_expiry_from_jwt(self, mock_server, agent_credentials, tmp_path):
+        """Without expires_in the exp claim of a JWT decides when to refresh"""
+        expires_at = int(time.time()) + 30
+        mock_server.add_mock('POST', '/api/login', {'token': jwt({'sub': 'agent', 'exp': expires_at})})
+        provider = TokenProvider(cache_dir=str(tmp_path), refresh_margin=60)
+
+        provider.get_token('agent', mock_server.url)
+        provider.get_token('agent', mock_server.url)
+
+        assert provider.logins == 2
+        assert _jwt_expiry(jwt({'exp': expires_at})) == expires_at
+        assert _jwt_expiry('opaque-token') is None
+
+    def test_missing_credentials(self, tmp_path):
+        """A role without credentials fails with a hint instead of a 401 later on"""
+        with pytest.raises(AuthError, match='API_NOBODY_EMAIL'):
+            TokenProvider(cache_dir=str(tmp_path)).get_token('nobody', 'http://localhost:1')
+
+    def test_set_token_replaces_the_role(self, mock_server, tmp_path):
+        """An explicit token wins over a role"""
+        mock_server.add_mock('GET', '/api/me', {'ok': True}, match_headers={'Authorization': 'Bearer manual'})
+        api = API(base_url=mock_server.url, role='agent')
+        api.set_token('manual')
+
+        assert api.get('/api/me').status_code == 200
@@ -0,0 +1,70 @@
+import io
+import pytest
+import allure
+from PIL import Image
+from utils.baseline_store import BaselineStore
+
+
+def _png(color, size=(30, 30), **save_options) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG", **save_options)
+    return buffer.getvalue()
+
+
+@allure.feature('Baseline Store Framework')
+class TestBaselineStore:
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return BaselineStore(str(tmp_path / "baselines"))
+
+    @allure.title('Verify identical images share one blob across environments and combos')
+    def test_identical_images_are_deduplicated(self, store):
+        """
+        Test that the same pixels stored under different keys and encodings produce one blob
+        """
+        first = store.put("DEV", "chrome_desktop", "home", _png("white"))
+        second = store.put("SYS", "chrome_pixel", "home", _png("white", compress_level=0))
+
+        assert first == second
+        assert len(list(store.blob_dir.glob("*/*.png"))) == 1
+        assert store.get_path("sys", "chrome_pixel", "home") == store.blob_path(first)
+
+    @allure.title('Verify names from different combos do not collide')
+    def test_combos_are_isolated(self, store):
+        """
+        Test that the same screenshot name resolves per combination
+        """
+        store.put("QA", "chrome_desktop", "header", _png("white"))
+        store.put("QA", "chrome_pixel", "header", _png("black"))
+
+        assert store.get("QA", "chrome_desktop", "header") != store.get("QA", "chrome_pixel", "header")
+        assert store.get("QA", "firefox_desktop", "header") is None
+
+    @allure.title('Verify bulk promotion and garbage collection')
+    def test_promote_then_gc(self, store):
+        """
+        Test that promotion copies index entries and gc only removes unreferenced blobs
+        """
+        store.put("SYS", "chrome_desktop", "home", _png("white"))
+        store.put("SYS", "chrome_pixel", "home", _png("gray"))
+        store.put("QA", "chrome_desktop", "home", _png("red"))
+
+        assert store.promote("SYS", "QA", combos=["chrome_desktop"]) == 1
+        assert store.get("QA", "chrome_desktop", "home") == store.get("SYS", "chrome_desktop", "home")
+        assert store.list_keys(env="QA") == ["qa/chrome_desktop/home"]
+
+        assert store.gc() == 1
+        assert len(list(store.blob_dir.glob("*/*.png"))) == 2
+
+    @allure.title('Verify another process sees index updates')
+    def test_index_reloads_when_changed_on_disk(self, store):
+        """
+        Test that a second store instance on the same root picks up new entries
+        """
+        other = BaselineStore(str(store.root))
+        assert other.get_entry("DEV", "default", "logo") is None
+
+        store.put("DEV", "default", "logo", _png("blue"))
+
+        assert other.get_entry("DEV", "default", "logo") == store.get_entry("DEV", "default", "logo")
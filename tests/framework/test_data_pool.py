@@ -0,0 +1,162 @@
+import multiprocessing
+import pytest
+import allure
+import fill_data_pool
+from utils import id_allocator
+from utils.data_pool import DataPool, PoolExhausted
+
+
+def lease_many(path, count, queue):
+    pool = DataPool(env='sys', path=path)
+    queue.put([pool.lease('user').id for _ in range(count)])
+    pool.close()
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = DataPool(env='sys', path=str(tmp_path / 'sys.sqlite'))
+    yield pool
+    pool.close()
+
+
+def counter_kind(pool, name='claim', **policy):
+    made = []
+
+    def make(n):
+        records = [{'number': len(made) + i} for i in range(n)]
+        made.extend(records)
+        return records
+
+    pool.register(name, make, **policy)
+    return made
+
+
+@allure.feature('Test Data')
+@allure.story('Data pools')
+class TestDataPool:
+    def test_records_are_recycled_until_max_uses(self, pool):
+        """A returned record keeps the test's changes and is retired after max_uses leases"""
+        counter_kind(pool, batch=1, low_watermark=0, max_uses=2)
+
+        with pool.lease('claim') as lease:
+            lease.record['status'] = 'open'
+        with pool.lease('claim') as again:
+            assert (again.id, again.record, again.uses) == (lease.id, {'number': 0, 'status': 'open'}, 2)
+
+        assert pool.stats()['claim'] == {'free': 0, 'leased': 0, 'retired': 1}
+
+    def test_failed_tests_retire_their_record(self, pool):
+        """A record whose test raised is not handed out again"""
+        counter_kind(pool, batch=1, low_watermark=0, max_uses=None)
+
+        with pytest.raises(RuntimeError):
+            with pool.lease('claim'):
+                raise RuntimeError('test failed')
+
+        assert pool.stats()['claim']['retired'] == 1
+        assert pool.lease('claim').record == {'number': 1}
+
+    def test_leases_are_exclusive_across_processes(self, pool):
+        """Workers leasing at the same time never get the same record"""
+        pool.fill('user', 120)
+        queue = multiprocessing.get_context('fork').Queue()
+        workers = [multiprocessing.get_context('fork').Process(target=lease_many, args=(pool.path, 30, queue))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        ids = [i for _ in workers for i in queue.get(timeout=60)]
+        for worker in workers:
+            worker.join()
+
+        assert len(ids) == len(set(ids)) == 120
+        assert pool.stats()['user']['leased'] == 120
+
+    def test_refill_below_watermark(self, pool):
+        """A lease leaving fewer free records than the watermark refills the kind in the background"""
+        made = counter_kind(pool, batch=5, low_watermark=3)
+
+        first = pool.lease('claim')  # empty pool: refilled in the foreground
+        leases = [pool.lease('claim') for _ in range(2)]
+        pool.close()
+
+        assert len(made) == 10 and first.record == {'number': 0}
+        assert pool.stats()['claim'] == {'free': 7, 'leased': 3, 'retired': 0}
+        assert sorted(lease.id for lease in [first] + leases) == [1, 2, 3]
+
+    def test_expired_leases_are_retired(self, tmp_path):
+        """A lease not returned in time (a crashed worker) is retired and its release ignored"""
+        pool = DataPool(env='sys', path=str(tmp_path / 'sys.sqlite'), lease_ttl=0)
+        counter_kind(pool, batch=2, low_watermark=0, max_uses=None)
+
+        stale = pool.lease('claim')
+        fresh = pool.lease('claim')
+        stale.release()
+
+        assert fresh.id != stale.id
+        assert pool.stats()['claim'] == {'free': 0, 'leased': 1, 'retired': 1}
+        pool.close()
+
+    def test_seeded_records(self, pool):
+        """Seeded records are inserted once, recycled by default, and stay out once retired"""
+        records = {'agent': [{'email': 'a@example.com'}, {'email': 'b@example.com'}]}
+
+        assert pool.seed(records) == 2 and pool.seed(records) == 0
+        with pool.lease('agent') as lease:
+            assert lease.record == {'email': 'a@example.com'}
+        pool.lease('agent').retire()
+
+        assert pool.seed(records) == 0 and pool.prune() == 0
+        assert pool.stats()['agent'] == {'free': 1, 'leased': 0, 'retired': 1}
+        pool.lease('agent')
+        with pytest.raises(PoolExhausted, match='No free agent records'):
+            pool.lease('agent')
+        with pytest.raises(PoolExhausted, match='Only 0 free agent records'):
+            pool.fill('agent', 1)
+        assert pool.fill('agent', 0) == 0
+
+    def test_built_in_kinds(self, pool):
+        """user, product and order records come from TestDataGenerator's batch methods"""
+        pool.fill('order', 10)
+
+        with pool.lease('order') as lease:
+            assert {'id', 'user_id', 'items', 'total', 'status', 'created_at'} == set(lease.record)
+        assert pool.stats()['order']['retired'] == 1
+        assert pool.prune() == 1 and pool.stats()['order'] == {'free': 9, 'leased': 0, 'retired': 0}
+
+    def test_generated_ids_do_not_repeat_across_runs(self, tmp_path, monkeypatch):
+        """Runs sharing a run slot continue the ID sequence where earlier runs filling the pool stopped"""
+        monkeypatch.setattr(id_allocator.Config, 'TEST_DATA_RUN_ID', 'nightly')
+        path = str(tmp_path / 'sys.sqlite')
+        for _ in range(6):
+            monkeypatch.setattr(id_allocator, '_shared', {})  # a new run starts with fresh allocators
+            pool = DataPool(env='sys', path=path)
+            assert pool.refill('user', 20) == 20
+            pool.close()
+
+        pool = DataPool(env='sys', path=path)
+        ids = [pool.lease('user').record['id'] for _ in range(120)]
+        assert len(set(ids)) == 120
+        pool.close()
+
+    def test_duplicate_ids_are_made_again(self, pool):
+        """A record whose id is already in the pool is dropped and replaced; a generator making nothing new fails"""
+        batches = iter([[0, 1, 2], [2, 3, 4], [5]])
+        pool.register('claim', lambda n: [{'id': i} for i in next(batches)], low_watermark=0)
+
+        assert pool.refill('claim', 3) == 3 and pool.refill('claim', 3) == 3
+        assert pool.stats()['claim']['free'] == 6
+
+        pool.register('claim', lambda n: [{'id': 5}], low_watermark=0)
+        with pytest.raises(PoolExhausted, match='only made records already'):
+            pool.refill('claim', 1)
+        pool.register('claim', lambda n: [{'id': 6}], low_watermark=0)  # the failed refill gave up its claim
+        assert pool.refill('claim', 1) == 1
+
+    def test_command_line(self, tmp_path, capsys, monkeypatch):
+        """fill_data_pool.py fills kinds and prints the pool's counts"""
+        monkeypatch.setenv('ENV', 'SYS')  # restored after --env changes it
+        path = str(tmp_path / 'qa.sqlite')
+
+        assert fill_data_pool.main(['--env', 'QA', '--path', path, '--fill', 'user=25']) == 0
+        assert 'user                      25       0        0' in capsys.readouterr().out
+        assert fill_data_pool.main(['--path', path, '--fill', 'nothing=1']) == 2
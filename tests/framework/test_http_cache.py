@@ -0,0 +1,121 @@
+import time
+import allure
+from utils.api_client import API
+from utils.http_cache import HttpCache, format_stats
+
+
+@allure.feature('API Client')
+@allure.story('HTTP cache')
+class TestHttpCache:
+    def test_fresh_responses_skip_the_network(self, mock_server):
+        """A response with max-age is served from memory until it expires"""
+        mock_server.add_mock('GET', '/api/config', {'theme': 'dark'}, headers={'Cache-Control': 'max-age=60'})
+        api = API(base_url=mock_server.url, cache=HttpCache(disk_dir=''))
+
+        responses = [api.get('/api/config') for _ in range(5)]
+
+        assert [response.json() for response in responses] == [{'theme': 'dark'}] * 5
+        assert [response.from_cache for response in responses] == [False, True, True, True, True]
+        assert mock_server.count_requests('GET', '/api/config') == 1
+        assert api.cache.stats['hits'] == 4
+
+    def test_stale_responses_are_revalidated_with_etag(self, mock_server):
+        """Without freshness information the ETag is sent back and a 304 reuses the cached body"""
+        mock_server.add_mock('GET', '/api/catalog', {'products': ['glass', 'wiper']})
+        api = API(base_url=mock_server.url, cache=HttpCache(disk_dir=''))
+
+        first = api.get('/api/catalog')
+        second = api.get('/api/catalog')
+
+        requests_seen = mock_server.get_requests('GET', '/api/catalog')
+        assert len(requests_seen) == 2
+        assert requests_seen[1]['headers'].get('If-None-Match') == first.headers['ETag']
+        assert second.status_code == 200 and second.from_cache
+        assert second.json() == {'products': ['glass', 'wiper']}
+        assert api.cache.stats['revalidated'] == 1
+
+    def test_no_store_and_errors_are_not_cached(self, mock_server):
+        """no-store responses and error statuses always go to the network"""
+        mock_server.add_mock('GET', '/api/session', {'user': 'jane'}, headers={'Cache-Control': 'no-store, max-age=60'})
+        mock_server.add_mock('GET', '/api/broken', {'error': 'boom'}, status=500, headers={'Cache-Control': 'max-age=60'})
+        api = API(base_url=mock_server.url, cache=HttpCache(disk_dir=''))
+
+        for _ in range(2):
+            api.get('/api/session')
+            api.get('/api/broken')
+
+        assert mock_server.count_requests('GET', '/api/session') == 2
+        assert mock_server.count_requests('GET', '/api/broken') == 2
+        assert api.cache.stats['stores'] == 0
+
+    def test_writes_invalidate_the_resource(self, mock_server):
+        """A successful write drops every cached variant of the same URL"""
+        mock_server.add_mock('GET', '/api/claims', {'claims': []}, headers={'Cache-Control': 'max-age=60'})
+        mock_server.add_mock('POST', '/api/claims', {'id': 1}, status=201)
+        api = API(base_url=mock_server.url, cache=HttpCache(disk_dir=''))
+
+        api.get('/api/claims', params={'page': 1})
+        api.get('/api/claims', params={'page': 1})
+        api.post('/api/claims', json_data={'vin': '1HGCM'})
+        refetched = api.get('/api/claims', params={'page': 1})
+
+        assert not refetched.from_cache
+        assert mock_server.count_requests('GET', '/api/claims') == 2
+
+    def test_credentials_and_vary_separate_entries(self, mock_server):
+        """Different tokens never share an entry, and a request selecting another Vary variant is not served it"""
+        mock_server.add_mock('GET', '/api/profile', {'name': 'x'},
+                             headers={'Cache-Control': 'max-age=60', 'Vary': 'Accept-Language'})
+        cache = HttpCache(disk_dir='')
+        jane, john = API(base_url=mock_server.url, cache=cache), API(base_url=mock_server.url, cache=cache)
+        jane.set_token('jane-token')
+        john.set_token('john-token')
+
+        jane.get('/api/profile')
+        john.get('/api/profile')
+        assert jane.get('/api/profile').from_cache
+        assert not jane.get('/api/profile', headers={'Accept-Language': 'fr'}).from_cache
+
+        assert mock_server.count_requests('GET', '/api/profile') == 3
+
+    def test_memory_tier_is_bounded(self, mock_server):
+        """The LRU keeps at most max_entries responses"""
+        mock_server.add_mock('GET', '/api/items/{id}', {'ok': True}, headers={'Cache-Control': 'max-age=60'})
+        api = API(base_url=mock_server.url, cache=HttpCache(max_entries=2, disk_dir=''))
+
+        for item in (1, 2, 3, 1):
+            api.get(f'/api/items/{item}')
+
+        assert mock_server.count_requests('GET') == 4
+        assert len(api.cache._memory) == 2
+
+    def test_disk_tier_is_shared(self, mock_server, tmp_path):
+        """A second process (here a second cache on the same directory) reuses and invalidates entries"""
+        mock_server.add_mock('GET', '/api/reference', {'states': ['OH', 'TX']}, headers={'Cache-Control': 'max-age=60'})
+        mock_server.add_mock('PUT', '/api/reference', {'ok': True})
+        worker_a = API(base_url=mock_server.url, cache=HttpCache(disk_dir=str(tmp_path)))
+        worker_b = API(base_url=mock_server.url, cache=HttpCache(disk_dir=str(tmp_path)))
+
+        worker_a.get('/api/reference')
+        shared = worker_b.get('/api/reference')
+        assert shared.from_cache and shared.json() == {'states': ['OH', 'TX']}
+        assert mock_server.count_requests('GET', '/api/reference') == 1
+
+        worker_b.put('/api/reference', json_data={'states': ['OH']})
+        assert not worker_a.get('/api/reference').from_cache
+        assert mock_server.count_requests('GET', '/api/reference') == 2
+
+    def test_expires_and_age(self):
+        """Expires relative to Date, and Age, shorten the freshness lifetime"""
+        cache = HttpCache(disk_dir='')
+        now = time.time()
+        date, expires = (time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(t)) for t in (now, now + 120))
+        assert 119 <= cache._lifetime({'Date': date, 'Expires': expires}) <= 121
+        assert cache._lifetime({'Cache-Control': 'max-age=60', 'Age': '50'}) == 10
+        assert cache._lifetime({'Cache-Control': 'no-cache, max-age=60'}) == 0
+
+    def test_stats_summary(self):
+        """The report line gives the hit rate and the share answered from the cache"""
+        summary = format_stats({'hits': 6, 'revalidated': 2, 'misses': 2, 'invalidations': 1})
+        assert "10 GETs" in summary
+        assert "60.0% hit rate" in summary and "80.0% served from cache" in summary
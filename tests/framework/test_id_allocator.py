@@ -0,0 +1,87 @@
+import pytest
+import allure
+from utils import id_allocator
+from utils.id_allocator import IdAllocator, IdSpaceExhausted, worker_partition
+from utils.test_data import ID_DIGITS, TestDataGenerator
+
+
+@allure.feature('Test Data')
+@allure.story('Unique IDs')
+class TestIdAllocator:
+    def test_permutation_covers_the_space(self):
+        """Every position maps to a different ID inside the space, so a full partition is a permutation"""
+        allocator = IdAllocator('user', 3, seed=1, worker=0, workers=1, run_slot=0, run_slots=1)
+
+        ids = allocator.take(allocator.capacity)
+
+        assert allocator.capacity == 900
+        assert sorted(ids) == list(range(100, 1000))
+        assert ids[:10] != list(range(100, 110))
+
+    def test_workers_and_runs_are_disjoint(self):
+        """Partitions of every worker and run slot together cover the space without overlap"""
+        partitions = [IdAllocator('order', 4, seed=5, worker=worker, workers=3, run_slot=slot, run_slots=4)
+                      for slot in range(4) for worker in range(3)]
+
+        ids = [i for allocator in partitions for i in allocator.take(allocator.capacity)]
+
+        assert len(ids) == len(set(ids)) == 9000
+        assert min(ids) == 1000 and max(ids) == 9999
+
+    def test_single_and_batch_allocation_agree(self):
+        """take(n) continues the same sequence as n calls to next()"""
+        one, many = (IdAllocator('product', 6, seed=9, worker=1, workers=2) for _ in range(2))
+
+        assert [one.next() for _ in range(50)] + one.take(5) == many.take(55)
+
+    def test_seed_reproduces_ids(self, monkeypatch):
+        """A seed gives the same IDs whatever the run, and namespaces and seeds differ"""
+        monkeypatch.setenv('PYTEST_XDIST_TESTRUNUID', 'run-a')
+        first = IdAllocator('user', 6, seed=3).take(100)
+        monkeypatch.setenv('PYTEST_XDIST_TESTRUNUID', 'run-b')
+
+        assert IdAllocator('user', 6, seed=3).take(100) == first
+        assert IdAllocator('user', 6, seed=4).take(100) != first
+        assert IdAllocator('product', 6, seed=3).take(100) != first
+
+    def test_run_slot_follows_the_run_id(self, monkeypatch):
+        """Workers of one run share a slot; an explicit TEST_DATA_RUN_ID moves seeded runs too"""
+        monkeypatch.setenv('PYTEST_XDIST_TESTRUNUID', 'run-a')
+        monkeypatch.setattr(id_allocator.Config, 'TEST_DATA_RUN_ID', '')
+        slots = {IdAllocator('user', 6, run_slots=1000).run_slot for _ in range(3)}
+        assert len(slots) == 1 and IdAllocator('user', 6, seed=1).run_slot == 0
+
+        monkeypatch.setattr(id_allocator.Config, 'TEST_DATA_RUN_ID', 'nightly')
+        assert IdAllocator('user', 6, seed=1, run_slots=1000).run_slot == IdAllocator('user', 6, run_slots=1000).run_slot != 0
+
+    def test_worker_from_xdist(self, monkeypatch):
+        """The partition is read from the xdist environment"""
+        monkeypatch.delenv('PYTEST_XDIST_WORKER', raising=False)
+        assert worker_partition() == (0, 1)
+        monkeypatch.setenv('PYTEST_XDIST_WORKER', 'gw3')
+        monkeypatch.setenv('PYTEST_XDIST_WORKER_COUNT', '4')
+        assert worker_partition() == (3, 4)
+        assert IdAllocator('user', 6).offset % 4 == 3
+
+    def test_exhaustion(self):
+        """A used-up partition fails loudly instead of repeating IDs"""
+        allocator = IdAllocator('user', 2, seed=1, worker=0, workers=2, run_slot=0, run_slots=2)
+        allocator.take(allocator.capacity)
+
+        with pytest.raises(IdSpaceExhausted, match='user: 23 IDs of 90 per partition'):
+            allocator.next()
+
+    def test_partitions_hold_a_large_run(self, monkeypatch):
+        """With 8 xdist workers and the default run slots each kind still has a million IDs per partition"""
+        monkeypatch.setattr(id_allocator.Config, 'TEST_DATA_ID_RUN_SLOTS', 8)
+
+        for name, digits in ID_DIGITS.items():
+            assert IdAllocator(name, digits, seed=1, worker=7, workers=8).capacity >= 1_000_000, name
+
+    def test_generators_do_not_collide(self):
+        """Unseeded generators share the process's counters, so their records never reuse an ID"""
+        first, second = TestDataGenerator(), TestDataGenerator()
+
+        ids = [first.generate_user()['id'] for _ in range(200)] + second.generate_users(2000).column('id')
+
+        assert len(set(ids)) == len(ids) and all(10 ** 7 <= i < 10 ** 8 for i in ids)
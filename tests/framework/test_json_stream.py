@@ -0,0 +1,153 @@
+import json
+import logging
+import tracemalloc
+import pytest
+import allure
+from utils.api_client import API
+from utils.json_stream import JsonStreamError, assert_items, iter_json_items, iter_json_lines
+from utils.schema_validation import SchemaViolation, schema_registry
+
+DOCUMENT = {
+    'total': 3,
+    'data': {'claims': [{'id': 1, 'owner': 'Zoë Ünal', 'amount': 1234.5e2}, {'id': 22, 'tags': []}, 333],
+             'next_cursor': 'abc'},
+    'flags': [True, False, None],
+}
+
+
+def chunked(data, size):
+    return (data[offset:offset + size] for offset in range(0, len(data), size))
+
+
+def claims(path_params, query):
+    return ({'id': index, 'vin': f'VIN{index:014d}', 'status': 'open'} for index in range(int(query.get('n', 100))))
+
+
+@allure.feature('API Client')
+@allure.story('Streaming JSON')
+class TestJsonStream:
+    @pytest.mark.parametrize('chunk_size', [1, 3, 7, 4096])
+    def test_items_across_chunk_boundaries(self, chunk_size):
+        """Items cut anywhere by chunks, including inside UTF-8 characters and numbers, decode the same"""
+        body = json.dumps(DOCUMENT, ensure_ascii=False, indent=1).encode()
+        envelope = {}
+
+        items = list(iter_json_items(chunked(body, chunk_size), 'data.claims', envelope))
+
+        assert items == DOCUMENT['data']['claims']
+        assert envelope == {'total': 3, 'data': {'next_cursor': 'abc'}, 'flags': [True, False, None]}
+
+    @pytest.mark.parametrize('body, path', [
+        (b'{"total_amount": 1234.5, "claims": [10.25, -3.5e-2, 7E+3, 0, 42]}', 'claims'),
+        (b'[10.25, 3.5]', ''),
+    ])
+    def test_numbers_cut_at_every_offset(self, body, path):
+        """A number split anywhere, e.g. after its '.', 'e' or sign, waits for the rest of it"""
+        document = json.loads(body)
+        for offset in range(1, len(body)):
+            envelope = {}
+            items = list(iter_json_items([body[:offset], body[offset:]], path, envelope))
+            assert items == (document[path] if path else document), offset
+            assert envelope == ({'total_amount': 1234.5} if path else {}), offset
+
+    def test_top_level_and_empty_arrays(self):
+        """A body that is the array itself, or an empty one, needs no path"""
+        assert list(iter_json_items(chunked(b' [1, 2.5e3 ,"x"] ', 2))) == [1, 2500.0, 'x']
+        assert list(iter_json_items([b'[]'])) == []
+        assert list(iter_json_items([b'{"claims": null, "total": 0}'], 'claims')) == []
+
+    @pytest.mark.parametrize('body, path, message', [
+        (b'[{"id": 1}, {"id": ]', '', 'Invalid JSON'),
+        (b'[1, 2', '', "Expected ',' or ']'"),
+        (b'{"total": 0}', 'claims', "no 'claims' array"),
+        (b'[1] [2]', '', 'Unexpected data'),
+    ])
+    def test_malformed_bodies(self, body, path, message):
+        """Truncated or malformed bodies fail with a readable error"""
+        with pytest.raises(JsonStreamError, match=message):
+            list(iter_json_items(chunked(body, 4), path))
+
+    def test_item_size_is_bounded(self):
+        """An item larger than the limit fails instead of growing the buffer without bound"""
+        body = json.dumps([{'blob': 'x' * 10_000}]).encode()
+        with pytest.raises(JsonStreamError, match='larger than 1024 bytes'):
+            list(iter_json_items(chunked(body, 512), max_item_bytes=1024))
+
+    def test_json_lines(self):
+        """Each non-blank line is one value"""
+        assert list(iter_json_lines([b'{"id": 1}', b'', b'{"id": 2}'])) == [{'id': 1}, {'id': 2}]
+        with pytest.raises(JsonStreamError, match='Line 2'):
+            list(iter_json_lines([b'{"id": 1}', b'{"id":']))
+
+    def test_assert_items(self):
+        """Counts and fields are checked item by item, with the failing item in the message"""
+        items = ({'id': index, 'vehicle': {'vin': 'V'}} for index in range(5))
+        assert assert_items(items, count=5, fields=['id', 'vehicle.vin'], where=lambda item: item['id'] >= 0) == 5
+
+        with pytest.raises(AssertionError, match=r"claims\[1\] has no field 'vehicle.vin'"):
+            assert_items(iter([{'vehicle': {'vin': 'V'}}, {'vehicle': {}}]), fields=['vehicle.vin'], description='claims')
+        with pytest.raises(AssertionError, match='Expected at least 3 items, got 2'):
+            assert_items(iter([1, 2]), min_count=3)
+        with pytest.raises(AssertionError, match='More than 1 items'):
+            assert_items(iter([1, 2]), max_count=1)
+
+    def test_api_streams_a_large_list_in_bounded_memory(self, mock_server):
+        """A list far larger than the read size is iterated without holding the body"""
+        mock_server.add_generator_mock('GET', '/api/claims', claims)
+        api = API(base_url=mock_server.url)
+
+        tracemalloc.start()
+        try:
+            with api.stream('/api/claims', params={'n': 50_000}, headers={'Accept-Encoding': 'identity'}) as stream:
+                count = assert_items(stream, fields=['id', 'vin'])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert count == stream.count == 50_000
+        assert stream.response.timing.bytes_received > 2_500_000
+        assert peak < stream.response.timing.bytes_received / 4, f'peak {peak} bytes'
+
+    def test_api_streams_json_lines(self, mock_server):
+        """JSON lines are detected from the Content-Type"""
+        mock_server.add_mock('GET', '/api/events', '{"type": "created"}\n{"type": "closed"}\n',
+                             headers={'Content-Type': 'application/x-ndjson'})
+
+        with API(base_url=mock_server.url).stream('/api/events') as events:
+            assert [event['type'] for event in events] == ['created', 'closed']
+
+    def test_paginate_follows_the_cursor(self, mock_server):
+        """Every page is fetched and streamed until the cursor runs out"""
+        mock_server.add_generator_mock('GET', '/api/claims', claims, page_size=40)
+        api = API(base_url=mock_server.url)
+
+        items = api.paginate('/api/claims', items='items', cursor='next_page', cursor_param='page', params={'n': 100})
+
+        assert [claim['id'] for claim in items] == list(range(100))
+        assert mock_server.count_requests('GET', '/api/claims') == 3
+
+    def test_streamed_items_are_schema_checked(self, mock_server, tmp_path, monkeypatch):
+        """Items are checked against the endpoint's schema as they are consumed"""
+        monkeypatch.setattr(schema_registry, 'directory', tmp_path)
+        (tmp_path / 'api').mkdir()
+        (tmp_path / 'api' / 'claims.GET.json').write_text(json.dumps({'type': 'object', 'properties': {'claims': {
+            'type': 'array', 'items': {'type': 'object', 'required': ['vin']}}}}))
+        mock_server.add_mock('GET', '/api/claims', {'claims': [{'vin': 'A'}, {'id': 2}, {'vin': 'C'}]})
+        api = API(base_url=mock_server.url)
+
+        with api.stream('/api/claims', items='claims') as stream:
+            assert len(list(stream)) == 3
+        assert stream.schema_violations == ["$.claims[1]: missing required property 'vin'"]
+
+        api.schema_validation = 'strict'
+        with pytest.raises(SchemaViolation, match=r"\$\.claims\[1\]"):
+            list(api.stream('/api/claims', items='claims'))
+
+    def test_logging_does_not_consume_the_stream(self, mock_server, caplog):
+        """Call logging leaves a streamed body to its consumer"""
+        mock_server.add_mock('GET', '/api/claims', [{'id': 1}, {'id': 2}])
+
+        with caplog.at_level(logging.DEBUG, logger='utils.api_client'):
+            stream = API(base_url=mock_server.url).stream('/api/claims')
+            assert list(stream) == [{'id': 1}, {'id': 2}]
+        assert '<streamed>' in caplog.text
@@ -0,0 +1,163 @@
+import json
+import pytest
+import allure
+import run_load
+from utils import load
+from utils.api_timing import LatencyBudget
+from utils.auth import TokenProvider
+from utils.load import LatencyHistogram, Scenario, load_feature, run
+
+FEATURE = '''
+Feature: Claims capacity
+
+  Background:
+    Given I am logged in as "agent"
+
+  @weight=3
+  Scenario: Look up a claim
+    When I GET "/api/claims/{random:1-50}"
+    Then the status should be 200
+
+  Scenario: File a claim
+    When I POST "/api/claims" with {"vin": "1HGCM82633A004352"}
+    Then the response status code should be 201
+    And I wait 1 ms
+'''
+
+
+async def browse(api):
+    await api.get('/api/home')
+    response = await api.get('/api/claims/7')
+    assert response.status_code == 200
+
+
+@pytest.fixture
+def claims_api(mock_server):
+    mock_server.add_mock('GET', '/api/home', {'greeting': 'hello'})
+    mock_server.add_mock('GET', '/api/claims/{id}', {'status': 'open'})
+    mock_server.add_mock('POST', '/api/claims', {'id': 1}, status=201)
+    return mock_server
+
+
+@allure.feature('Load Testing')
+@allure.story('Load harness')
+class TestLoad:
+    def test_histogram_precision(self):
+        """Small latencies are exact, large ones within 0.1%, and percentiles follow nearest rank"""
+        histogram = LatencyHistogram()
+        for value in range(1, 10_001):
+            histogram.record_us(value * 1000)
+
+        assert histogram.count == 10_000 and histogram.max_us == 10_000_000
+        for percent, expected in ((50, 5.0), (95, 9.5), (99.9, 9.99), (100, 10.0)):
+            assert histogram.value_at(percent) == pytest.approx(expected, rel=0.001)
+        small = LatencyHistogram()
+        for value in (5, 1500, 2047):
+            small.record_us(value)
+        assert [round(small.value_at(p) * 1_000_000) for p in (33, 66, 100)] == [5, 1500, 2047]
+
+    def test_report_percentiles_never_exceed_max(self):
+        """Report rows convert percentiles and max to milliseconds alike, so p100 is exactly the max"""
+        stats = load.LoadStats()
+        stats.record_iteration('browse', 0.00569)
+        row = load.LoadReport(stats, 'closed', 1.0, 1).rows()[0]
+
+        assert row['p50'] == row['p99'] == row['max']
+
+    def test_histograms_merge(self):
+        """Merged histograms answer as if every sample had been recorded in one"""
+        first, second, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for index, value in enumerate(range(0, 3_000_000, 7_919)):
+            (first if index % 2 else second).record_us(value)
+            both.record_us(value)
+        first.merge(second)
+
+        assert (first.count, first.min_us, first.max_us) == (both.count, both.min_us, both.max_us)
+        assert [first.value_at(p) for p in (50, 90, 99)] == [both.value_at(p) for p in (50, 90, 99)]
+
+    def test_closed_loop(self, claims_api):
+        """Virtual users run scenarios back to back until the iterations are used up"""
+        report = run([Scenario('browse', browse)], users=4, iterations=30, duration=30, base_url=claims_api.url)
+
+        assert report.iterations == 30 and report.requests == 60
+        assert claims_api.count_requests('GET', '/api/home') == 30
+        rows = {row['name']: row for row in report.rows()}
+        assert rows['GET /api/claims/{id}']['count'] == 30 and rows['GET /api/claims/{id}']['errors'] == 0
+        assert 0 < rows['browse']['p50'] <= rows['browse']['p99'] <= rows['browse']['max']
+        assert report.throughput > 0 and not report.stats.errors
+
+    def test_open_loop_keeps_its_rate(self, claims_api):
+        """Arrivals follow the rate even when responses are slow, and latency counts from the schedule"""
+        claims_api.add_mock('GET', '/api/home', {'greeting': 'slow'}, delay=0.3, priority=1)
+
+        report = run([Scenario('browse', browse)], rate=40, duration=0.5, base_url=claims_api.url)
+
+        assert 18 <= report.iterations <= 21
+        assert report.duration < 1.2
+        assert report.stats.scenarios['browse'].value_at(50) >= 0.3
+
+    def test_open_loop_drops_arrivals_over_the_limit(self, claims_api):
+        """Iterations that would exceed max_in_flight are counted as dropped instead of queued"""
+        claims_api.add_mock('GET', '/api/home', {'greeting': 'slow'}, delay=0.3, priority=1)
+
+        report = run([Scenario('browse', browse)], rate=50, duration=0.2, max_in_flight=3, base_url=claims_api.url)
+
+        assert report.iterations == 3 and report.stats.dropped == 7
+
+    def test_failures_are_samples(self, claims_api):
+        """Failed assertions and error statuses are counted without stopping the run"""
+        claims_api.add_mock('GET', '/api/claims/{id}', {'error': 'down'}, status=503, priority=1)
+
+        report = run([Scenario('browse', browse)], users=2, iterations=6, base_url=claims_api.url)
+
+        assert report.iterations == 6 and report.failed_requests == 6
+        assert list(report.stats.errors.values()) == [6]
+        assert 'browse: AssertionError' in report.format()
+
+    def test_feature_scenarios(self, claims_api, tmp_path, monkeypatch):
+        """Feature files define weighted scenarios with authentication, requests, checks and think time"""
+        monkeypatch.setenv('API_AGENT_EMAIL', 'agent@example.com')
+        monkeypatch.setenv('API_AGENT_PASSWORD', 'secret')
+        monkeypatch.setattr(load, 'token_provider', TokenProvider(cache_dir=str(tmp_path)))
+        claims_api.add_mock('POST', '/api/login', {'token': 't1', 'expires_in': 3600})
+        feature = tmp_path / 'claims.feature'
+        feature.write_text(FEATURE)
+
+        scenarios = load_feature(str(feature))
+        report = run(scenarios, users=3, iterations=40, seed=7, base_url=claims_api.url)
+
+        assert [(s.name, s.weight) for s in scenarios] == [('Look up a claim', 3), ('File a claim', 1)]
+        assert not report.stats.errors and report.iterations == 40
+        lookups = report.stats.scenarios['Look up a claim'].count
+        assert 20 < lookups < 40 and report.stats.scenarios['File a claim'].count == 40 - lookups
+        assert claims_api.count_requests('POST', '/api/login') == 1
+        assert all(request['headers'].get('Authorization') == 'Bearer t1'
+                   for request in claims_api.get_requests('POST', '/api/claims'))
+
+    def test_unsupported_steps_are_rejected(self, tmp_path):
+        """A step the harness cannot run fails when the file is loaded, not during the run"""
+        feature = tmp_path / 'bad.feature'
+        feature.write_text('Feature: x\n  Scenario: y\n    When I click the login button\n')
+
+        with pytest.raises(ValueError, match=r"bad.feature:3: unsupported load step 'I click the login button'"):
+            load_feature(str(feature))
+
+    def test_budgets(self, claims_api):
+        """Latency budgets are checked against the endpoint histograms"""
+        report = run([Scenario('browse', browse)], users=1, iterations=5, base_url=claims_api.url)
+
+        assert report.check([LatencyBudget.parse('p95 GET /api/home < 10000ms')]) == []
+        violations = report.check([LatencyBudget.parse('p50 GET /api/home < 0.001ms')])
+        assert len(violations) == 1 and violations[0].startswith('p50 GET /api/home < 0.001ms: p50 was')
+
+    def test_command_line(self, claims_api, tmp_path):
+        """run_load.py runs Python scenario files, writes a report and fails on exceeded budgets"""
+        scenarios = tmp_path / 'scenarios.py'
+        scenarios.write_text('async def scenario_home(api):\n    await api.get("/api/home")\n')
+        report_path = tmp_path / 'report.json'
+        arguments = [str(scenarios), '--users', '2', '--iterations', '10', '--base-url', claims_api.url,
+                     '--report', str(report_path)]
+
+        assert run_load.main(arguments) == 0
+        assert json.loads(report_path.read_text())['requests'] == 10
+        assert run_load.main(arguments + ['--budget', 'p50 GET /api/home < 0.001ms']) == 1
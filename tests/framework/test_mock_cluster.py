@@ -0,0 +1,58 @@
+import allure
+import pytest
+import requests
+from mocks.cluster import MockServerCluster
+
+
+@pytest.fixture(scope="module")
+def cluster():
+    """Two mock server processes sharing one port"""
+    with MockServerCluster(workers=2) as running_cluster:
+        yield running_cluster
+
+
+@allure.feature('Mock Server')
+class TestMockServerCluster:
+
+    @allure.title('Verify runtime mock changes reach every worker')
+    def test_changes_propagate(self, cluster):
+        """
+        Test that added and removed mocks are served by all worker processes on the shared port
+        """
+        mock_id = cluster.add_mock('GET', '/api/claims/{id}', {'status': 'open'})
+        # New connections are spread across workers, so every request may land on a different one
+        for _ in range(10):
+            assert requests.get(f'{cluster.url}/api/claims/1', timeout=5).json() == {'status': 'open'}
+
+        cluster.remove_mock(mock_id)
+        for _ in range(10):
+            assert requests.get(f'{cluster.url}/api/claims/1', timeout=5).status_code == 404
+
+    @allure.title('Verify a replaced mock does not come back when its replacement is removed')
+    def test_replaced_mock_is_forgotten(self, cluster):
+        """
+        Test that re-adding a route drops the earlier definition from what workers rebuild
+        """
+        cluster.add_mock('GET', '/api/x', {'v': 1})
+        replacement = cluster.add_mock('GET', '/api/x', {'v': 2})
+        assert requests.get(f'{cluster.url}/api/x', timeout=5).json() == {'v': 2}
+
+        cluster.remove_mock(replacement)
+        for _ in range(10):
+            assert requests.get(f'{cluster.url}/api/x', timeout=5).status_code == 404
+
+    @allure.title('Verify request counts are summed across workers')
+    def test_counts_are_aggregated(self, cluster):
+        """
+        Test that counts include requests served by every worker and reset together
+        """
+        cluster.clear_requests()
+        mock_id = cluster.add_mock('POST', '/api/login', {'token': 'abc'})
+        for _ in range(12):
+            requests.post(f'{cluster.url}/api/login', json={}, timeout=5)
+
+        assert cluster.count_requests(mock_id=mock_id) == 12
+        assert cluster.count_requests('POST', '/api/login') == 12
+
+        cluster.clear_requests()
+        assert cluster.count_requests() == 0
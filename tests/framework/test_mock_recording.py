@@ -0,0 +1,135 @@
+import gzip
+import json
+import pytest
+import pytest_asyncio
+import allure
+from aiohttp.test_utils import TestClient, TestServer
+from mocks.mock_server import MockServer
+from mocks.recording import Exchange, ReplayMatcher, TrafficArchive
+
+
+@pytest_asyncio.fixture
+async def upstream():
+    """A local stand-in for the real backend, so recording runs offline"""
+    backend = MockServer()
+    server = TestServer(backend.app)
+    await server.start_server()
+    yield backend, str(server.make_url('')).rstrip('/')
+    await server.close()
+
+
+async def _serve(server: MockServer) -> TestClient:
+    client = TestClient(TestServer(server.app))
+    await client.start_server()
+    return client
+
+
+@allure.feature('Mock Server')
+class TestMockRecording:
+
+    @allure.title('Verify recorded traffic replays without the upstream')
+    @pytest.mark.asyncio
+    async def test_record_then_replay(self, upstream, tmp_path):
+        """
+        Test that requests proxied in record mode are archived and served identically in replay mode
+        """
+        backend, upstream_url = upstream
+        backend.add_mock('GET', '/api/claims', {'items': [1, 2]}, headers={'Content-Type': 'application/json',
+                                                                           'X-Request-Id': 'abc'})
+        backend.add_mock('POST', '/api/claims', {'id': 7}, status=201)
+        archive_path = str(tmp_path / 'recordings.json.gz')
+        matcher = ReplayMatcher(ignore_query=['_'], ignore_fields=['timestamp'])
+
+        recorder = MockServer()
+        recorder.start_recording(archive_path, upstream=upstream_url, matcher=matcher)
+        client = await _serve(recorder)
+        response = await client.get('/api/claims', params={'status': 'open', '_': '1'})
+        assert await response.json() == {'items': [1, 2]}
+        response = await client.post('/api/claims', json={'name': 'x', 'timestamp': 1})
+        assert response.status == 201
+        await client.close()
+        await recorder.stop_recording()
+        assert backend.count_requests() == 2
+
+        with gzip.open(archive_path, 'rt') as f:
+            archived = json.load(f)
+        assert len(archived['exchanges']) == 2
+        assert 'X-Request-Id' not in archived['exchanges'][0]['response_headers']
+
+        replayer = MockServer()
+        assert replayer.start_replay(archive_path, matcher=matcher) == 2
+        client = await _serve(replayer)
+        response = await client.get('/api/claims', params={'status': 'open', '_': '2'})
+        assert await response.json() == {'items': [1, 2]}
+        response = await client.post('/api/claims', json={'name': 'x', 'timestamp': 99})
+        assert (response.status, await response.json()) == (201, {'id': 7})
+        response = await client.get('/api/claims', params={'status': 'closed'})
+        assert response.status == 404
+        await client.close()
+        assert backend.count_requests() == 2
+
+    @allure.title('Verify credentials are not written to the archive')
+    @pytest.mark.asyncio
+    async def test_credentials_are_redacted(self, upstream, tmp_path):
+        """
+        Test that auth headers, cookies and secret body fields are masked in the archive, and that
+        requests carrying them still replay
+        """
+        backend, upstream_url = upstream
+        backend.add_mock('POST', '/api/login', {'user': 'amy', 'token': 'tok-123'},
+                         headers={'Content-Type': 'application/json', 'Set-Cookie': 'session=s3cret'})
+        archive_path = str(tmp_path / 'recordings.json.gz')
+        matcher = ReplayMatcher(match_headers=['Authorization'], redact_keys=['authorization', 'cookie',
+                                                                              'password', 'token'])
+        login = {'user': 'amy', 'password': 'hunter2'}
+        headers = {'Authorization': 'Bearer abc', 'Cookie': 'session=old', 'X-Trace': '1'}
+
+        recorder = MockServer()
+        recorder.start_recording(archive_path, upstream=upstream_url, matcher=matcher)
+        client = await _serve(recorder)
+        response = await client.post('/api/login', json=login, headers=headers)
+        assert await response.json() == {'user': 'amy', 'token': 'tok-123'}
+        await client.close()
+        await recorder.stop_recording()
+
+        with gzip.open(archive_path, 'rt') as f:
+            text = f.read()
+        for secret in ('Bearer abc', 'session=old', 'hunter2', 'tok-123', 's3cret'):
+            assert secret not in text
+        exchange = json.loads(text)['exchanges'][0]
+        assert list(exchange['headers']) == ['Authorization']
+
+        replayer = MockServer()
+        replayer.start_replay(archive_path, matcher=matcher)
+        client = await _serve(replayer)
+        response = await client.post('/api/login', json=login, headers=headers)
+        assert (response.status, await response.json()) == (200, {'user': 'amy', 'token': '***'})
+        response = await client.post('/api/login', json=login, headers={'Authorization': 'Bearer other'})
+        assert response.status == 404
+        await client.close()
+
+    @allure.title('Verify repeated recordings replay in order and re-recording replaces them')
+    def test_sequences_and_merge(self, tmp_path):
+        """
+        Test that the archive keeps call order per request and merges saves by request key
+        """
+        path = str(tmp_path / 'archive.json.gz')
+        archive = TrafficArchive(path)
+        for count in (0, 1):
+            archive.add(Exchange('GET', '/api/cart', [], {}, '', 200, {}, json.dumps({'count': count}).encode()))
+        archive.add(Exchange('GET', '/api/logo', [], {}, '', 200, {}, b'\x89PNG'))
+        archive.save()
+
+        replay = TrafficArchive(path).load()
+        bodies = [replay.lookup('GET', '/api/cart', [], {}, '').response_body for _ in range(3)]
+        assert bodies == [b'{"count": 0}', b'{"count": 1}', b'{"count": 1}']
+        assert replay.lookup('GET', '/api/logo', [], {}, '').response_body == b'\x89PNG'
+        assert replay.lookup('GET', '/api/cart', [('page', '2')], {}, '') is None
+        assert replay.lookup('GET', '/api/cart', [('page', '2')], {}, '', strict=False) is not None
+
+        rerecorded = TrafficArchive(path)
+        rerecorded.add(Exchange('GET', '/api/cart', [], {}, '', 200, {}, b'{"count": 5}'))
+        rerecorded.save()
+        merged = TrafficArchive(path).load()
+        assert len(merged) == 2
+        assert merged.lookup('GET', '/api/cart', [], {}, '').response_body == b'{"count": 5}'
@@ -0,0 +1,78 @@
+import pytest
+import allure
+from mocks.router import Router
+
+
+@allure.feature('Mock Server Router')
+class TestRouter:
+
+    @pytest.fixture
+    def router(self):
+        return Router()
+
+    @allure.title('Verify path parameters, globs and regex routes')
+    def test_pattern_kinds(self, router):
+        """
+        Test that every supported pattern kind matches and extracts parameters
+        """
+        router.add('GET', '/api/claims/{id}', 'claim')
+        router.add('GET', '/api/agents/{agent_id:\\d+}/policies', 'policies')
+        router.add('GET', '/assets/*.css', 'css')
+        router.add('GET', '/files/**', 'files')
+        router.add('GET', 're:^/api/v(?P<version>\\d+)/status$', 'status')
+
+        assert router.match('GET', '/api/claims/123').params == {'id': '123'}
+        assert router.match('GET', '/api/claims/456').route.payload == 'claim'
+        assert router.match('GET', '/api/agents/42/policies').params == {'agent_id': '42'}
+        assert router.match('GET', '/api/agents/abc/policies') is None
+        assert router.match('GET', '/assets/site.css').route.payload == 'css'
+        assert router.match('GET', '/files/docs/a/b.pdf').params == {'tail': 'docs/a/b.pdf'}
+        assert router.match('GET', '/api/v2/status').params == {'version': '2'}
+        assert router.match('POST', '/api/claims/123') is None
+
+    @allure.title('Verify precedence: priority, then specificity, then latest')
+    def test_precedence(self, router):
+        """
+        Test that exact beats templated, explicit priority beats both, and re-adding replaces
+        """
+        router.add('GET', '/api/claims/{id}', 'templated')
+        router.add('GET', '/api/claims/special', 'exact')
+        router.add('*', '/api/**', 'fallback')
+
+        assert router.match('GET', '/api/claims/special').route.payload == 'exact'
+        assert router.match('GET', '/api/claims/1').route.payload == 'templated'
+        assert router.match('DELETE', '/api/claims/1').route.payload == 'fallback'
+
+        router.add('*', '/api/**', 'override', priority=10)
+        assert router.match('GET', '/api/claims/special').route.payload == 'override'
+        assert len(router) == 3
+
+    @allure.title('Verify query and header matchers')
+    def test_query_and_header_matchers(self, router):
+        """
+        Test that request matchers select between mocks of the same path
+        """
+        router.add('GET', '/api/claims', 'all')
+        router.add('GET', '/api/claims', 'open', query={'status': 'open'})
+        router.add('GET', '/api/claims', 'paged', query={'page': 're:\\d+'})
+        router.add('GET', '/api/claims', 'authorized', headers={'Authorization': None}, priority=5)
+
+        assert router.match('GET', '/api/claims').route.payload == 'all'
+        assert router.match('GET', '/api/claims', query={'status': 'open'}).route.payload == 'open'
+        assert router.match('GET', '/api/claims', query={'page': 'x'}).route.payload == 'all'
+        assert router.match('GET', '/api/claims', query={'page': '2'}).route.payload == 'paged'
+        assert router.match('GET', '/api/claims', headers={'authorization': 'Bearer t'}).route.payload == 'authorized'
+
+    @allure.title('Verify removing routes')
+    def test_remove(self, router):
+        """
+        Test that removed routes no longer match
+        """
+        templated = router.add('GET', '/api/claims/{id}', 'claim')
+        rest = router.add('GET', '/files/**', 'files')
+
+        assert router.remove(templated.id)
+        assert router.remove(rest.id)
+        assert not router.remove(rest.id)
+        assert router.match('GET', '/api/claims/1') is None
+        assert router.match('GET', '/files/a') is None
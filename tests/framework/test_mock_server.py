@@ -0,0 +1,117 @@
+import pytest
+import pytest_asyncio
+import allure
+import requests
+from aiohttp.test_utils import TestClient, TestServer
+from mocks.mock_server import MockServer, MockServerThread
+
+
+@pytest_asyncio.fixture
+async def mock_client():
+    """Serve a MockServer app in-process and return (server, client)"""
+    server = MockServer()
+    client = TestClient(TestServer(server.app))
+    await client.start_server()
+    yield server, client
+    await client.close()
+
+
+@allure.feature('Mock Server')
+class TestMockServer:
+
+    @allure.title('Verify one templated mock serves many ids')
+    @pytest.mark.asyncio
+    async def test_templated_mock(self, mock_client):
+        """
+        Test that a path parameter mock answers for any id and logs the match
+        """
+        server, client = mock_client
+        mock_id = server.add_mock('GET', '/api/claims/{id}', {'status': 'open'})
+
+        for claim_id in ('123', '456'):
+            response = await client.get(f'/api/claims/{claim_id}')
+            assert response.status == 200
+            assert await response.json() == {'status': 'open'}
+
+        assert [entry['params'] for entry in server.get_requests(mock_id=mock_id)] == [{'id': '123'}, {'id': '456'}]
+        assert server.count_requests('GET', '/api/claims/123') == 1
+        assert server.count_requests(mock_id=mock_id) == 2
+
+    @allure.title('Verify removed and unmatched mocks return 404')
+    @pytest.mark.asyncio
+    async def test_unmatched_returns_404(self, mock_client):
+        """
+        Test that requests without a matching mock get the 404 error body
+        """
+        server, client = mock_client
+        server.remove_mock(server.add_mock('GET', '/api/home', {'ok': True}))
+
+        response = await client.get('/api/home')
+
+        assert response.status == 404
+        assert await response.json() == {'error': 'No mock found for this request'}
+
+    @allure.title('Verify responses are compressed and revalidated with ETags')
+    @pytest.mark.asyncio
+    async def test_compression_and_etag(self, mock_client):
+        """
+        Test that large JSON bodies are gzip encoded on request and If-None-Match returns 304
+        """
+        server, client = mock_client
+        claims = {'items': [{'id': index, 'status': 'open'} for index in range(200)]}
+        server.add_mock('GET', '/api/claims', claims)
+
+        response = await client.get('/api/claims', headers={'Accept-Encoding': 'br, gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert await response.json() == claims
+
+        plain = await client.get('/api/claims', headers={'Accept-Encoding': 'identity'})
+        assert 'Content-Encoding' not in plain.headers
+        assert plain.headers['ETag'] == response.headers['ETag']
+
+        cached = await client.get('/api/claims', headers={'If-None-Match': response.headers['ETag']})
+        assert cached.status == 304
+        assert await cached.read() == b''
+
+    @allure.title('Verify file mocks are served from disk')
+    @pytest.mark.asyncio
+    async def test_file_mock(self, mock_client, tmp_path):
+        """
+        Test that a file mock returns the file content
+        """
+        server, client = mock_client
+        document = tmp_path / "policy.pdf"
+        document.write_bytes(b"%PDF-1.4 " + b"x" * 4096)
+        server.add_file_mock('GET', '/documents/{name}', str(document),
+                             headers={'Content-Type': 'application/pdf'})
+
+        response = await client.get('/documents/policy.pdf')
+
+        assert response.status == 200
+        assert response.headers['Content-Type'] == 'application/pdf'
+        assert await response.read() == document.read_bytes()
+
+
+@allure.feature('Mock Server')
+class TestMockServerThread:
+
+    @allure.title('Verify the threaded mock server serves synchronous clients')
+    def test_sync_api_on_ephemeral_port(self):
+        """
+        Test that the background server binds an OS-assigned port and is driven without an event loop
+        """
+        server = MockServerThread(port=0).start()
+        try:
+            assert server.port != 0
+            mock_id = server.add_mock('GET', '/api/ping', {'pong': True})
+
+            response = requests.get(f'{server.url}/api/ping', timeout=5)
+            assert response.json() == {'pong': True}
+            assert server.count_requests(mock_id=mock_id) == 1
+
+            server.reset()
+            assert requests.get(f'{server.url}/api/ping', timeout=5).status_code == 404
+            assert server.count_requests('GET', '/api/ping') == 1
+        finally:
+            server.stop()
+        assert not server.is_running
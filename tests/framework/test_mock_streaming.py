@@ -0,0 +1,113 @@
+import hashlib
+import os
+import pytest
+import pytest_asyncio
+import allure
+from aiohttp.test_utils import TestClient, TestServer
+from mocks.mock_server import MockServer
+from mocks.streaming import RangeNotSatisfiable, parse_range
+
+
+@pytest_asyncio.fixture
+async def mock_client():
+    """Serve a MockServer app in-process and return (server, client)"""
+    server = MockServer()
+    client = TestClient(TestServer(server.app))
+    await client.start_server()
+    yield server, client
+    await client.close()
+
+
+def _claims(params, query):
+    """An endless claim list; only what a response needs is ever generated"""
+    index = 0
+    while True:
+        yield {'id': index, 'status': query.get('status', 'open')}
+        index += 1
+
+
+@allure.feature('Mock Server')
+class TestMockStreaming:
+
+    @allure.title('Verify memory-mapped file mocks stream whole bodies and byte ranges')
+    @pytest.mark.asyncio
+    async def test_mapped_file_ranges(self, mock_client, tmp_path):
+        """
+        Test full downloads, single ranges, suffix ranges and unsatisfiable ranges
+        """
+        server, client = mock_client
+        document = tmp_path / 'claim.pdf'
+        content = os.urandom(300 * 1024)
+        document.write_bytes(content)
+        server.add_file_mock('GET', '/documents/{name}', str(document), mmap=True)
+
+        response = await client.get('/documents/claim.pdf')
+        assert response.status == 200
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        assert response.headers['Content-Type'] == 'application/pdf'
+        assert await response.read() == content
+
+        response = await client.get('/documents/claim.pdf', headers={'Range': 'bytes=100000-100099'})
+        assert response.status == 206
+        assert response.headers['Content-Range'] == f'bytes 100000-100099/{len(content)}'
+        assert await response.read() == content[100000:100100]
+
+        response = await client.get('/documents/claim.pdf', headers={'Range': 'bytes=-10'})
+        assert await response.read() == content[-10:]
+
+        response = await client.get('/documents/claim.pdf', headers={'Range': f'bytes={len(content)}-'})
+        assert response.status == 416
+
+    @allure.title('Verify generator mocks page lazily or stream a JSON array')
+    @pytest.mark.asyncio
+    async def test_generator_mocks(self, mock_client):
+        """
+        Test that an endless generator can back a paginated endpoint and a finite one a streamed list
+        """
+        server, client = mock_client
+        server.add_generator_mock('GET', '/api/claims', _claims, page_size=25)
+        server.add_generator_mock('GET', '/api/claims/export', lambda params, query: ({'id': i} for i in range(50000)))
+
+        page = await (await client.get('/api/claims', params={'page': '3', 'status': 'closed'})).json()
+        assert [claim['id'] for claim in page['items']] == list(range(50, 75))
+        assert page['items'][0]['status'] == 'closed'
+        assert (page['has_more'], page['next_page']) == (True, 4)
+
+        response = await client.get('/api/claims/export')
+        assert response.headers.get('Transfer-Encoding') == 'chunked'
+        exported = await response.json()
+        assert len(exported) == 50000 and exported[-1] == {'id': 49999}
+
+    @allure.title('Verify uploads are consumed as a stream and journaled by size and digest')
+    @pytest.mark.asyncio
+    async def test_streamed_upload(self, mock_client):
+        """
+        Test that a large upload keeps only the journal's body prefix plus its size and SHA-256
+        """
+        server, client = mock_client
+        mock_id = server.add_mock('POST', '/api/claims/{id}/photos', {'uploaded': True}, status=201)
+        photo = os.urandom(2 * 1024 * 1024)
+
+        response = await client.post('/api/claims/7/photos', data=photo,
+                                     headers={'Content-Type': 'application/octet-stream'})
+        assert response.status == 201
+
+        entry = server.get_requests(mock_id=mock_id)[0]
+        assert entry['body_size'] == len(photo)
+        assert entry['body_sha256'] == hashlib.sha256(photo).hexdigest()
+        assert entry['body_truncated'] is True
+        assert len(entry['body']) <= server.journal.max_body_bytes
+
+    @allure.title('Verify Range header parsing')
+    def test_parse_range(self):
+        """
+        Check the supported single-range forms
+        """
+        assert parse_range('bytes=0-9', 100) == (0, 9)
+        assert parse_range('bytes=90-', 100) == (90, 99)
+        assert parse_range('bytes=-5', 100) == (95, 99)
+        assert parse_range('bytes=50-500', 100) == (50, 99)
+        assert parse_range('bytes=0-1,5-6', 100) is None
+        assert parse_range(None, 100) is None
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range('bytes=100-', 100)
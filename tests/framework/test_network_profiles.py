@@ -0,0 +1,94 @@
+import time
+import aiohttp
+import pytest
+import pytest_asyncio
+import allure
+from aiohttp.test_utils import TestClient, TestServer
+from mocks.mock_server import MockServer
+from mocks.profiles import ERROR, RESET, LatencyModel, NetworkProfile, get_profile
+
+
+@pytest_asyncio.fixture
+async def mock_client():
+    """Serve a MockServer app in-process and return (server, client)"""
+    server = MockServer()
+    client = TestClient(TestServer(server.app))
+    await client.start_server()
+    yield server, client
+    await client.close()
+
+
+@allure.feature('Mock Server')
+class TestNetworkProfiles:
+
+    @allure.title('Verify profile decisions are deterministic per endpoint call')
+    def test_seeded_plans_do_not_depend_on_interleaving(self):
+        """
+        Test that the nth call to an endpoint gets the same plan whatever other endpoints were called
+        """
+        first, second = get_profile('flaky', seed=7), get_profile('flaky', seed=7)
+        sequential = [first.plan('GET', '/api/a') for _ in range(50)]
+        interleaved = []
+        for _ in range(50):
+            second.plan('POST', '/api/b')
+            interleaved.append(second.plan('GET', '/api/a'))
+        assert sequential == interleaved
+        assert get_profile('flaky', seed=8).plan('GET', '/api/a') != sequential[0]
+
+    @allure.title('Verify long-tail latency follows the configured percentiles')
+    def test_percentile_latency(self):
+        """
+        Test that sampled latencies land near the configured percentiles
+        """
+        profile = NetworkProfile(latency={'percentiles': {50: 100, 90: 500, 99: 3000}}, seed=1)
+        samples = sorted(profile.plan('GET', '/x').delay * 1000 for _ in range(5000))
+        assert 80 < samples[2500] < 120
+        assert 440 < samples[4400] < 520
+        assert samples[-1] <= 3000
+        assert LatencyModel.parse(25).sample(None) == 25
+
+    @allure.title('Verify injected error rates match the profile')
+    def test_fault_rates(self):
+        """
+        Test that error and reset rates are honoured over many calls
+        """
+        profile = NetworkProfile(error_rate=0.2, reset_rate=0.1, seed=3)
+        faults = [profile.plan('GET', '/x').fault for _ in range(5000)]
+        assert 0.17 < faults.count(ERROR) / 5000 < 0.23
+        assert 0.08 < faults.count(RESET) / 5000 < 0.12
+        with pytest.raises(ValueError):
+            NetworkProfile(error_rate=0.8, reset_rate=0.3)
+
+    @allure.title('Verify per-mock profiles inject errors and resets')
+    @pytest.mark.asyncio
+    async def test_server_faults(self, mock_client):
+        """
+        Test that a mock's own profile overrides the server-wide one
+        """
+        server, client = mock_client
+        server.set_profile(NetworkProfile(latency=1))
+        server.add_mock('GET', '/api/ok', {'ok': True})
+        server.add_mock('GET', '/api/down', {}, profile=NetworkProfile(error_rate=1.0, error_status=502))
+        server.add_mock('GET', '/api/reset', {}, profile=NetworkProfile(reset_rate=1.0))
+
+        assert (await client.get('/api/ok')).status == 200
+        assert (await client.get('/api/down')).status == 502
+        with pytest.raises(aiohttp.ClientError):
+            await client.get('/api/reset')
+
+    @allure.title('Verify bodies are throttled to the profile bandwidth')
+    @pytest.mark.asyncio
+    async def test_bandwidth_throttling(self, mock_client):
+        """
+        Test that a 2 KB body at 8 KB/s takes about a quarter of a second and arrives intact
+        """
+        server, client = mock_client
+        server.add_mock('GET', '/api/blob', 'x' * 2048, profile=NetworkProfile(bandwidth_kbps=8))
+
+        started = time.monotonic()
+        response = await client.get('/api/blob', headers={'Accept-Encoding': 'identity'})
+        body = await response.text()
+        elapsed = time.monotonic() - started
+
+        assert body == 'x' * 2048
+        assert 0.2 < elapsed < 1.0
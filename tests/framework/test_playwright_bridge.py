@@ -0,0 +1,88 @@
+import allure
+from mocks.mock_server import MockServer
+from mocks.playwright_bridge import PlaywrightMockBridge
+from mocks.profiles import NetworkProfile
+
+
+class FakeRequest:
+    def __init__(self, url, method='GET', headers=None, post_data=None):
+        self.url = url
+        self.method = method
+        self.headers = headers or {}
+        self.post_data = post_data
+
+
+class FakeRoute:
+    """Records what the bridge did with an intercepted request"""
+
+    def __init__(self, request):
+        self.request = request
+        self.outcome = None
+
+    def fulfill(self, **kwargs):
+        self.outcome = ('fulfill', kwargs)
+
+    def abort(self, error_code='failed'):
+        self.outcome = ('abort', error_code)
+
+    def fallback(self):
+        self.outcome = ('fallback', None)
+
+
+def _intercept(bridge, url, **kwargs):
+    route = FakeRoute(FakeRequest(url, **kwargs))
+    bridge.handle(route)
+    return route.outcome
+
+
+@allure.feature('Mock Server')
+class TestPlaywrightBridge:
+
+    @allure.title('Verify matched requests are fulfilled in-process and journaled')
+    def test_fulfills_matching_mocks(self):
+        """
+        Test that a mock is served without starting the server and unmatched requests fall through
+        """
+        server = MockServer()
+        mock_id = server.add_mock('GET', '/api/claims/{id}', {'status': 'open'})
+        bridge = PlaywrightMockBridge(server)
+
+        kind, response = _intercept(bridge, 'https://sys.example.com/api/claims/7?full=1')
+        assert kind == 'fulfill'
+        assert response['status'] == 200
+        assert response['body'] == b'{"status": "open"}'
+        assert 'Content-Encoding' not in response['headers']
+
+        assert _intercept(bridge, 'https://sys.example.com/app.js')[0] == 'fallback'
+        assert server.get_requests(mock_id=mock_id)[0]['query'] == {'full': '1'}
+        assert server.count_requests() == 2
+        assert (bridge.fulfilled, bridge.passed_through) == (1, 1)
+
+    @allure.title('Verify network profile faults apply to intercepted requests')
+    def test_profile_faults(self):
+        """
+        Test that injected errors and resets use Playwright's fulfill and abort
+        """
+        server = MockServer()
+        server.add_mock('POST', '/api/login', {}, profile=NetworkProfile(error_rate=1.0, error_status=503))
+        server.add_mock('GET', '/api/reset', {}, profile=NetworkProfile(reset_rate=1.0))
+        server.add_mock('GET', '/api/slow', {}, profile=NetworkProfile(timeout_rate=1.0))
+        bridge = PlaywrightMockBridge(server)
+
+        kind, response = _intercept(bridge, 'http://localhost/api/login', method='POST', post_data='{}')
+        assert (kind, response['status']) == ('fulfill', 503)
+        assert _intercept(bridge, 'http://localhost/api/reset') == ('abort', 'connectionreset')
+        assert _intercept(bridge, 'http://localhost/api/slow') == ('abort', 'timedout')
+
+    @allure.title('Verify ETags are honoured for intercepted requests')
+    def test_not_modified(self):
+        """
+        Test that a matching If-None-Match header gets a 304
+        """
+        server = MockServer()
+        server.add_mock('GET', '/api/config', {'theme': 'dark'})
+        bridge = PlaywrightMockBridge(server)
+        etag = _intercept(bridge, 'http://localhost/api/config')[1]['headers']['ETag']
+
+        kind, response = _intercept(bridge, 'http://localhost/api/config', headers={'if-none-match': etag})
+        assert response['status'] == 304
@@ -0,0 +1,70 @@
+import json
+import pytest
+import allure
+from mocks.journal import RequestJournal
+
+
+def _request(method, path, mock_id=None, body=""):
+    return {'method': method, 'path': path, 'mock_id': mock_id, 'body': body}
+
+
+@allure.feature('Mock Server Journal')
+class TestRequestJournal:
+
+    @allure.title('Verify the journal is bounded but counts stay exact')
+    def test_ring_buffer_keeps_exact_counts(self):
+        """
+        Test that old requests are evicted from memory while per-key counts keep every request
+        """
+        journal = RequestJournal(capacity=3)
+        for _ in range(4):
+            journal.record(_request('POST', '/api/login', 'mock-1'))
+        journal.record(_request('GET', '/api/home', 'mock-2'))
+
+        assert len(journal) == 3
+        assert journal.count('POST', '/api/login') == 4
+        assert journal.count(mock_id='mock-1') == 4
+        assert journal.count('GET') == 1
+        assert journal.count() == 5
+        assert len(journal.find('POST', '/api/login')) == 2
+        assert [entry['path'] for entry in journal.find(path='/api/home')] == ['/api/home']
+
+    @allure.title('Verify bodies are truncated in memory and kept whole in the spill file')
+    def test_truncation_and_spill(self, tmp_path):
+        """
+        Test that the in-memory entry is truncated and the JSONL spill holds the full body
+        """
+        spill_path = tmp_path / "journal.jsonl"
+        journal = RequestJournal(max_body_bytes=8, spill_path=str(spill_path))
+        journal.record(_request('POST', '/api/claims', body='x' * 100))
+        journal.close()
+
+        entry = journal.find()[0]
+        assert entry['body'] == 'x' * 8
+        assert entry['body_truncated'] and entry['body_size'] == 100
+        assert '_keys' not in entry
+        assert json.loads(spill_path.read_text())['body'] == 'x' * 100
+
+    @allure.title('Verify sampling is reproducible under a seed')
+    def test_sampling_is_seeded(self):
+        """
+        Test that sampled journals keep the same subset for the same seed and still count everything
+        """
+        kept = []
+        for _ in range(2):
+            journal = RequestJournal(sample_rate=0.25, seed=7)
+            for index in range(200):
+                journal.record(_request('GET', f'/api/claims/{index}'))
+            kept.append([entry['path'] for entry in journal.find()])
+            assert journal.count('GET') == 200
+
+        assert kept[0] == kept[1]
+        assert 20 < len(kept[0]) < 80
+
+    @allure.title('Verify invalid capacity is rejected')
+    def test_invalid_capacity(self):
+        """
+        Test that a journal cannot be created without room for requests
+        """
+        with pytest.raises(ValueError):
+            RequestJournal(capacity=0)
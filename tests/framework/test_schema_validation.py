@@ -0,0 +1,173 @@
+import json
+import os
+import pytest
+import allure
+from config.config import Config
+from utils.api_client import API
+from utils.schema_validation import SchemaRegistry, SchemaViolation, compile_schema, schema_registry
+
+CLAIM = {
+    'type': 'object',
+    'required': ['id', 'status', 'vehicle'],
+    'additionalProperties': False,
+    'properties': {
+        'id': {'type': 'integer', 'minimum': 1},
+        'status': {'enum': ['open', 'approved', 'rejected']},
+        'vehicle': {'$ref': '#/$defs/vehicle'},
+        'photos': {'type': 'array', 'items': {'type': 'string', 'format': 'uri'}, 'maxItems': 3},
+        'adjuster': {'type': 'string', 'nullable': True},
+    },
+    '$defs': {
+        'vehicle': {
+            'type': 'object',
+            'required': ['vin'],
+            'properties': {'vin': {'type': 'string', 'pattern': '^[A-HJ-NPR-Z0-9]{17}$'},
+                           'year': {'type': 'integer', 'minimum': 1950, 'maximum': 2030}},
+        },
+    },
+}
+VALID_CLAIM = {'id': 7, 'status': 'open', 'vehicle': {'vin': '1HGCM82633A004352', 'year': 2004},
+               'photos': ['https://cdn.example.com/1.jpg'], 'adjuster': None}
+
+
+@pytest.fixture
+def schema_dir(tmp_path, monkeypatch):
+    """Endpoint schemas in a temporary directory, used by every API client"""
+    monkeypatch.setattr(schema_registry, 'directory', tmp_path)
+    return tmp_path
+
+
+def write_schema(directory, name, schema):
+    path = directory / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(schema))
+    return path
+
+
+@allure.feature('API Client')
+@allure.story('Response schema validation')
+class TestSchemaValidation:
+    def test_valid_payload(self):
+        """A payload matching the schema has no violations"""
+        assert compile_schema(CLAIM).errors(VALID_CLAIM) == []
+
+    def test_violations_name_the_offending_field(self):
+        """Each violation is one line with the JSON path of the value"""
+        claim = {**VALID_CLAIM, 'id': 0, 'status': 'lost', 'vehicle': {'vin': 'short', 'year': 2004.5},
+                 'photos': ['not a uri'], 'extra': True}
+
+        assert sorted(compile_schema(CLAIM).errors(claim)) == sorted([
+            '$.id: 0 is less than minimum 1',
+            '$.status: "lost" is not one of "open", "approved", "rejected"',
+            '$.vehicle.vin: "short" does not match ^[A-HJ-NPR-Z0-9]{17}$',
+            '$.vehicle.year: expected integer, got number',
+            '$.photos[0]: "not a uri" is not a valid uri',
+            "$: unexpected property 'extra'",
+        ])
+
+    def test_types_and_combinators(self):
+        """Booleans are not numbers, and anyOf/oneOf/not report the composite"""
+        validator = compile_schema({'type': 'array', 'items': {'oneOf': [{'type': 'integer'}, {'type': 'number', 'minimum': 10}]},
+                                    'uniqueItems': True, 'not': {'maxItems': 0}})
+
+        assert validator.errors([1, 2.5, True]) == ['$[1]: matches none of the oneOf schemas',
+                                                    '$[2]: matches none of the oneOf schemas']
+        assert validator.errors([12, 12]) == ['$[0]: matches 2 of the oneOf schemas, expected exactly one',
+                                              '$[1]: matches 2 of the oneOf schemas, expected exactly one',
+                                              '$: items are not unique']
+        assert validator.errors([]) == ["$: must not match the 'not' schema"]
+
+    def test_any_of_and_one_of_together(self):
+        """A schema with both anyOf and oneOf checks each of them"""
+        validator = compile_schema({'anyOf': [{'type': 'integer'}, {'type': 'string'}],
+                                    'oneOf': [{'type': 'integer'}, {'type': 'number'}]})
+
+        assert validator.errors(3) == ['$: matches 2 of the oneOf schemas, expected exactly one']
+        assert validator.errors(2.5) == ['$: matches none of the anyOf schemas']
+        assert validator.errors('x') == ['$: matches none of the oneOf schemas']
+
+    def test_multiple_of_decimal_steps(self):
+        """Prices that are whole cents pass multipleOf 0.01 despite binary floating point"""
+        validator = compile_schema({'type': 'number', 'multipleOf': 0.01})
+
+        assert validator.errors(19.99) == validator.errors(0.07) == validator.errors(1e6) == []
+        assert validator.errors(0.075) == ['$: 0.075 is not a multiple of 0.01']
+
+    def test_recursive_refs(self):
+        """A schema can refer to itself, e.g. a category tree"""
+        tree = {'$ref': '#/$defs/node', '$defs': {'node': {
+            'type': 'object', 'required': ['name'],
+            'properties': {'name': {'type': 'string'}, 'children': {'type': 'array', 'items': {'$ref': '#/$defs/node'}}}}}}
+
+        assert compile_schema(tree).errors({'name': 'a', 'children': [{'name': 'b', 'children': [{}]}]}) == [
+            "$.children[0].children[0]: missing required property 'name'"]
+
+    def test_report_is_capped(self):
+        """Past the limit the report summarises the remaining violations"""
+        with pytest.raises(SchemaViolation) as error:
+            compile_schema({'type': 'array', 'items': {'type': 'string'}}).validate(list(range(25)), 'GET /api/tags')
+
+        message = str(error.value)
+        assert message.startswith('GET /api/tags violates its schema (25):')
+        assert f"  ... and {25 - Config.API_SCHEMA_MAX_ERRORS} more" in message
+        assert len(error.value.violations) == 25
+
+    def test_validators_are_cached_by_schema_content(self):
+        """The same schema is compiled once, a changed one again"""
+        assert compile_schema(json.loads(json.dumps(CLAIM))) is compile_schema(CLAIM)
+        assert compile_schema({**CLAIM, 'required': ['id']}) is not compile_schema(CLAIM)
+
+    def test_registry_per_endpoint_and_version(self, tmp_path):
+        """Ids are folded out of the URL, and a changed schema file is picked up"""
+        path = write_schema(tmp_path, 'api/claims/{id}.GET.json', {'type': 'object', 'required': ['id']})
+        registry = SchemaRegistry(str(tmp_path))
+
+        first = registry.for_endpoint('GET', 'http://api.local/api/claims/42?expand=photos')
+        assert first is registry.for_endpoint('get', '/api/claims/7')
+        assert registry.for_endpoint('DELETE', '/api/claims/7') is None
+
+        path.write_text(json.dumps({'type': 'object', 'required': ['id', 'status']}))
+        os.utime(path, ns=(0, 0))
+        assert registry.for_endpoint('GET', '/api/claims/7').errors({'id': 1}) == ["$: missing required property 'status'"]
+
+    def test_streamed_items_are_checked_as_they_arrive(self):
+        """Items before the first invalid one are delivered, item counts are checked at the end"""
+        validator = compile_schema({'type': 'object', 'properties': {
+            'claims': {'type': 'array', 'items': {'type': 'object', 'required': ['id']}, 'minItems': 1}}})
+        delivered = []
+
+        with pytest.raises(SchemaViolation, match=r"\$\.claims\[2\]: missing required property 'id'"):
+            for item in validator.iter_validated(iter([{'id': 1}, {'id': 2}, {}, {'id': 4}]), '/properties/claims'):
+                delivered.append(item)
+        assert delivered == [{'id': 1}, {'id': 2}]
+
+        with pytest.raises(SchemaViolation, match='0 items, fewer than minItems 1'):
+            list(validator.iter_validated(iter([]), '/properties/claims'))
+
+    def test_api_warns_about_violations(self, mock_server, schema_dir, caplog):
+        """By default a violating response is logged and returned with its violations"""
+        write_schema(schema_dir, 'api/claims/{id}.GET.json', CLAIM)
+        mock_server.add_mock('GET', '/api/claims/7', VALID_CLAIM)
+        mock_server.add_mock('GET', '/api/claims/8', {**VALID_CLAIM, 'status': 'lost'})
+        api = API(base_url=mock_server.url)
+
+        assert api.get('/api/claims/7').schema_violations == []
+        response = api.get('/api/claims/8')
+
+        assert response.status_code == 200
+        assert response.schema_violations == ['$.status: "lost" is not one of "open", "approved", "rejected"']
+        assert 'violates its schema' in caplog.text
+
+    def test_strict_mode_fails_the_call(self, mock_server, schema_dir):
+        """In strict mode a violating response raises; errors and endpoints without a schema are not checked"""
+        write_schema(schema_dir, 'api/claims/{id}.GET.json', CLAIM)
+        mock_server.add_mock('GET', '/api/claims/8', {'id': 8})
+        mock_server.add_mock('GET', '/api/claims/9', {'error': 'not found'}, status=404)
+        mock_server.add_mock('GET', '/api/home', {'anything': 'goes'})
+        api = API(base_url=mock_server.url)
+        api.schema_validation = 'strict'
+
+        with pytest.raises(SchemaViolation, match=r"GET .*/api/claims/8 violates its schema \(2\)"):
+            api.get('/api/claims/8')
+        assert api.get('/api/claims/9').status_code == 404
+        assert api.get('/api/home').status_code == 200
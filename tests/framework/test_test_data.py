@@ -0,0 +1,58 @@
+import json
+import pytest
+import allure
+from utils.test_data import RecordBatch, TestDataGenerator
+
+
+@allure.feature('Test Data')
+@allure.story('Batch generation')
+class TestBatchGeneration:
+    def test_users_have_the_per_record_shape(self):
+        """Batch rows have the same fields as generate_user(), nested address included"""
+        generator = TestDataGenerator(seed=1)
+        users = generator.generate_users(50, include_address=True)
+
+        assert len(users) == 50
+        assert set(users[0]) == set(generator.generate_user(include_address=True))
+        assert set(users[-1]['address']) == {'street', 'city', 'state', 'country', 'postcode'}
+        assert all(user['email'].startswith(user['username'] + '@') for user in users)
+        assert len(set(users.column('id'))) == 50
+
+    def test_same_seed_same_batches(self):
+        """A seed reproduces the whole sequence of batches"""
+        first, second = TestDataGenerator(seed=42), TestDataGenerator(seed=42)
+
+        assert first.generate_users(20).to_list() == second.generate_users(20).to_list()
+        assert first.generate_products(20).to_list() == second.generate_products(20).to_list()
+        assert first.generate_orders(20).to_list() == second.generate_orders(20).to_list()
+        assert TestDataGenerator(seed=43).generate_users(20).to_list() != TestDataGenerator(seed=42).generate_users(20).to_list()
+
+    def test_products_stay_in_range(self):
+        """Prices, stock and ratings are drawn in the ranges of generate_product()"""
+        products = TestDataGenerator(seed=2).generate_products(2000)
+
+        assert all(0 <= price < 100 for price in products.column('price'))
+        assert all(0 <= stock <= 1000 for stock in products.column('stock'))
+        assert all(1 <= rating <= 5 for rating in products.column('rating'))
+        assert set(products.column('category')) == {'Electronics', 'Clothing', 'Books', 'Home', 'Sports'}
+
+    def test_order_totals_match_their_items(self):
+        """Each order's total is the rounded sum of its line items"""
+        orders = TestDataGenerator(seed=3).generate_orders(200)
+
+        for order in orders:
+            assert 1 <= len(order['items']) <= 5
+            assert order['total'] == round(sum(item['total'] for item in order['items']), 2)
+        assert all(len(order['items']) == 2 for order in TestDataGenerator(seed=3).generate_orders(10, num_items=2))
+
+    def test_rows_are_built_on_demand(self):
+        """Rows come from the columns when read and serialize like per-record data"""
+        built = []
+        batch = RecordBatch({'id': [1, 2, 3], 'name.first': ['a', 'b', 'c'],
+                             'tags': lambda index: built.append(index) or [index]}, 3)
+
+        assert batch[-1] == {'id': 3, 'name': {'first': 'c'}, 'tags': [2]}
+        assert built == [2]
+        assert json.loads(json.dumps(batch.to_list()))[0] == {'id': 1, 'name': {'first': 'a'}, 'tags': [0]}
+        with pytest.raises(IndexError):
+            batch[3]
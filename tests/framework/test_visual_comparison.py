@@ -0,0 +1,246 @@
+import io
+import os
+import subprocess
+import sys
+import textwrap
+import pytest
+import allure
+from PIL import Image
+import utils.visual_comparison as visual_comparison_module
+from utils.baseline_store import BaselineStore
+from utils.visual_comparison import FingerprintCache, VisualComparison, collect_soft_failures, shutdown_comparison_pool
+from utils.visual_report import VisualReport
+
+
+def _png(color, size=(40, 20)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeLocator:
+    """Stands in for a Playwright locator with a scripted subtree and screenshot"""
+
+    def __init__(self, markup: str, color: str):
+        self.markup = markup
+        self.color = color
+        self.screenshots = 0
+
+    def evaluate(self, script: str) -> str:
+        return self.markup
+
+    def screenshot(self) -> bytes:
+        self.screenshots += 1
+        return _png(self.color)
+
+
+@allure.feature('Visual Comparison Framework')
+class TestVisualComparison:
+
+    @pytest.fixture(params=[0, 2], ids=["inline", "process_pool"])
+    def comparison(self, request, tmp_path):
+        yield VisualComparison(str(tmp_path / "baseline"), str(tmp_path / "diff"),
+                               pool_workers=request.param, test_id=request.node.nodeid)
+        shutdown_comparison_pool()
+
+    @allure.title('Verify queued comparisons resolve to the same results as inline ones')
+    def test_submitted_comparisons_resolve(self, comparison):
+        """
+        Test that a first screenshot creates the baseline and later ones are diffed against it
+        """
+        assert comparison.submit_comparison(_png("white"), "page").result() == (True, "Baseline created")
+        comparison.submit_comparison(_png("white"), "page")
+        comparison.submit_comparison(_png("black"), "page_other")
+        comparison.submit_comparison(_png("red"), "page_other")
+
+        results = dict(comparison.collect_results())
+
+        assert results["page"] == (True, "Images match")
+        assert not results["page_other"][0]
+        assert "Visual difference detected" in results["page_other"][1]
+
+    @allure.title('Verify teardown assertion reports every failed comparison')
+    def test_assert_all_match_lists_failures(self, comparison):
+        """
+        Test that assert_all_match raises once with all failing screenshot names
+        """
+        for name in ("header", "footer"):
+            comparison.submit_comparison(_png("white"), name)
+            comparison.submit_comparison(_png("blue", size=(10, 10)), name)
+
+        with pytest.raises(AssertionError) as error:
+            comparison.assert_all_match()
+
+        assert "header: Size mismatch" in str(error.value)
+        assert "footer: Size mismatch" in str(error.value)
+        # Pending comparisons are consumed by the assertion
+        comparison.assert_all_match()
+
+    @allure.title('Verify soft checks are deferred to the session and keyed by test')
+    def test_soft_checks_grouped_by_test(self, comparison, monkeypatch):
+        """
+        Test that soft comparison failures are collected per test id and not asserted at teardown
+        """
+        monkeypatch.setattr(visual_comparison_module, "_soft_checks", [])
+        comparison.submit_comparison(_png("white"), "banner", soft=True)
+        comparison.submit_comparison(_png("green"), "banner", soft=True)
+
+        comparison.assert_all_match()
+        failures = collect_soft_failures()
+
+        assert list(failures) == [comparison.test_id]
+        assert failures[comparison.test_id][0].startswith("banner: Visual difference detected")
+
+    @allure.title('Verify soft failures of xdist workers fail the run on the controller')
+    def test_soft_failures_reach_the_controller(self, tmp_path):
+        """
+        Test that a soft failure deferred by an xdist worker is reported by the controller and sets the
+        exit status, since a worker's own terminal output and exit status are discarded
+        """
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        test_file = tmp_path / "test_soft_visual.py"
+        test_file.write_text(textwrap.dedent('''
+            import io
+            from PIL import Image
+            from utils.visual_comparison import VisualComparison
+
+            def _png(color):
+                buffer = io.BytesIO()
+                Image.new("RGB", (40, 20), color).save(buffer, format="PNG")
+                return buffer.getvalue()
+
+            def test_banner(tmp_path):
+                comparison = VisualComparison(str(tmp_path / "baseline"), str(tmp_path / "diff"), pool_workers=0,
+                                              test_id="test_banner")
+                comparison.submit_comparison(_png("white"), "banner", soft=True)
+                comparison.submit_comparison(_png("green"), "banner", soft=True)
+
+            def test_other():
+                pass
+        '''))
+        # The repo conftest is loaded as a plugin, since the test file lives outside tests/
+        environment = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(root, "tests"), root]))
+        result = subprocess.run(
+            [sys.executable, "-m", "pytest", str(test_file), "-p", "conftest", "-n", "2", "-c", os.devnull,
+             "--rootdir", str(tmp_path), "-p", "no:cacheprovider", "-q"],
+            cwd=root, env=environment, capture_output=True, text=True, timeout=120)
+
+        assert "SOFT VISUAL FAILURE test_banner: banner: Visual difference detected" in result.stdout, result.stdout
+        assert result.returncode == pytest.ExitCode.TESTS_FAILED
+
+
+@allure.feature('Visual Comparison Framework')
+class TestElementFingerprint:
+
+    @pytest.fixture
+    def comparison(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(visual_comparison_module.Config, "VISUAL_FINGERPRINT", True)
+        monkeypatch.setattr(visual_comparison_module.Config, "VISUAL_FINGERPRINT_MAX_SKIPS", 2)
+        return VisualComparison(str(tmp_path / "baseline"), str(tmp_path / "diff"), pool_workers=0,
+                                store=BaselineStore(str(tmp_path / "store")), env="QA", combo="chrome_desktop",
+                                report=VisualReport(str(tmp_path / "report")),
+                                fingerprints=FingerprintCache(str(tmp_path / "report" / "fingerprints.json")))
+
+    @allure.title('Verify unchanged elements skip the screenshot until a capture is due')
+    def test_unchanged_fingerprint_skips_screenshot(self, comparison):
+        """
+        Test that a matching fingerprint skips capture and MAX_SKIPS forces a new one
+        """
+        button = FakeLocator("<button>Login</button>", "white")
+
+        for _ in range(4):
+            assert comparison.compare_element(button, "login_button").result()[0]
+
+        # baseline capture, two skips, then a forced capture
+        assert button.screenshots == 2
+        assert comparison.fingerprints.get("qa/chrome_desktop/login_button")["skips"] == 0
+        assert [message for _, (_, message) in comparison.collect_results()] == [
+            "Baseline created", "Fingerprint unchanged", "Fingerprint unchanged", "Images match"
+        ]
+        statuses = [entry["status"] for entry in comparison.report.load_entries()]
+        assert sorted(statuses) == ["new", "passed", "skipped", "skipped"]
+
+    @allure.title('Verify fingerprints stay out of the baseline index')
+    def test_fingerprints_do_not_touch_the_index(self, comparison):
+        """
+        Test that skips leave the committed baseline index alone and a new baseline invalidates the fingerprint
+        """
+        button = FakeLocator("<button>Login</button>", "white")
+        comparison.compare_element(button, "login_button").result()
+        index = comparison.store.index_path.read_bytes()
+
+        comparison.compare_element(button, "login_button").result()
+        assert comparison.store.index_path.read_bytes() == index
+        assert comparison.store.get_entry("QA", "chrome_desktop", "login_button") == {
+            "blob": comparison.fingerprints.get("qa/chrome_desktop/login_button")["blob"]
+        }
+
+        comparison.store.put("QA", "chrome_desktop", "login_button", _png("white", size=(41, 20)))
+        assert not comparison.compare_element(button, "login_button").result()[0]
+        assert button.screenshots == 2
+
+    @allure.title('Verify a changed element is captured and compared again')
+    def test_changed_fingerprint_forces_capture(self, comparison):
+        """
+        Test that a fingerprint change captures the element and a failed match keeps the old fingerprint
+        """
+        comparison.compare_element(FakeLocator("<button>Login</button>", "white"), "login_button")
+        stored = comparison.fingerprints.get("qa/chrome_desktop/login_button")["fingerprint"]
+
+        restyled = FakeLocator("<button class='new'>Login</button>", "black")
+        match_result, message = comparison.compare_element(restyled, "login_button").result()
+
+        assert not match_result
+        assert restyled.screenshots == 1
+        assert comparison.fingerprints.get("qa/chrome_desktop/login_button")["fingerprint"] == stored
+
+
+class FakePage:
+    """Records the viewport and media emulation calls made while stepping through variants"""
+
+    def __init__(self):
+        self.viewport_size = {"width": 1920, "height": 1080}
+        self.color_scheme = "null"
+        self.calls = []
+
+    def set_viewport_size(self, viewport):
+        self.calls.append(("viewport", viewport["width"]))
+        self.viewport_size = viewport
+
+    def emulate_media(self, color_scheme):
+        self.calls.append(("color_scheme", color_scheme))
+        self.color_scheme = color_scheme
+
+    def evaluate(self, script, *args):
+        self.calls.append(("settle",))
+
+    def screenshot(self) -> bytes:
+        return _png("black" if self.color_scheme == "dark" else "white", size=(self.viewport_size["width"] // 10, 10))
+
+
+@allure.feature('Visual Comparison Framework')
+class TestVariantCapture:
+
+    @allure.title('Verify variants are captured from one page and the page is restored')
+    def test_capture_variants(self, tmp_path):
+        """
+        Test that each variant is applied, settled and compared under its own name
+        """
+        page = FakePage()
+        comparison = VisualComparison(str(tmp_path / "baseline"), str(tmp_path / "diff"), pool_workers=0)
+        variants = [
+            {"name": "desktop"},
+            {"name": "dark", "color_scheme": "dark"},
+            {"name": "mobile", "viewport": {"width": 375, "height": 812}},
+        ]
+
+        futures = comparison.capture_variants(page, variants)
+
+        assert list(futures) == ["desktop", "dark", "mobile"]
+        assert page.calls == [
+            ("settle",),
+            ("color_scheme", "dark"), ("settle",),
+            ("viewport", 375), ("color_scheme", "null"), ("settle",),
+            ("viewport", 1920),
+        ]
+        assert all(result == (True, "Baseline created") for _, result in comparison.collect_results())
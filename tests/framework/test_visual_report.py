@@ -0,0 +1,94 @@
+import io
+import json
+import pytest
+import allure
+from PIL import Image
+from utils.visual_comparison import VisualComparison, shutdown_comparison_pool
+from utils.visual_report import VisualReport
+
+
+def _png(color, size=(400, 300)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@allure.feature('Visual Report Framework')
+class TestVisualReport:
+
+    @pytest.fixture(params=[0, 2], ids=["inline", "process_pool"])
+    def pool_workers(self, request):
+        yield request.param
+        shutdown_comparison_pool()
+
+    @allure.title('Verify entries are written as comparisons finish and merged across workers')
+    def test_entries_merge_into_index(self, tmp_path, pool_workers):
+        """
+        Test that two workers' entries end up in one index with thumbnails and linked full images
+        """
+        report_dir = str(tmp_path / "report")
+        for worker_id, color in (("gw0", "white"), ("gw1", "yellow")):
+            comparison = VisualComparison(str(tmp_path / "baseline"), str(tmp_path / worker_id),
+                                          pool_workers=pool_workers, test_id=f"test_{worker_id}",
+                                          report=VisualReport(report_dir, worker_id=worker_id))
+            comparison.submit_comparison(_png("white"), "home")
+            comparison.submit_comparison(_png(color), "home")
+            comparison.collect_results()
+
+        report = VisualReport(report_dir)
+        entries = report.load_entries()
+
+        # failures first, then by test
+        assert [(entry["test_id"], entry["status"]) for entry in entries] == [
+            ("test_gw1", "failed"), ("test_gw0", "new"), ("test_gw0", "passed"), ("test_gw1", "passed")
+        ]
+        failed = entries[0]
+        assert failed["test_id"] == "test_gw1"
+        assert set(failed["thumbs"]) == {"baseline", "actual", "heatmap"}
+        assert set(failed["images"]) == {"baseline", "actual", "diff", "heatmap"}
+        with Image.open(tmp_path / "report" / failed["thumbs"]["actual"]) as thumbnail:
+            assert max(thumbnail.size) <= 240
+
+        index_html = open(report.build_index()).read()
+        assert "4 comparisons, 1 failed" in index_html
+        assert 'loading="lazy"' in index_html
+        assert "data:image" not in index_html
+
+    @allure.title('Verify same-name comparisons in flight keep their own images and results')
+    def test_same_name_submissions_do_not_interfere(self, tmp_path, pool_workers):
+        """
+        Test that a second capture of a name does not overwrite the images of a comparison still in
+        the pool, and that a later pass does not hide an earlier failure
+        """
+        comparison = VisualComparison(str(tmp_path / "baseline"), str(tmp_path / "diff"),
+                                      pool_workers=pool_workers, report=VisualReport(str(tmp_path / "report")))
+        comparison.submit_comparison(_png("white"), "home").result()
+        for color in ("yellow", "white", "yellow", "white"):
+            comparison.submit_comparison(_png(color), "home")
+
+        results = comparison.collect_results()
+
+        assert results[0] == ("home", (True, "Baseline created"))
+        assert [(name, match_result) for name, (match_result, _) in results[1:]] == [
+            ("home", False), ("home", True), ("home", False), ("home", True)
+        ]
+        assert len(list((tmp_path / "diff").glob("home.*_actual.png"))) == 5
+        assert len(list((tmp_path / "diff").glob("home.*_diff.png"))) == 2
+        with pytest.raises(AssertionError, match="home: Visual difference"):
+            comparison.submit_comparison(_png("yellow"), "home")
+            comparison.submit_comparison(_png("white"), "home")
+            comparison.assert_all_match()
+
+    @allure.title('Verify each worker appends to its own entry file')
+    def test_workers_write_separate_files(self, tmp_path):
+        """
+        Test that worker entry files are independent JSON lines files
+        """
+        for worker_id in ("gw0", "gw1"):
+            VisualReport(str(tmp_path), worker_id=worker_id).add_entry(
+                f"{worker_id}-1", "test_x", "default/logo", "passed", "Images match", {}
+            )
+
+        files = sorted(path.name for path in (tmp_path / "entries").iterdir())
+        assert files == ["gw0.jsonl", "gw1.jsonl"]
+        assert json.loads((tmp_path / "entries" / "gw1.jsonl").read_text())["id"] == "gw1-1"
@@ -1,7 +1,7 @@
 import pytest
 import allure
 import json
-from utils.api_client import ApiClient
+from utils.api_client import API
 from mocks.mock_server import setup_mock_endpoint
 
 
@@ -9,8 +9,9 @@ from mocks.mock_server import setup_mock_endpoint
 class TestHomePageApi:
     
     @pytest.fixture
-    def api_client(self):
-        return ApiClient()
+    def api_client(self, mock_server):
+        # Point the client at this worker's mock server (fresh mocks for every test)
+        return API(base_url=mock_server.url)
     
     @pytest.fixture
     def mock_home_data(self):
@@ -75,7 +76,7 @@ class TestHomePageApi:
         assert response_data == mock_home_data, "API response data does not match expected mock data"
 
     @allure.title('Verify featured products API')
-    @allure.severity(allure.severity_level.HIGH)
+    @allure.severity(allure.severity_level.CRITICAL)
     def test_featured_products_api(self, api_client, mock_home_data):
         """
         Test that the featured products API returns correct products
@@ -0,0 +1,31 @@
+import allure
+import pytest
+from mocks.benchmark import percentile, run_benchmark
+
+
+@allure.feature('Mock Server')
+@pytest.mark.performance
+class TestMockClusterBenchmark:
+
+    @allure.title('Benchmark a multi-process mock server')
+    def test_cluster_throughput(self):
+        """
+        Run a short load against two server processes and report requests per second and latency percentiles
+        """
+        result = run_benchmark(workers=2, clients=2, concurrency=8, duration=1.0)
+        print(f"\n{result['rps']:.0f} rps, latency {result['latency_ms']}")
+
+        assert result['errors'] == 0
+        assert result['requests'] > 0
+        assert result['served'] == result['requests']
+        latencies = list(result['latency_ms'].values())
+        assert latencies == sorted(latencies)
+
+    @allure.title('Verify nearest-rank percentiles')
+    def test_percentile(self):
+        """
+        Check the percentile helper on a known distribution
+        """
+        values = list(range(1, 101))
+        assert (percentile(values, 50), percentile(values, 99), percentile(values, 100)) == (50, 99, 100)
+        assert percentile([], 50) == 0.0
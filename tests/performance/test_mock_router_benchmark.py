@@ -0,0 +1,44 @@
+import pytest
+import allure
+from mocks.router import Router
+
+ROUTE_COUNT = 5000
+
+
+@pytest.fixture(scope="module")
+def large_router() -> Router:
+    """Router with thousands of exact and templated mocks, as a large fixture set would register"""
+    router = Router()
+    for index in range(ROUTE_COUNT):
+        router.add('GET', f'/api/resource{index}/items', index)
+        router.add('GET', f'/api/resource{index}/items/{{item_id}}', index)
+    router.add('GET', 're:^/api/legacy/.*$', 'legacy')
+    return router
+
+
+@allure.feature('Mock Server Router')
+@pytest.mark.performance
+class TestRouterBenchmark:
+
+    @allure.title('Benchmark exact route lookup with thousands of mocks')
+    def test_exact_lookup_throughput(self, benchmark, large_router):
+        """
+        Measure lookups of an exact path among thousands of registered mocks
+        """
+        match = benchmark(large_router.match, 'GET', f'/api/resource{ROUTE_COUNT - 1}/items')
+        assert match.route.payload == ROUTE_COUNT - 1
+
+    @allure.title('Benchmark templated route lookup with thousands of mocks')
+    def test_templated_lookup_throughput(self, benchmark, large_router):
+        """
+        Measure lookups that resolve a path parameter through the segment trie
+        """
+        match = benchmark(large_router.match, 'GET', f'/api/resource{ROUTE_COUNT // 2}/items/987')
+        assert match.params == {'item_id': '987'}
+
+    @allure.title('Benchmark unmatched lookup with thousands of mocks')
+    def test_miss_throughput(self, benchmark, large_router):
+        """
+        Measure a miss, which must not scan the registered mocks
+        """
+        assert benchmark(large_router.match, 'GET', '/api/unknown/path') is None
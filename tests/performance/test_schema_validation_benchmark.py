@@ -0,0 +1,53 @@
+import pytest
+import allure
+from utils.schema_validation import SchemaRegistry, compile_schema
+
+PRODUCT = {
+    'type': 'object',
+    'required': ['id', 'name', 'price', 'rating'],
+    'properties': {
+        'id': {'type': 'integer', 'minimum': 1},
+        'name': {'type': 'string', 'minLength': 1, 'maxLength': 200},
+        'price': {'type': 'number', 'minimum': 0},
+        'rating': {'type': 'number', 'minimum': 0, 'maximum': 5},
+        'tags': {'type': 'array', 'items': {'type': 'string'}},
+    },
+}
+CATALOG = {'type': 'object', 'required': ['products'],
+           'properties': {'products': {'type': 'array', 'items': PRODUCT}, 'total': {'type': 'integer'}}}
+
+
+def catalog(size):
+    return {'products': [{'id': index + 1, 'name': f'Product {index}', 'price': 9.99 + index, 'rating': 4.5,
+                          'tags': ['sale', 'new']} for index in range(size)], 'total': size}
+
+
+@allure.feature('API Client')
+@pytest.mark.performance
+class TestSchemaValidationBenchmark:
+
+    @allure.title('Benchmark validating a typical response')
+    def test_small_response(self, benchmark):
+        """
+        Measure the per-response cost of a compiled validator on a 10-item payload
+        """
+        validator, payload = compile_schema(CATALOG), catalog(10)
+        assert benchmark(validator.errors, payload) == []
+
+    @allure.title('Benchmark validating a large response')
+    def test_large_response(self, benchmark):
+        """
+        Measure a 10,000-item payload, which is validated in a single walk
+        """
+        validator, payload = compile_schema(CATALOG), catalog(10_000)
+        assert benchmark(validator.errors, payload) == []
+
+    @allure.title('Benchmark looking up the validator of an endpoint')
+    def test_registry_lookup(self, benchmark, tmp_path):
+        """
+        Measure the lookup done for every response once the schema is compiled
+        """
+        (tmp_path / 'api').mkdir()
+        (tmp_path / 'api' / 'products.GET.json').write_text('{"type": "object"}')
+        registry = SchemaRegistry(str(tmp_path))
+        assert benchmark(registry.for_endpoint, 'GET', 'http://api.local/api/products?page=2') is not None
@@ -0,0 +1,50 @@
+import pytest
+import allure
+from utils.test_data import TestDataGenerator
+
+RECORDS = 1000
+
+
+@allure.feature('Test Data')
+@pytest.mark.performance
+class TestDataGenerationBenchmark:
+
+    @allure.title('Benchmark generating users one record at a time')
+    def test_per_record_users(self, benchmark):
+        """
+        Measure the per-record path: many Faker calls for every user
+        """
+        generator = TestDataGenerator(seed=1)
+        users = benchmark.pedantic(lambda: [generator.generate_user(include_address=True) for _ in range(RECORDS)], rounds=3)
+        assert len(users) == RECORDS
+
+    @allure.title('Benchmark generating users as a batch')
+    def test_batch_users(self, benchmark):
+        """
+        Measure the batch path with every row built, for comparison with the per-record path
+        """
+        generator = TestDataGenerator(seed=1)
+        generator.generate_users(1, include_address=True)  # value pools are built once per generator
+        # Bounded rounds: each round takes RECORDS ids from the generator's partition of the ID space
+        users = benchmark.pedantic(lambda: generator.generate_users(RECORDS, include_address=True).to_list(), rounds=20)
+        assert len(users) == RECORDS
+
+    @allure.title('Benchmark generating orders one record at a time')
+    def test_per_record_orders(self, benchmark):
+        """
+        Measure the per-record order path, which generates a product per line item
+        """
+        generator = TestDataGenerator(seed=1)
+        orders = benchmark.pedantic(lambda: [generator.generate_order() for _ in range(RECORDS)], rounds=3)
+        assert len(orders) == RECORDS
+
+    @allure.title('Benchmark generating orders as a batch')
+    def test_batch_orders(self, benchmark):
+        """
+        Measure the batch order path with every row and its items built
+        """
+        generator = TestDataGenerator(seed=1)
+        generator.generate_orders(1)
+        # Up to five products per order: 20 rounds stay far inside a product partition even under xdist
+        orders = benchmark.pedantic(lambda: generator.generate_orders(RECORDS).to_list(), rounds=20)
+        assert len(orders) == RECORDS
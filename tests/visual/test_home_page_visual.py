@@ -3,120 +3,55 @@ import allure
 from playwright.sync_api import expect
 from page_objects.home_page import HomePage
 from config.config import Config
+from utils.baseline_store import BaselineStore
 from utils.visual_comparison import VisualComparison
+from utils.visual_report import VisualReport
+from pytest_check import check
 
 
+# Captured in order from one navigation; no viewport keeps the context's default size
+HOME_PAGE_VARIANTS = [
+    {"name": "home_page_visual"},
+    {"name": "home_page_dark_mode", "color_scheme": "dark"},
+    {"name": "home_page_tablet_view", "viewport": {"width": 768, "height": 1024}},  # iPad dimensions
+    {"name": "home_page_mobile_view", "viewport": {"width": 375, "height": 812}},  # iPhone X dimensions
+]
+
 @allure.feature('Home Page Visual Tests')
 class TestHomePageVisual:
     
     @pytest.fixture
-    def visual_comparison(self):
-        return VisualComparison(Config.BASELINE_DIR, Config.DIFF_DIR)
-
-    @allure.title('Verify home page responsive design - mobile')
-    @allure.severity(allure.severity_level.NORMAL)
-    def test_home_page_responsive_mobile(self, page, visual_comparison):
-        """
-        Test that the home page displays correctly on mobile devices
-        """
-        # Set viewport to mobile size
-        page.set_viewport_size({"width": 375, "height": 812})  # iPhone X dimensions
-        
-        home_page = HomePage(page)
-        
-        # Navigate to home page
-        home_page.navigate(page.url)
-        home_page.accept_cookies()
-        
-        # Take screenshot for visual comparison
-        screenshot_path = home_page.take_screenshot("home_page_mobile_view")
-        
-        # Capture screenshot and verify with visual comparison tool
-        screenshot_bytes = page.screenshot()
-        match_result, message = visual_comparison.compare_screenshots(
-            screenshot_bytes, "home_page_mobile_view"
+    def visual_comparison(self, request, browser_device_combo):
+        comparison = VisualComparison(
+            Config.BASELINE_DIR, Config.DIFF_DIR, test_id=request.node.nodeid,
+            store=BaselineStore(), combo=browser_device_combo["name"], report=VisualReport()
         )
-        
-        # Assert the visual comparison
-        assert match_result, message
-        
-        # Verify key elements are still visible on mobile
-        assert home_page.verify_page_loaded(), "Home page did not load correctly on mobile"
+        yield comparison
+        # Comparisons run off the browser thread; their results are asserted here at teardown
+        comparison.assert_all_match()
 
-    @allure.title('Verify home page responsive design - tablet')
+    @allure.title('Verify home page responsive design and dark mode')
     @allure.severity(allure.severity_level.NORMAL)
-    def test_home_page_responsive_tablet(self, page, visual_comparison):
+    def test_home_page_visual_variants(self, page, visual_comparison):
         """
-        Test that the home page displays correctly on tablet devices
+        Test the home page across desktop, dark mode, tablet and mobile layouts from a single navigation
         """
-        # Set viewport to tablet size
-        page.set_viewport_size({"width": 768, "height": 1024})  # iPad dimensions
-        
         home_page = HomePage(page)
         
-        # Navigate to home page
+        # Navigate to home page once for all variants
         home_page.navigate(page.url)
         home_page.accept_cookies()
         
-        # Capture screenshot and verify with visual comparison tool
-        screenshot_bytes = page.screenshot()
-        match_result, message = visual_comparison.compare_screenshots(
-            screenshot_bytes, "home_page_tablet_view"
-        )
-        
-        # Assert the visual comparison
-        assert match_result, message
+        # Resize/re-theme the loaded page, capture each variant and queue its comparison
+        for variant in visual_comparison.iter_variants(page, HOME_PAGE_VARIANTS):
+            visual_comparison.submit_comparison(page.screenshot(), variant["name"])
+            with check, allure.step(f"{variant['name']} layout loaded"):
+                assert home_page.verify_page_loaded(), f"Home page did not load correctly for {variant['name']}"
         
-        # Verify key elements are still visible on tablet
-        assert home_page.verify_page_loaded(), "Home page did not load correctly on tablet"
-
-    @allure.title('Verify home page visual regression')
-    @allure.severity(allure.severity_level.NORMAL)
-    def test_home_page_visual_regression(self, page, visual_comparison):
-        """
-        Test for visual regression on the home page
-        """
-        home_page = HomePage(page)
-        
-        # Navigate to home page
-        home_page.navigate(page.url)
-        home_page.accept_cookies()
-        
-        # Capture screenshot and verify with visual comparison tool
-        screenshot_bytes = page.screenshot()
-        match_result, message = visual_comparison.compare_screenshots(
-            screenshot_bytes, "home_page_visual"
-        )
-        
-        # Assert the visual comparison
-        assert match_result, message
-    
-    @allure.title('Verify dark mode support')
-    @allure.severity(allure.severity_level.MINOR)
-    def test_home_page_dark_mode(self, page, visual_comparison):
-        """
-        Test that the home page supports dark mode (if applicable)
-        """
-        # Force dark mode via CSS media query emulation
-        page.emulate_media(color_scheme="dark")
-        
-        home_page = HomePage(page)
-        
-        # Navigate to home page
-        home_page.navigate(page.url)
-        home_page.accept_cookies()
-        
-        # Capture screenshot and verify with visual comparison tool
-        screenshot_bytes = page.screenshot()
-        match_result, message = visual_comparison.compare_screenshots(
-            screenshot_bytes, "home_page_dark_mode"
-        )
-        
-        # Assert the visual comparison
-        assert match_result, message
-        
-        # Verify page loaded correctly in dark mode
-        assert home_page.verify_page_loaded(), "Home page did not load correctly in dark mode"
+        # Report a separate pass/fail result per variant
+        for name, (match_result, message) in visual_comparison.collect_results():
+            with check, allure.step(f"{name} matches baseline"):
+                assert match_result, f"{name}: {message}"
 
     @allure.title('Verify critical element visual appearance')
     @allure.severity(allure.severity_level.HIGH)
@@ -130,27 +65,7 @@ class TestHomePageVisual:
         home_page.navigate(page.url)
         home_page.accept_cookies()
         
-        # Take screenshots of critical elements
-        # Example: Screenshot of login button
-        login_button = page.locator(home_page.login_button)
-        login_button_screenshot = login_button.screenshot()
-        
-        # Compare with baseline
-        match_result, message = visual_comparison.compare_screenshots(
-            login_button_screenshot, "login_button"
-        )
-        
-        # Assert the visual comparison
-        assert match_result, message
-        
-        # Example: Screenshot of file claim button
-        claim_button = page.locator(home_page.file_a_claim_now_button)
-        claim_button_screenshot = claim_button.screenshot()
-        
-        # Compare with baseline
-        match_result, message = visual_comparison.compare_screenshots(
-            claim_button_screenshot, "file_claim_button"
-        )
-        
-        # Assert the visual comparison
-        assert match_result, message
\ No newline at end of file
+        # Compare critical elements with their baselines
+        # (screenshots are skipped while the element fingerprint is unchanged, see VISUAL_FINGERPRINT)
+        visual_comparison.compare_element(home_page.login_button, "login_button")
+        visual_comparison.compare_element(home_page.file_a_claim_now_button, "file_claim_button")
\ No newline at end of file
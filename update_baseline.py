@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Baseline Manager - Bulk maintenance of the content-addressed visual baseline store
+
+Usage:
+    python update_baseline.py promote --from ENV --to ENV [--combo NAME ...] [--name NAME ...]
+    python update_baseline.py accept [--env ENV]
+    python update_baseline.py import [--env ENV] [--combo NAME]
+    python update_baseline.py gc
+    python update_baseline.py list [--env ENV] [--combo NAME]
+
+Examples:
+    # Reuse the approved SYS baselines for QA (only index entries are copied)
+    python update_baseline.py promote --from SYS --to QA
+
+    # Accept every actual screenshot of the last QA run as the new baseline
+    python update_baseline.py accept --env QA
+
+    # Drop blobs that no environment/combination references any more
+    python update_baseline.py gc
+"""
+
+import argparse
+import os
+import sys
+from config.config import Config
+from utils.baseline_store import BaselineStore
+
+ENVIRONMENTS = ["DEV", "SYS", "QA"]
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Promote, accept, import and garbage collect visual baselines"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    promote = subparsers.add_parser("promote", help="Copy baselines from one environment to another")
+    promote.add_argument("--from", dest="source_env", choices=ENVIRONMENTS, required=True)
+    promote.add_argument("--to", dest="target_env", choices=ENVIRONMENTS, required=True)
+    promote.add_argument("--combo", action="append", help="Only promote these combinations (repeatable)")
+    promote.add_argument("--name", action="append", help="Only promote these screenshot names (repeatable)")
+
+    accept = subparsers.add_parser("accept", help="Accept the actual screenshots of the last run as baselines")
+    accept.add_argument("--env", choices=ENVIRONMENTS, default=Config.ENV)
+
+    legacy = subparsers.add_parser("import", help="Import baseline_images/<env>/*.png into the store")
+    legacy.add_argument("--env", choices=ENVIRONMENTS, default=Config.ENV)
+    legacy.add_argument("--combo", default="default", help="Combination to file the images under (default: default)")
+
+    subparsers.add_parser("gc", help="Delete blobs that are no longer referenced")
+
+    listing = subparsers.add_parser("list", help="List stored baselines")
+    listing.add_argument("--env", choices=ENVIRONMENTS)
+    listing.add_argument("--combo")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    store = BaselineStore()
+
+    if args.command == "promote":
+        count = store.promote(args.source_env, args.target_env, combos=args.combo, names=args.name)
+        print(f"Promoted {count} baselines from {args.source_env} to {args.target_env}")
+    elif args.command == "accept":
+        diff_root = os.path.join(PROJECT_ROOT, "diff_images", args.env.lower())
+        count = store.accept_actuals(args.env, diff_root)
+        print(f"Accepted {count} actual screenshots as {args.env} baselines")
+    elif args.command == "import":
+        legacy_dir = os.path.join(PROJECT_ROOT, "baseline_images", args.env.lower())
+        count = store.import_legacy(legacy_dir, args.env, args.combo)
+        print(f"Imported {count} legacy baselines for {args.env}/{args.combo}")
+    elif args.command == "gc":
+        count = store.gc()
+        print(f"Removed {count} unreferenced blobs")
+    elif args.command == "list":
+        for key in store.list_keys(env=args.env, combo=args.combo):
+            print(f"  - {key}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,54 +1,151 @@
-import json
 import logging
 import requests
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 from config.config import Config
+from utils.api_logging import api_call_log
+from utils.api_timing import TimedHTTPAdapter
+from utils.auth import TokenAuth
+from utils.http_cache import HttpCache, get_http_cache
+from utils.json_stream import JsonStream, lookup
+from utils.schema_validation import SchemaViolation, format_violations, schema_registry
 
 logger = logging.getLogger(__name__)
 
 class API:
-    def __init__(self, base_url: Optional[str] = None):
+    def __init__(self, base_url: Optional[str] = None, cache: Optional[HttpCache] = None, role: Optional[str] = None):
         self.base_url = base_url or Config.API_BASE_URL
         self.session = requests.Session()
+        # Every call gets a phase breakdown in response.timing and the run's timing store
+        self.session.mount('http://', TimedHTTPAdapter())
+        self.session.mount('https://', TimedHTTPAdapter())
         self.timeout = Config.API_TIMEOUT / 1000  # Convert to seconds
+        # GETs go through the HTTP cache when one is passed or API_CACHE_ENABLED is set
+        self.cache = cache if cache is not None else (get_http_cache() if Config.API_CACHE_ENABLED else None)
+        # Responses of endpoints with a schema are checked against it: off, warn or strict
+        self.schema_validation = Config.API_SCHEMA_VALIDATION
+        # With a role (or API_AUTH_ROLE) requests carry that role's token from the cross-worker token cache
+        role = role or Config.API_AUTH_ROLE
+        if role:
+            self.use_role(role)
 
     def _log_request_response(self, response: requests.Response, data: Optional[Dict[str, Any]] = None) -> None:
-        """Log request and response details"""
-        logger.info(f"Request URL: {response.request.url}")
-        logger.info(f"Request Method: {response.request.method}")
-        
-        if data:
-            logger.info(f"Request Data: {json.dumps(data, indent=2)}")
-            
+        """Log request and response details (lazily, truncated and redacted, see utils.api_logging)"""
+        api_call_log.record(response, data)
+
+    def _validate_schema(self, response: requests.Response) -> None:
+        """Check a 2xx JSON body against the endpoint's schema, see utils.schema_validation"""
+        if self.schema_validation == 'off' or not 200 <= response.status_code < 300 or not response.content:
+            return
+        validator = schema_registry.for_endpoint(response.request.method, response.url)
+        if validator is None:
+            return
         try:
-            response_json = response.json()
-            logger.info(f"Response: {json.dumps(response_json, indent=2)}")
-        except json.JSONDecodeError:
-            logger.info(f"Response Text: {response.text}")
+            violations = validator.errors(response.json())
+        except ValueError:
+            violations = ['$: response body is not JSON']
+        response.schema_violations = violations
+        if violations:
+            context = f"{response.request.method} {response.url}"
+            if self.schema_validation == 'strict':
+                raise SchemaViolation(context, violations)
+            logger.warning(format_violations(context, violations))
+
+    def _invalidate(self, response: requests.Response) -> None:
+        """A successful write makes cached representations of the resource stale"""
+        if self.cache is not None and response.status_code < 400:
+            self.cache.invalidate(response.request.url)
+
+    def _validate_stream(self, stream: JsonStream) -> None:
+        """Check streamed items against the endpoint's schema as they are consumed"""
+        response = stream.response
+        if self.schema_validation == 'off' or not 200 <= response.status_code < 300:
+            return
+        validator = schema_registry.for_endpoint(response.request.method, response.url)
+        if validator is None:
+            return
+        pointer = ''.join(f"/properties/{part}" for part in stream.items.split('.') if part)
+        context = f"{response.request.method} {response.url}"
+        violations = None if self.schema_validation == 'strict' else stream.schema_violations
+
+        def check(items: Iterator[Any]) -> Iterator[Any]:
+            yield from validator.iter_validated(items, pointer, context, violations)
+            if violations:
+                logger.warning(format_violations(context, violations))
+        stream.validate(check)
 
     def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> requests.Response:
-        response = self.session.get(f"{self.base_url}/{endpoint.lstrip('/')}", params=params, timeout=self.timeout, **kwargs)
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        if self.cache is None:
+            response = self.session.get(url, params=params, timeout=self.timeout, **kwargs)
+        else:
+            headers = kwargs.pop('headers', None) or {}
+            request = self.session.prepare_request(requests.Request('GET', url, params=params, headers=headers))
+            response = self.cache.get(request, lambda validators: self.session.get(
+                url, params=params, timeout=self.timeout, headers={**headers, **validators}, **kwargs))
         self._log_request_response(response)
+        self._validate_schema(response)
         return response
 
+    def stream(self, endpoint: str, items: str = '', params: Optional[Dict[str, Any]] = None,
+               json_lines: Optional[bool] = None, **kwargs: Any) -> JsonStream:
+        """
+        GET a large JSON list and iterate its items as they arrive instead of loading the body, see utils.json_stream.
+        items: dotted path of the array in the body ('claims'), '' when the body is the array
+        """
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        response = self.session.get(url, params=params, timeout=self.timeout, stream=True, **kwargs)
+        if not 200 <= response.status_code < 300:
+            response.content  # Error bodies are small, read them so they are logged
+        self._log_request_response(response)
+        stream = JsonStream(response, items, json_lines)
+        self._validate_stream(stream)
+        return stream
+
+    def paginate(self, endpoint: str, items: str = 'items', cursor: str = 'next_cursor', cursor_param: str = 'cursor',
+                 params: Optional[Dict[str, Any]] = None, max_pages: Optional[int] = None, **kwargs: Any) -> Iterator[Any]:
+        """
+        Items of every page of a cursor-paginated list, each page streamed.
+        cursor: dotted path of the next page's cursor in the body; the list ends when it is empty
+        cursor_param: query parameter the cursor is sent back in
+        """
+        params = dict(params or {})
+        pages = 0
+        while True:
+            with self.stream(endpoint, items=items, params=params, **kwargs) as page:
+                page.response.raise_for_status()
+                yield from page
+            pages += 1
+            next_cursor = lookup(page.envelope, cursor)
+            if not next_cursor or (max_pages is not None and pages >= max_pages):
+                return
+            params[cursor_param] = next_cursor
+
     def post(self, endpoint: str, data: Optional[Dict[str, Any]] = None, json_data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> requests.Response:
         response = self.session.post(f"{self.base_url}/{endpoint.lstrip('/')}", json=json_data, data=data, timeout=self.timeout, **kwargs)
         self._log_request_response(response, json_data or data)
+        self._invalidate(response)
+        self._validate_schema(response)
         return response
 
     def put(self, endpoint: str, data: Optional[Dict[str, Any]] = None, json_data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> requests.Response:
         response = self.session.put(f"{self.base_url}/{endpoint.lstrip('/')}", json=json_data, data=data, timeout=self.timeout, **kwargs)
         self._log_request_response(response, json_data or data)
+        self._invalidate(response)
+        self._validate_schema(response)
         return response
 
     def delete(self, endpoint: str, **kwargs: Any) -> requests.Response:
         response = self.session.delete(f"{self.base_url}/{endpoint.lstrip('/')}", timeout=self.timeout, **kwargs)
         self._log_request_response(response)
+        self._invalidate(response)
+        self._validate_schema(response)
         return response
 
     def patch(self, endpoint: str, data: Optional[Dict[str, Any]] = None, json_data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> requests.Response:
         response = self.session.patch(f"{self.base_url}/{endpoint.lstrip('/')}", json=json_data, data=data, timeout=self.timeout, **kwargs)
         self._log_request_response(response, json_data or data)
+        self._invalidate(response)
+        self._validate_schema(response)
         return response
 
     def set_headers(self, headers: Dict[str, str]) -> None:
@@ -57,4 +154,10 @@ class API:
 
     def set_token(self, token: str) -> None:
         """Set bearer token for authentication"""
-        self.session.headers['Authorization'] = f'Bearer {token}'
\ No newline at end of file
+        self.session.auth = None
+        self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def use_role(self, role: str) -> None:
+        """Authenticate as a role with a token shared by all tests and workers, see utils.auth"""
+        self.session.headers.pop('Authorization', None)
+        self.session.auth = TokenAuth(role, self.base_url)
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Request/response logging for the API clients
+
+Logging a call costs nothing unless the API logger is enabled for API_LOG_LEVEL (DEBUG by default):
+the entry is formatted lazily, only when a handler actually emits it, and bodies are cut to
+API_LOG_MAX_BODY bytes without being parsed. In bulk runs API_LOG_SAMPLE_RATE logs only a fraction
+of calls. Secrets (Authorization headers, tokens, passwords...) are redacted everywhere.
+
+Independently of the log level, the last API_LOG_KEEP_ON_FAILURE calls of the running test are kept
+by reference; when the test fails, their full (redacted) payloads are attached to the report.
+"""
+import json
+import logging
+import random
+import re
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from config.config import Config
+
+logger = logging.getLogger("utils.api_client")
+
+REDACTED = "***"
+
+
+class ApiCallLog:
+    def __init__(self, level: Optional[str] = None, max_body: Optional[int] = None,
+                 sample_rate: Optional[float] = None, keep: Optional[int] = None,
+                 redact_keys: Optional[List[str]] = None, seed: Optional[int] = None):
+        self.level = logging.getLevelName((level or Config.API_LOG_LEVEL).upper())
+        self.max_body = Config.API_LOG_MAX_BODY if max_body is None else max_body
+        self.sample_rate = Config.API_LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.redactor = Redactor(redact_keys or Config.API_LOG_REDACT_KEYS)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        keep = Config.API_LOG_KEEP_ON_FAILURE if keep is None else keep
+        self._recent: Deque[Tuple[Any, Any]] = deque(maxlen=keep) if keep else deque(maxlen=0)
+
+    def record(self, response: Any, data: Any = None) -> None:
+        """Remember a call for failure reports and log it if the logger is enabled and it is sampled"""
+        if self._recent.maxlen:
+            with self._lock:
+                self._recent.append((response, data))
+        if not logger.isEnabledFor(self.level):
+            return
+        if self.sample_rate < 1.0 and self._random.random() >= self.sample_rate:
+            return
+        logger.log(self.level, "%s", _LazyCall(self, response, data))
+
+    def clear(self) -> None:
+        """Forget the calls kept for failure reports, e.g. when a new test starts"""
+        with self._lock:
+            self._recent.clear()
+
+    def recent_calls(self) -> List[Dict[str, Any]]:
+        """Full redacted payloads of the kept calls, oldest first"""
+        with self._lock:
+            calls = list(self._recent)
+        return [self.describe(response, data, full=True) for response, data in calls]
+
+    def describe(self, response: Any, data: Any = None, full: bool = False) -> Dict[str, Any]:
+        """A redacted summary of a call; bodies are truncated to max_body unless full"""
+        call = _call_details(response)
+        limit = None if full else self.max_body
+        return {
+            'method': call['method'],
+            'url': self.redactor.url(call['url']),
+            'status': call['status'],
+            'elapsed_ms': round(call['elapsed'] * 1000, 1),
+            'request_headers': self.redactor.headers(call['request_headers']),
+            'request_body': self.redactor.body(data if data is not None else call['request_body'], limit),
+            'response_headers': self.redactor.headers(call['response_headers']),
+            'response_body': self.redactor.body(call['content'], limit),
+        }
+
+    def format(self, response: Any, data: Any = None) -> str:
+        entry = self.describe(response, data)
+        line = f"{entry['method']} {entry['url']} -> {entry['status']} in {entry['elapsed_ms']}ms"
+        if entry['request_body']:
+            line += f" | request: {entry['request_body']}"
+        return f"{line} | response: {entry['response_body']}"
+
+
+class Redactor:
+    """Masks values of secret-looking keys in headers, query strings and bodies"""
+
+    def __init__(self, keys: List[str]):
+        self.keys = [key.lower() for key in keys if key]
+        names = "|".join(re.escape(key) for key in self.keys) or "(?!)"
+        # "key": "value" pairs inside (possibly truncated) JSON text, and key=value in form bodies
+        self._json_pair = re.compile(rf'("[^"]*(?:{names})[^"]*"\s*:\s*)"(?:[^"\\]|\\.)*"?', re.IGNORECASE)
+        self._form_pair = re.compile(rf'((?:^|&)[^=&]*(?:{names})[^=&]*=)[^&]*', re.IGNORECASE)
+
+    def is_secret(self, name: str) -> bool:
+        lowered = name.lower()
+        return any(key in lowered for key in self.keys)
+
+    def headers(self, headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+        return {name: REDACTED if self.is_secret(name) else value for name, value in (headers or {}).items()}
+
+    def url(self, url: str) -> str:
+        parts = urlsplit(url)
+        if not parts.query:
+            return url
+        query = [(name, REDACTED if self.is_secret(name) else value)
+                 for name, value in parse_qsl(parts.query, keep_blank_values=True)]
+        return urlunsplit(parts._replace(query=urlencode(query, safe='*')))
+
+    def body(self, body: Any, limit: Optional[int]) -> str:
+        """Redact and render a body: structured data is walked, text is pattern-matched"""
+        if body is None or body == b'' or body == '':
+            return ''
+        if isinstance(body, (dict, list)):
+            text = json.dumps(self.value(body))
+            return _truncate(text, limit)
+        if isinstance(body, bytes):
+            size = len(body)
+            text = (body if limit is None else body[:limit]).decode('utf-8', errors='replace')
+        else:
+            size = len(body)
+            text = body if limit is None else body[:limit]
+        text = self._form_pair.sub(rf'\1{REDACTED}', self._json_pair.sub(rf'\1"{REDACTED}"', text))
+        if limit is not None and size > limit:
+            text += f"... ({size} bytes)"
+        return text
+
+    def value(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: REDACTED if isinstance(key, str) and self.is_secret(key) else self.value(item)
+                    for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        return value
+
+
+class _LazyCall:
+    """Formatted only if a log handler emits the record"""
+    __slots__ = ('log', 'response', 'data')
+
+    def __init__(self, log: ApiCallLog, response: Any, data: Any):
+        self.log = log
+        self.response = response
+        self.data = data
+
+    def __str__(self) -> str:
+        return self.log.format(self.response, self.data)
+
+
+def _call_details(response: Any) -> Dict[str, Any]:
+    """Normalize a requests.Response or an async_api_client.APIResponse"""
+    request = getattr(response, 'request', None)
+    elapsed = getattr(response, 'elapsed', 0) or 0
+    return {
+        'method': getattr(request, 'method', None) or getattr(response, 'method', ''),
+        'url': getattr(request, 'url', None) or getattr(response, 'url', ''),
+        'status': getattr(response, 'status_code', None),
+        'elapsed': elapsed.total_seconds() if hasattr(elapsed, 'total_seconds') else elapsed,
+        'request_headers': dict(getattr(request, 'headers', None) or getattr(response, 'request_headers', None) or {}),
+        'request_body': getattr(request, 'body', None),
+        'response_headers': dict(getattr(response, 'headers', None) or {}),
+        'content': _content(response),
+    }
+
+
+def _content(response: Any) -> Any:
+    # A streamed body is read by its consumer, reading it here would consume it
+    if getattr(response, '_content', None) is False:
+        return '<streamed>'
+    return getattr(response, 'content', b'')
+
+
+def _truncate(text: str, limit: Optional[int]) -> str:
+    if limit is None or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text)} chars)"
+
+
+# Shared by API and AsyncAPI; conftest clears it per test and attaches it to failed tests
+api_call_log = ApiCallLog()
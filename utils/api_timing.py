@@ -0,0 +1,330 @@
+"""
+Per-request timing breakdown for the API client
+
+API mounts a TimedHTTPAdapter, which splits every call into phases:
+    dns        resolving the host (new connections only)
+    connect    TCP connect (new connections only)
+    tls        TLS handshake (new HTTPS connections only)
+    server     request sent until the response headers arrived
+    transfer   reading the response body
+and records the bytes sent and received (request body, response body as read from the socket). Each
+response carries its RequestTiming as response.timing, and every timing is kept in a per-process
+TimingStore. At the end of the run xdist workers write their store to API_TIMING_DIR and the
+controller merges them into percentile summaries per env and endpoint for the terminal, HTML and
+allure reports.
+
+Latency budgets such as "p95 GET /api/home < 300ms" fail the run when the merged percentile is over
+the limit. Declare them with @pytest.mark.latency_budget(...), latency_budget(...) or the
+API_LATENCY_BUDGETS setting (separated by semicolons).
+"""
+import html
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from config.config import Config
+from utils.file_lock import atomic_write
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('dns', 'connect', 'tls', 'server', 'transfer')
+SUMMARY_PERCENTILES = (50, 90, 95, 99)
+
+# Path segments that identify one resource among many are folded into {id}
+_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,})$')
+_BUDGET = re.compile(r'^\s*p(\d+(?:\.\d+)?)\s+(?:of\s+)?([A-Za-z]+)\s+(\S+)\s*<\s*(\d+(?:\.\d+)?)\s*ms\s*$')
+
+_active = threading.local()
+
+
+class RequestTiming:
+    __slots__ = ('method', 'endpoint', 'env', 'status', 'reused') + PHASES + ('total', 'bytes_sent', 'bytes_received')
+
+    def __init__(self, method: str, url: str, env: str):
+        self.method = method
+        self.endpoint = normalize_endpoint(url)
+        self.env = env
+        self.status = 0
+        self.reused = True
+        self.dns = self.connect = self.tls = self.server = self.transfer = self.total = 0.0
+        self.bytes_sent = self.bytes_received = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        phases = " ".join(f"{name}={getattr(self, name) * 1000:.1f}ms" for name in PHASES)
+        return f"<RequestTiming {self.method} {self.endpoint} {phases} total={self.total * 1000:.1f}ms>"
+
+
+class LatencyBudget:
+    def __init__(self, percentile: float, method: str, endpoint: str, limit_ms: float):
+        self.percentile = percentile
+        self.method = method.upper()
+        self.endpoint = endpoint
+        self.limit_ms = limit_ms
+
+    @classmethod
+    def parse(cls, spec: str) -> 'LatencyBudget':
+        """Parse 'p95 GET /api/home < 300ms' (also 'p95 of GET /api/home < 300 ms')"""
+        match = _BUDGET.match(spec)
+        if not match:
+            raise ValueError(f"Invalid latency budget {spec!r}, expected e.g. 'p95 GET /api/home < 300ms'")
+        percentile, method, endpoint, limit = match.groups()
+        return cls(float(percentile), method, normalize_endpoint(endpoint), float(limit))
+
+    def __str__(self) -> str:
+        return f"p{self.percentile:g} {self.method} {self.endpoint} < {self.limit_ms:g}ms"
+
+
+class TimingStore:
+    """Timings of every API call made by this process"""
+
+    def __init__(self):
+        self._records: List[RequestTiming] = []
+        self._budgets: Dict[str, LatencyBudget] = {}
+        self._lock = threading.Lock()
+
+    def add(self, timing: RequestTiming) -> None:
+        with self._lock:
+            self._records.append(timing)
+
+    def mark(self) -> int:
+        """Position to pass to records(since=...) to get only the calls made after now"""
+        return len(self._records)
+
+    def records(self, since: int = 0) -> List[RequestTiming]:
+        with self._lock:
+            return self._records[since:]
+
+    def add_budget(self, spec: str) -> LatencyBudget:
+        budget = LatencyBudget.parse(spec)
+        with self._lock:
+            self._budgets[str(budget)] = budget
+        return budget
+
+    def budgets(self) -> List[LatencyBudget]:
+        return list(self._budgets.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._budgets.clear()
+
+    def write(self, worker_id: str, directory: Optional[str] = None) -> None:
+        """Persist timings and budgets for the controller to merge"""
+        directory = Path(directory or Config.API_TIMING_DIR)
+        records = self.records()
+        if records:
+            lines = "".join(json.dumps(timing.as_dict()) + "\n" for timing in records)
+            atomic_write(str(directory / f"{worker_id}.jsonl"), lines.encode())
+        if self._budgets:
+            atomic_write(str(directory / f"{worker_id}.budgets.json"),
+                         json.dumps([str(budget) for budget in self.budgets()]).encode())
+
+
+def normalize_endpoint(url: str) -> str:
+    """Path of a URL with ids folded, so /api/claims/42 and /api/claims/43 are one endpoint"""
+    path = urlsplit(url).path or '/'
+    return '/'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per (env, method, endpoint): call count, total-time percentiles and mean phases, in milliseconds"""
+    groups: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        groups[(record['env'], record['method'], record['endpoint'])].append(record)
+    summary = []
+    for (env, method, endpoint), calls in sorted(groups.items()):
+        totals = sorted(call['total'] * 1000 for call in calls)
+        row = {'env': env, 'method': method, 'endpoint': endpoint, 'count': len(calls)}
+        row.update({f"p{p:g}": round(percentile(totals, p), 1) for p in SUMMARY_PERCENTILES})
+        row['max'] = round(totals[-1], 1)
+        row.update({f"{phase}_ms": round(sum(call[phase] for call in calls) * 1000 / len(calls), 1) for phase in PHASES})
+        row['bytes_received'] = sum(call['bytes_received'] for call in calls)
+        summary.append(row)
+    return summary
+
+
+def check_budgets(records: List[Dict[str, Any]], budgets: Iterable[LatencyBudget]) -> List[str]:
+    """Messages for every env whose percentile of a budgeted endpoint is over the limit"""
+    violations = []
+    for budget in budgets:
+        by_env: Dict[str, List[float]] = defaultdict(list)
+        for record in records:
+            if record['method'] == budget.method and record['endpoint'] == budget.endpoint:
+                by_env[record['env']].append(record['total'] * 1000)
+        for env, totals in sorted(by_env.items()):
+            observed = percentile(sorted(totals), budget.percentile)
+            if observed >= budget.limit_ms:
+                violations.append(f"{budget} on {env}: p{budget.percentile:g} was {observed:.1f}ms over {len(totals)} calls")
+    return violations
+
+
+def load_run(directory: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[LatencyBudget]]:
+    """Timings and budgets of this process plus every worker that wrote them"""
+    records = [timing.as_dict() for timing in timing_store.records()]
+    budgets = {str(budget): budget for budget in timing_store.budgets()}
+    for spec in Config.API_LATENCY_BUDGETS:
+        budget = LatencyBudget.parse(spec)
+        budgets[str(budget)] = budget
+    directory = Path(directory or Config.API_TIMING_DIR)
+    if directory.is_dir():
+        for path in sorted(directory.glob("*.jsonl")):
+            with open(path) as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+        for path in sorted(directory.glob("*.budgets.json")):
+            for spec in json.loads(path.read_text()):
+                budget = LatencyBudget.parse(spec)
+                budgets[str(budget)] = budget
+    return records, list(budgets.values())
+
+
+def format_summary(summary: List[Dict[str, Any]]) -> List[str]:
+    """Text table for the terminal report"""
+    lines = [f"{'env':<5} {'endpoint':<40} {'calls':>6} {'p50':>8} {'p95':>8} {'p99':>8} "
+             f"{'dns':>6} {'conn':>6} {'tls':>6} {'server':>8} {'xfer':>6}"]
+    for row in summary:
+        lines.append(f"{row['env']:<5} {row['method'] + ' ' + row['endpoint']:<40} {row['count']:>6} "
+                     f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f} {row['dns_ms']:>6.1f} "
+                     f"{row['connect_ms']:>6.1f} {row['tls_ms']:>6.1f} {row['server_ms']:>8.1f} {row['transfer_ms']:>6.1f}")
+    return lines
+
+
+def summary_html(summary: List[Dict[str, Any]]) -> str:
+    """Table for the HTML report; times in milliseconds"""
+    columns = ['env', 'method', 'endpoint', 'count', 'p50', 'p90', 'p95', 'p99', 'max',
+               'dns_ms', 'connect_ms', 'tls_ms', 'server_ms', 'transfer_ms', 'bytes_received']
+    head = "".join(f"<th>{column}</th>" for column in columns)
+    rows = "".join("<tr>" + "".join(f"<td>{html.escape(str(row[column]))}</td>" for column in columns) + "</tr>"
+                   for row in summary)
+    return f"<h3>API latency (ms)</h3><table><tr>{head}</tr>{rows}</table>"
+
+
+def reset_run(directory: Optional[str] = None) -> None:
+    """Remove timings of a previous run"""
+    shutil.rmtree(directory or Config.API_TIMING_DIR, ignore_errors=True)
+
+
+def latency_budget(spec: str) -> LatencyBudget:
+    """Declare a latency budget for the run, e.g. latency_budget('p95 GET /api/home < 300ms')"""
+    return timing_store.add_budget(spec)
+
+
+class _TimedConnectionMixin:
+    """Adds DNS, connect and TLS times of new connections to the request being sent on this thread"""
+
+    def _new_conn(self):
+        timing = getattr(_active, 'timing', None)
+        if timing is None:
+            return super()._new_conn()
+        timing.reused = False
+        started = time.perf_counter()
+        try:
+            addresses = list(dict.fromkeys(
+                info[4][0] for info in socket.getaddrinfo(self._dns_host, self.port, type=socket.SOCK_STREAM)))
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        timing.dns += resolved - started
+        # Connect to the resolved addresses in order, as create_connection would, without resolving again
+        host = self._dns_host
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError):
+                    if index == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+            timing.connect += time.perf_counter() - resolved
+
+    def connect(self):
+        timing = getattr(_active, 'timing', None)
+        if timing is None:
+            return super().connect()
+        started = time.perf_counter()
+        before = timing.dns + timing.connect
+        super().connect()
+        if isinstance(self, HTTPSConnection):
+            timing.tls += time.perf_counter() - started - (timing.dns + timing.connect - before)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """requests adapter that times every call and records it in a TimingStore"""
+
+    def __init__(self, store: Optional['TimingStore'] = None, **kwargs: Any):
+        self.store = store or timing_store
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                                   'https': _TimedHTTPSConnectionPool}
+
+    def send(self, request, stream=False, **kwargs):
+        timing = RequestTiming(request.method, request.url, os.getenv('ENV', Config.ENV).upper())
+        if isinstance(request.body, (bytes, str)):
+            timing.bytes_sent = len(request.body.encode() if isinstance(request.body, str) else request.body)
+        _active.timing = timing
+        started = time.perf_counter()
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+        finally:
+            _active.timing = None
+        headers_received = time.perf_counter()
+        if not stream:
+            response.content  # Read the body here, so its transfer is timed
+        finished = time.perf_counter()
+
+        timing.status = response.status_code
+        timing.server = max(0.0, headers_received - started - timing.dns - timing.connect - timing.tls)
+        timing.transfer = finished - headers_received
+        timing.total = finished - started
+        timing.bytes_received = response.raw.tell() if not stream else 0
+        response.timing = timing
+        self.store.add(timing)
+        return response
+
+
+# Shared by every API client of this process
+timing_store = TimingStore()
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Union
+import aiohttp
+from config.config import Config
+from utils.api_logging import api_call_log
+
+logger = logging.getLogger(__name__)
+
+
+class APIResponse:
+    """A fully read response, so the connection is back in the pool before the caller looks at it"""
+
+    def __init__(self, method: str, url: str, status_code: int, headers: Dict[str, str], content: bytes,
+                 elapsed: float, encoding: Optional[str] = None, request_headers: Optional[Dict[str, str]] = None):
+        self.method = method
+        self.request_headers = request_headers or {}
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def __repr__(self) -> str:
+        return f"<APIResponse [{self.status_code}] {self.method} {self.url}>"
+
+
+class BatchRequest(NamedTuple):
+    method: str
+    endpoint: str
+    kwargs: Dict[str, Any] = {}
+
+
+class AsyncAPI:
+    """
+    Asynchronous sibling of utils.api_client.API built on aiohttp, with a shared keep-alive
+    connection pool. Use it as an async context manager, or call close() when done.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, pool_size: Optional[int] = None,
+                 per_host_limit: Optional[int] = None, keepalive_timeout: Optional[float] = None):
+        self.base_url = (base_url or Config.API_BASE_URL).rstrip('/')
+        self.timeout = Config.API_TIMEOUT / 1000  # Convert to seconds
+        self.pool_size = Config.API_POOL_SIZE if pool_size is None else pool_size
+        self.per_host_limit = Config.API_POOL_PER_HOST if per_host_limit is None else per_host_limit
+        self.keepalive_timeout = Config.API_KEEPALIVE_TIMEOUT if keepalive_timeout is None else keepalive_timeout
+        self.headers: Dict[str, str] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> 'AsyncAPI':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The pooled session, created on first use inside the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host_limit,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _log_request_response(self, response: APIResponse, data: Optional[Dict[str, Any]] = None) -> None:
+        """Log request and response details (lazily, truncated and redacted, see utils.api_logging)"""
+        api_call_log.record(response, data)
+
+    async def request(self, method: str, endpoint: str, **kwargs: Any) -> APIResponse:
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        headers = {**self.headers, **kwargs.pop('headers', {})}
+        started = time.perf_counter()
+        async with self.session.request(method, url, headers=headers, **kwargs) as raw_response:
+            content = await raw_response.read()
+            response = APIResponse(method, str(raw_response.url), raw_response.status, dict(raw_response.headers),
+                                   content, time.perf_counter() - started, raw_response.charset, headers)
+        self._log_request_response(response, kwargs.get('json') or kwargs.get('data'))
+        return response
+
+    async def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> APIResponse:
+        return await self.request('GET', endpoint, params=params, **kwargs)
+
+    async def post(self, endpoint: str, data: Optional[Dict[str, Any]] = None, json_data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> APIResponse:
+        return await self.request('POST', endpoint, json=json_data, data=data, **kwargs)
+
+    async def put(self, endpoint: str, data: Optional[Dict[str, Any]] = None, json_data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> APIResponse:
+        return await self.request('PUT', endpoint, json=json_data, data=data, **kwargs)
+
+    async def delete(self, endpoint: str, **kwargs: Any) -> APIResponse:
+        return await self.request('DELETE', endpoint, **kwargs)
+
+    async def patch(self, endpoint: str, data: Optional[Dict[str, Any]] = None, json_data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> APIResponse:
+        return await self.request('PATCH', endpoint, json=json_data, data=data, **kwargs)
+
+    def set_headers(self, headers: Dict[str, str]) -> None:
+        """Set default headers for all requests"""
+        self.headers.update(headers)
+
+    def set_token(self, token: str) -> None:
+        """Set bearer token for authentication"""
+        self.headers['Authorization'] = f'Bearer {token}'
+
+    async def gather(self, requests: Iterable[Union[BatchRequest, Sequence[Any]]], concurrency: Optional[int] = None,
+                     return_exceptions: bool = False) -> List[Union[APIResponse, BaseException]]:
+        """
+        Run many requests with at most `concurrency` in flight and return the responses in request order.
+        Each request is a BatchRequest or a (method, endpoint[, kwargs]) tuple. Without return_exceptions
+        the first failure is raised and the requests still in flight are cancelled, so nothing more is
+        sent; with it, failed requests yield their exception instead.
+        """
+        batch = [request if isinstance(request, BatchRequest) else BatchRequest(*request) for request in requests]
+        limit = max(1, concurrency or Config.API_BATCH_CONCURRENCY)
+        results: List[Any] = [None] * len(batch)
+        next_index = iter(range(len(batch)))
+
+        # A fixed set of workers pulling indexes keeps at most `limit` requests (and tasks) alive
+        async def worker() -> None:
+            for index in next_index:
+                request = batch[index]
+                try:
+                    results[index] = await self.request(request.method, request.endpoint, **dict(request.kwargs))
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results[index] = e
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(limit, len(batch)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        return results
+
+
+def run_batch(requests: Iterable[Union[BatchRequest, Sequence[Any]]], base_url: Optional[str] = None,
+              concurrency: Optional[int] = None, token: Optional[str] = None,
+              return_exceptions: bool = False) -> List[Union[APIResponse, BaseException]]:
+    """Run a batch from synchronous code, e.g. a regular pytest test, on a fresh event loop"""
+    async def run() -> List[Union[APIResponse, BaseException]]:
+        async with AsyncAPI(base_url) as api:
+            if token:
+                api.set_token(token)
+            return await api.gather(requests, concurrency, return_exceptions)
+    return asyncio.run(run())
@@ -0,0 +1,201 @@
+"""
+Auth tokens shared by every test and xdist worker
+
+TokenProvider logs in once per (env, role, API base URL) and shares the token through a small file
+cache in API_TOKEN_CACHE_DIR, so a run logs in once per role instead of once per test and worker.
+Reads are lock-free; a login happens under the entry's FileLock after re-reading the file, so workers
+that need a token at the same time wait for one login instead of each doing their own.
+
+Tokens are refreshed proactively when they are within API_TOKEN_REFRESH_MARGIN seconds of expiring. The
+expiry comes from expires_in in the login response, the JWT exp claim, or API_TOKEN_DEFAULT_TTL. When a
+request is answered 401 the token is re-issued once (unless another worker already did) and the request
+is retried with it.
+
+Credentials of a role come from the API_<ROLE>_EMAIL / API_<ROLE>_PASSWORD environment variables (with an
+env prefix taking precedence, e.g. QA_API_AGENT_EMAIL), or from test_data/<env>/users.json:
+    {"agent": {"email": "...", "password": "..."}}
+
+Usage:
+    api = API(role='agent')   # every request carries the agent's token
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+import requests
+from requests.auth import AuthBase
+from config.config import Config
+from utils.env_manager import env_manager
+from utils.file_lock import FileLock, atomic_write
+
+logger = logging.getLogger(__name__)
+
+# (base_url, credentials) -> login response JSON
+LoginFunction = Callable[[str, Dict[str, str]], Dict[str, Any]]
+
+
+class AuthError(Exception):
+    pass
+
+
+class TokenProvider:
+    def __init__(self, cache_dir: Optional[str] = None, refresh_margin: Optional[float] = None,
+                 default_ttl: Optional[float] = None, login: Optional[LoginFunction] = None):
+        """
+        cache_dir: directory of the token files shared by workers
+        refresh_margin: seconds before expiry at which a token is replaced
+        default_ttl: lifetime of tokens whose expiry is not known
+        login: replaces the default POST to API_LOGIN_ENDPOINT
+        """
+        self.cache_dir = cache_dir or Config.API_TOKEN_CACHE_DIR
+        self.refresh_margin = Config.API_TOKEN_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        self.default_ttl = Config.API_TOKEN_DEFAULT_TTL if default_ttl is None else default_ttl
+        self._login = login or _post_login
+        self._tokens: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.logins = 0
+
+    def get_token(self, role: str, base_url: Optional[str] = None) -> str:
+        """A token for the role that stays valid for at least the refresh margin"""
+        key = self._key(role, base_url)
+        entry = self._tokens.get(key)
+        if entry is None or not self._usable(entry):
+            entry = self._read(key)
+            if entry is None or not self._usable(entry):
+                entry = self._issue(role, base_url, key, lambda current: current is None or not self._usable(current))
+        return entry['token']
+
+    def reissue(self, role: str, stale_token: str, base_url: Optional[str] = None) -> str:
+        """
+        Replace a token the server rejected. If another worker has already replaced it, its new token
+        is used instead of logging in again.
+        """
+        key = self._key(role, base_url)
+        entry = self._issue(role, base_url, key,
+                            lambda current: current is None or current['token'] == stale_token or not self._usable(current))
+        return entry['token']
+
+    def clear(self) -> None:
+        """Forget every token, in memory and on disk"""
+        with self._lock:
+            self._tokens.clear()
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def _issue(self, role: str, base_url: Optional[str], key: str,
+               needs_login: Callable[[Optional[Dict[str, Any]]], bool]) -> Dict[str, Any]:
+        path = self._path(key)
+        with self._lock, FileLock(f"{path}.lock"):
+            # Another worker may have logged in while this one waited for the lock
+            entry = self._read(key)
+            if needs_login(entry):
+                entry = self._fresh_token(role, base_url or Config.API_BASE_URL)
+                atomic_write(path, json.dumps(entry).encode(), mode=0o600)
+            self._tokens[key] = entry
+        return entry
+
+    def _fresh_token(self, role: str, base_url: str) -> Dict[str, Any]:
+        response = self._login(base_url, credentials(role))
+        self.logins += 1
+        token = response.get('token') or response.get('access_token')
+        if not token:
+            raise AuthError(f"Login as {role} at {base_url} returned no token")
+        expires_in = response.get('expires_in')
+        expires_at = (time.time() + float(expires_in) if expires_in is not None
+                      else _jwt_expiry(token) or time.time() + self.default_ttl)
+        logger.info(f"Logged in as {role} at {base_url}, token valid for {expires_at - time.time():.0f}s")
+        return {'token': token, 'expires_at': expires_at, 'role': role}
+
+    def _usable(self, entry: Dict[str, Any]) -> bool:
+        return entry['expires_at'] - time.time() > self.refresh_margin
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._tokens[key] = entry
+        return entry
+
+    @staticmethod
+    def _key(role: str, base_url: Optional[str]) -> str:
+        env = os.getenv('ENV', Config.ENV).lower()
+        digest = hashlib.sha1((base_url or Config.API_BASE_URL).rstrip('/').encode()).hexdigest()[:12]
+        return f"{env}_{role}_{digest}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+
+class TokenAuth(AuthBase):
+    """requests auth that adds the role's shared token and re-authenticates once on 401"""
+
+    def __init__(self, role: str, base_url: Optional[str] = None, provider: Optional[TokenProvider] = None):
+        self.role = role
+        self.base_url = base_url
+        self.provider = provider or token_provider
+
+    def __call__(self, request: requests.PreparedRequest) -> requests.PreparedRequest:
+        request.headers['Authorization'] = f"Bearer {self.provider.get_token(self.role, self.base_url)}"
+        request.register_hook('response', self._retry_unauthorized)
+        return request
+
+    def _retry_unauthorized(self, response: requests.Response, **kwargs: Any) -> requests.Response:
+        if response.status_code != 401 or getattr(response.request, '_reauthenticated', False):
+            return response
+        stale_token = response.request.headers.get('Authorization', '')[len('Bearer '):]
+        logger.info(f"{response.request.method} {response.request.url} answered 401, re-authenticating as {self.role}")
+        token = self.provider.reissue(self.role, stale_token, self.base_url)
+
+        response.content  # Release the connection before sending the retry on it
+        retry = response.request.copy()
+        retry.headers['Authorization'] = f"Bearer {token}"
+        retry._reauthenticated = True
+        retried = response.connection.send(retry, **kwargs)
+        retried.history.append(response)
+        retried.request = retry
+        return retried
+
+
+def credentials(role: str) -> Dict[str, str]:
+    """Login payload of a role from the environment or test_data/<env>/users.json"""
+    prefix = f"API_{role.upper()}"
+    email = env_manager.get_env_specific_value(f"{prefix}_EMAIL")
+    password = env_manager.get_env_specific_value(f"{prefix}_PASSWORD")
+    if email and password:
+        return {'email': email, 'password': password}
+    user = env_manager.get_test_data("users.json").get(role)
+    if not user:
+        raise AuthError(f"No credentials for role {role!r}: set {prefix}_EMAIL/{prefix}_PASSWORD or add it to users.json")
+    return {'email': user['email'], 'password': user['password']}
+
+
+def _post_login(base_url: str, payload: Dict[str, str]) -> Dict[str, Any]:
+    response = requests.post(f"{base_url.rstrip('/')}/{Config.API_LOGIN_ENDPOINT.lstrip('/')}", json=payload,
+                             timeout=Config.API_TIMEOUT / 1000)
+    if response.status_code != 200:
+        raise AuthError(f"Login at {base_url} failed with {response.status_code}")
+    return response.json()
+
+
+def _jwt_expiry(token: str) -> Optional[float]:
+    """The exp claim of a JWT, or None for other tokens"""
+    parts = token.split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(parts[1] + '=' * (-len(parts[1]) % 4)))
+        return float(claims['exp'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+# Shared by every API client of this process
+token_provider = TokenProvider()
@@ -0,0 +1,188 @@
+"""
+Content-addressed store for visual baselines shared by all environments and matrix combinations
+
+Layout under the store root:
+    blobs/<aa>/<sha256>.png   one optimized PNG per distinct image
+    index.json                maps "<env>/<combo>/<name>" to the blob holding its baseline
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from PIL import Image
+from config.config import Config
+from utils.file_lock import FileLock, atomic_write
+
+logger = logging.getLogger(__name__)
+
+_ACTUAL_IMAGE = re.compile(r"^(?P<name>.+?)(?:\.\d+-\d+)?_actual\.png$")
+
+
+class BaselineStore:
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or Config.BASELINE_STORE_DIR)
+        self.blob_dir = self.root / "blobs"
+        self.index_path = self.root / "index.json"
+        self._lock_path = str(self.root / "index.lock")
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._index_version: Optional[Tuple[int, int]] = None
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(env: str, combo: str, name: str) -> str:
+        """Return the index key for a baseline"""
+        return f"{env.lower()}/{combo}/{name}"
+
+    @staticmethod
+    def normalize(image: bytes) -> Tuple[str, bytes]:
+        """
+        Return the pixel digest and optimized PNG encoding of an image.
+        Hashing decoded pixels makes identical screenshots share a blob even if
+        they were encoded differently.
+        """
+        with Image.open(io.BytesIO(image)) as decoded:
+            decoded.load()
+            digest = hashlib.sha256(
+                f"{decoded.mode}:{decoded.size[0]}x{decoded.size[1]}:".encode() + decoded.tobytes()
+            ).hexdigest()
+            buffer = io.BytesIO()
+            decoded.save(buffer, format="PNG", optimize=True)
+        return digest, buffer.getvalue()
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}.png"
+
+    def get_entry(self, env: str, combo: str, name: str) -> Optional[Dict[str, Any]]:
+        """Return the index entry of a baseline or None if there is none"""
+        return self._load_index().get(self.key(env, combo, name))
+
+    def get_path(self, env: str, combo: str, name: str) -> Optional[Path]:
+        """Return the blob path of a baseline or None if there is none"""
+        entry = self.get_entry(env, combo, name)
+        if entry is None:
+            return None
+        path = self.blob_path(entry["blob"])
+        if not path.exists():
+            logger.warning(f"Baseline {self.key(env, combo, name)} references missing blob {entry['blob']}")
+            return None
+        return path
+
+    def get(self, env: str, combo: str, name: str) -> Optional[bytes]:
+        """Return the baseline image bytes or None if there is none"""
+        path = self.get_path(env, combo, name)
+        return path.read_bytes() if path else None
+
+    def put(self, env: str, combo: str, name: str, image: bytes) -> str:
+        """Store an image as the baseline for (env, combo, name) and return its blob digest"""
+        digest, encoded = self.normalize(image)
+        with FileLock(self._lock_path):
+            path = self.blob_path(digest)
+            if not path.exists():
+                atomic_write(str(path), encoded)
+            index = self._load_index(force=True)
+            index[self.key(env, combo, name)] = {"blob": digest}
+            self._write_index(index)
+        logger.info(f"Stored baseline {self.key(env, combo, name)} as blob {digest[:12]}")
+        return digest
+
+    def update_entry(self, env: str, combo: str, name: str, **metadata: Any) -> None:
+        """Attach metadata to an existing baseline entry"""
+        with FileLock(self._lock_path):
+            index = self._load_index(force=True)
+            key = self.key(env, combo, name)
+            if key not in index:
+                raise KeyError(f"No baseline stored for {key}")
+            index[key].update(metadata)
+            self._write_index(index)
+
+    def list_keys(self, env: Optional[str] = None, combo: Optional[str] = None) -> List[str]:
+        """Return index keys, optionally filtered by environment and combination"""
+        keys = []
+        for key in self._load_index():
+            key_env, key_combo, _ = key.split("/", 2)
+            if env and key_env != env.lower():
+                continue
+            if combo and key_combo != combo:
+                continue
+            keys.append(key)
+        return sorted(keys)
+
+    def promote(self, source_env: str, target_env: str,
+                combos: Optional[Iterable[str]] = None, names: Optional[Iterable[str]] = None) -> int:
+        """
+        Point the target environment at the source environment's baselines.
+        Only index entries are copied, blobs stay shared. Returns the number of promoted baselines.
+        """
+        combos = set(combos) if combos else None
+        names = set(names) if names else None
+        promoted = 0
+        with FileLock(self._lock_path):
+            index = self._load_index(force=True)
+            for key, entry in list(index.items()):
+                key_env, key_combo, key_name = key.split("/", 2)
+                if key_env != source_env.lower():
+                    continue
+                if (combos and key_combo not in combos) or (names and key_name not in names):
+                    continue
+                index[self.key(target_env, key_combo, key_name)] = {"blob": entry["blob"]}
+                promoted += 1
+            self._write_index(index)
+        logger.info(f"Promoted {promoted} baselines from {source_env} to {target_env}")
+        return promoted
+
+    def accept_actuals(self, env: str, diff_root: str) -> int:
+        """
+        Bulk-accept the actual screenshots of the last run as new baselines.
+        Expects the VisualComparison layout <diff_root>/<combo>/<name>.<pid>-<n>_actual.png.
+        """
+        latest: Dict[Tuple[str, str], Path] = {}
+        for actual_path in sorted(Path(diff_root).glob("*/*_actual.png"), key=lambda path: path.stat().st_mtime_ns):
+            # Each comparison writes <name>.<pid>-<n>_actual.png; the newest one of a name is accepted
+            name = _ACTUAL_IMAGE.match(actual_path.name).group("name")
+            latest[(actual_path.parent.name, name)] = actual_path
+        for (combo, name), actual_path in sorted(latest.items()):
+            self.put(env, combo, name, actual_path.read_bytes())
+        return len(latest)
+
+    def import_legacy(self, legacy_dir: str, env: str, combo: str = "default") -> int:
+        """Import baselines from the old baseline_images/<env>/<name>.png layout"""
+        imported = 0
+        for legacy_path in sorted(Path(legacy_dir).glob("*.png")):
+            self.put(env, combo, legacy_path.stem, legacy_path.read_bytes())
+            imported += 1
+        return imported
+
+    def gc(self) -> int:
+        """Delete blobs no index entry references and return how many were removed"""
+        removed = 0
+        with FileLock(self._lock_path):
+            referenced = {entry["blob"] for entry in self._load_index(force=True).values()}
+            for path in self.blob_dir.glob("*/*.png"):
+                if path.stem not in referenced:
+                    path.unlink()
+                    removed += 1
+        logger.info(f"Garbage collected {removed} unreferenced baseline blobs")
+        return removed
+
+    def _load_index(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Return the index, re-reading it only when it changed on disk"""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            self._index, self._index_version = {}, None
+            return self._index
+        version = (stat.st_mtime_ns, stat.st_size)
+        if force or version != self._index_version:
+            with open(self.index_path, "r") as f:
+                self._index = json.load(f)
+            self._index_version = version
+        return self._index
+
+    def _write_index(self, index: Dict[str, Dict[str, Any]]) -> None:
+        atomic_write(str(self.index_path), json.dumps(index, indent=1, sort_keys=True).encode())
+        stat = os.stat(self.index_path)
+        self._index, self._index_version = index, (stat.st_mtime_ns, stat.st_size)
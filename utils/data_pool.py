@@ -0,0 +1,383 @@
+"""
+Leased pools of pre-generated test data, one SQLite file per environment
+
+Creating an account or a claim inline in every test is slow against a real environment. A DataPool keeps
+ready-made records in DATA_POOL_DIR/<env>.sqlite and tests check them out:
+
+    with data_pool.lease('user') as lease:
+        login(lease.record['email'])
+
+A lease is taken in a single SQLite write transaction, so no two tests or xdist workers ever hold the same
+record. Leaving the block returns the record to the pool, with any changes made to lease.record, until it
+has been used max_uses times; a record whose test raised is retired instead, since its state is unknown.
+Leases not returned within DATA_POOL_LEASE_TTL seconds (a crashed worker) are retired too.
+
+Records come from kinds: a function making n records, which may create them through the API. user,
+product and order are built in on TestDataGenerator's batch methods; more are added with register_kind().
+When a lease leaves fewer than low_watermark free records of a kind, one worker (chosen through the
+database) refills it with a batch in a background thread; a lease on an empty pool refills in the
+foreground. Records can also be seeded from test_data/<env>/data_pool.json ({"agent": [{...}, ...]});
+each seeded record is inserted once, so a retired one does not come back.
+
+Records outlive the run that made them, so generated IDs must not repeat across runs. The pool stores how
+far each ID allocator partition has been drawn and the next run's allocators continue from there. As a
+backstop, a kind holds each record 'id' once: a duplicate is dropped and made again.
+
+python fill_data_pool.py fills and inspects the pools ahead of a run.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config.config import Config
+from utils.env_manager import env_manager
+from utils.id_allocator import IdAllocator, shared_allocator
+from utils.test_data import ID_DIGITS, TestDataGenerator
+
+logger = logging.getLogger(__name__)
+
+# n -> n new records
+MakeRecords = Callable[[int], List[Dict[str, Any]]]
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    fingerprint TEXT,
+    record_id TEXT,
+    state TEXT NOT NULL DEFAULT 'free',
+    owner TEXT,
+    lease_expires REAL,
+    uses INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    UNIQUE (kind, fingerprint),
+    UNIQUE (kind, record_id)
+);
+CREATE INDEX IF NOT EXISTS records_by_state ON records (kind, state, uses, id);
+CREATE TABLE IF NOT EXISTS refills (kind TEXT PRIMARY KEY, owner TEXT NOT NULL, started_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS id_positions (partition TEXT PRIMARY KEY, issued INTEGER NOT NULL);
+'''
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class PoolKind:
+    def __init__(self, name: str, make: Optional[MakeRecords] = None, low_watermark: Optional[int] = None,
+                 batch: Optional[int] = None, max_uses: Optional[int] = 1):
+        """
+        make: builds n new records; None for kinds that are only seeded
+        low_watermark: free records below which a refill starts
+        batch: records added per refill
+        max_uses: leases of a record before it is retired; None recycles it forever
+        """
+        self.name = name
+        self.make = make
+        self.low_watermark = Config.DATA_POOL_LOW_WATERMARK if low_watermark is None else low_watermark
+        self.batch = Config.DATA_POOL_REFILL_BATCH if batch is None else batch
+        self.max_uses = max_uses
+
+    def __repr__(self) -> str:
+        return f"<PoolKind {self.name} low_watermark={self.low_watermark} batch={self.batch} max_uses={self.max_uses}>"
+
+
+class Lease:
+    """A record checked out of a pool; release() or retire() it, or use it as a context manager"""
+
+    def __init__(self, pool: 'DataPool', kind: str, record_id: int, record: Dict[str, Any], uses: int):
+        self.pool = pool
+        self.kind = kind
+        self.id = record_id
+        self.record = record
+        self.uses = uses
+        self.done = False
+
+    def release(self) -> None:
+        """Return the record, as changed by the test, unless it has been used max_uses times"""
+        max_uses = self.pool.kind(self.kind).max_uses
+        self._finish('retired' if max_uses is not None and self.uses >= max_uses else 'free')
+
+    def retire(self) -> None:
+        """Take the record out of circulation"""
+        self._finish('retired')
+
+    def _finish(self, state: str) -> None:
+        if not self.done:
+            self.done = True
+            self.pool._return(self, state)
+
+    def __enter__(self) -> 'Lease':
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type:
+            self.retire()
+        else:
+            self.release()
+
+    def __repr__(self) -> str:
+        return f"<Lease {self.kind}#{self.id} uses={self.uses}>"
+
+
+def _generated(method: str) -> MakeRecords:
+    # Unseeded, so IDs come from the process-wide allocators and never collide across workers
+    return lambda n: getattr(TestDataGenerator(), method)(n).to_list()
+
+
+kinds: Dict[str, PoolKind] = {
+    'user': PoolKind('user', _generated('generate_users')),
+    'product': PoolKind('product', _generated('generate_products')),
+    'order': PoolKind('order', _generated('generate_orders')),
+}
+
+
+def register_kind(name: str, make: Optional[MakeRecords] = None, **policy: Any) -> PoolKind:
+    """Add a kind to every DataPool created afterwards, e.g. from a conftest"""
+    kinds[name] = PoolKind(name, make, **policy)
+    return kinds[name]
+
+
+class DataPool:
+    def __init__(self, env: Optional[str] = None, path: Optional[str] = None, lease_ttl: Optional[float] = None):
+        """
+        env: environment whose pool is used, the current one by default
+        path: SQLite file, DATA_POOL_DIR/<env>.sqlite by default
+        lease_ttl: seconds after which an unreturned lease is retired
+        """
+        self.env = (env or env_manager.get_current_env()).lower()
+        self.path = path or os.path.join(Config.DATA_POOL_DIR, f"{self.env}.sqlite")
+        self.lease_ttl = Config.DATA_POOL_LEASE_TTL if lease_ttl is None else lease_ttl
+        self.owner = f"{os.getenv('PYTEST_XDIST_WORKER', 'main')}:{os.getpid()}"
+        self.kinds = dict(kinds)
+        self._local = threading.local()
+        self._refills: List[threading.Thread] = []
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def register(self, name: str, make: Optional[MakeRecords] = None, **policy: Any) -> PoolKind:
+        """Add a kind to this pool only"""
+        self.kinds[name] = PoolKind(name, make, **policy)
+        return self.kinds[name]
+
+    def kind(self, name: str) -> PoolKind:
+        """The kind's policy; kinds only known from seeded records are recycled forever"""
+        return self.kinds.get(name) or PoolKind(name, max_uses=None)
+
+    def lease(self, kind: str, timeout: Optional[float] = None) -> Lease:
+        """
+        Check out a free record of the kind. An empty pool is refilled in the foreground, or waited on
+        while another worker refills it, for up to timeout seconds (DATA_POOL_WAIT_TIMEOUT).
+        """
+        deadline = time.monotonic() + (Config.DATA_POOL_WAIT_TIMEOUT if timeout is None else timeout)
+        while True:
+            lease, free = self._claim(kind)
+            if lease is not None:
+                if free < self.kind(kind).low_watermark:
+                    self._refill_in_background(kind)
+                return lease
+            if self.kind(kind).make is None:
+                raise PoolExhausted(f"No free {kind} records in {self.path} and the kind has no generator")
+            if not self.refill(kind) and time.monotonic() >= deadline:
+                raise PoolExhausted(f"No free {kind} records in {self.path} after waiting for a refill")
+            if not self._free(kind):
+                time.sleep(0.05)
+
+    def refill(self, kind: str, count: Optional[int] = None) -> int:
+        """
+        Add count records (the kind's batch by default) unless another worker is refilling the kind.
+        Returns the number of records added.
+        """
+        if self.kind(kind).make is None or not self._claim_refill(kind):
+            return 0
+        return self._generate(kind, count)
+
+    def fill(self, kind: str, target: int) -> int:
+        """Refill until the kind has at least target free records; returns the number added"""
+        free = self._free(kind)
+        if self.kind(kind).make is None and free < target:
+            raise PoolExhausted(f"Only {free} free {kind} records in {self.path} and the kind has no generator")
+        added = 0
+        while self._free(kind) < target:
+            count = self.refill(kind, target - self._free(kind))
+            if not count:
+                time.sleep(0.05)
+            added += count
+        return added
+
+    def seed(self, records: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> int:
+        """
+        Insert records given per kind, test_data/<env>/data_pool.json by default. A record already seeded
+        (even if since retired) is skipped. Returns the number inserted.
+        """
+        if records is None:
+            records = env_manager.get_test_data('data_pool.json')
+        inserted = 0
+        for kind, items in records.items():
+            inserted += self._insert(kind, items, fingerprint=True)
+        if inserted:
+            logger.info(f"Seeded {inserted} records into {self.path}")
+        return inserted
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Record counts per kind and state"""
+        stats: Dict[str, Dict[str, int]] = {}
+        for kind, state, count in self._connection().execute(
+                'SELECT kind, state, COUNT(*) FROM records GROUP BY kind, state ORDER BY kind'):
+            stats.setdefault(kind, {'free': 0, 'leased': 0, 'retired': 0})[state] = count
+        return stats
+
+    def prune(self, kind: Optional[str] = None) -> int:
+        """Delete retired generated records; retired seeded records are kept so they are not seeded again"""
+        query = "DELETE FROM records WHERE state = 'retired' AND fingerprint IS NULL"
+        cursor = self._execute(query + (' AND kind = ?' if kind else ''), (kind,) if kind else ())
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """Wait for background refills, then close this thread's connection"""
+        for thread in self._refills:
+            thread.join()
+        self._refills.clear()
+        self._close_connection()
+
+    def _claim(self, kind: str) -> Tuple[Optional[Lease], int]:
+        """(lease or None, free records left) in one write transaction"""
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute("UPDATE records SET state = 'retired', owner = NULL "
+                               "WHERE kind = ? AND state = 'leased' AND lease_expires < ?", (kind, now))
+            row = connection.execute("SELECT id, data, uses FROM records WHERE kind = ? AND state = 'free' "
+                                     "ORDER BY uses, id LIMIT 1", (kind,)).fetchone()
+            if row is None:
+                return None, 0
+            record_id, data, uses = row
+            connection.execute("UPDATE records SET state = 'leased', owner = ?, lease_expires = ?, uses = uses + 1 "
+                               "WHERE id = ?", (self.owner, now + self.lease_ttl, record_id))
+            free = connection.execute("SELECT COUNT(*) FROM records WHERE kind = ? AND state = 'free'",
+                                      (kind,)).fetchone()[0]
+        return Lease(self, kind, record_id, json.loads(data), uses + 1), free
+
+    def _return(self, lease: Lease, state: str) -> None:
+        # A lease that expired meanwhile has been retired; it is not brought back
+        self._execute("UPDATE records SET state = ?, data = ?, owner = NULL, lease_expires = NULL "
+                      "WHERE id = ? AND state = 'leased' AND owner = ?",
+                      (state, json.dumps(lease.record), lease.id, self.owner))
+
+    def _claim_refill(self, kind: str) -> bool:
+        with self._transaction() as connection:
+            # A refill older than the lease TTL belongs to a crashed worker
+            connection.execute('DELETE FROM refills WHERE kind = ? AND started_at < ?',
+                               (kind, time.time() - self.lease_ttl))
+            return connection.execute('INSERT OR IGNORE INTO refills VALUES (?, ?, ?)',
+                                      (kind, self.owner, time.time())).rowcount == 1
+
+    def _generate(self, kind: str, count: Optional[int]) -> int:
+        # Runs while holding the kind's refill claim, which it gives up whatever happens
+        pool_kind = self.kind(kind)
+        wanted = pool_kind.batch if count is None else count
+        added = 0
+        try:
+            while added < wanted:
+                self._resume_ids()
+                records = pool_kind.make(wanted - added)
+                self._save_ids()
+                inserted = self._insert(kind, records)
+                if not inserted:
+                    raise PoolExhausted(f"The {kind} generator only made records already in {self.path}")
+                added += inserted
+        finally:
+            self._execute('DELETE FROM refills WHERE kind = ? AND owner = ?', (kind, self.owner))
+        logger.info(f"Added {added} {kind} records to {self.path}")
+        return added
+
+    def _resume_ids(self) -> None:
+        """Move this process's ID allocators past what earlier runs drew into this pool"""
+        positions = dict(self._connection().execute('SELECT partition, issued FROM id_positions'))
+        for allocator in _allocators():
+            allocator.skip_to(positions.get(allocator.partition, 0))
+
+    def _save_ids(self) -> None:
+        with self._transaction() as connection:
+            connection.executemany('INSERT INTO id_positions VALUES (?, ?) ON CONFLICT (partition) '
+                                   'DO UPDATE SET issued = MAX(issued, excluded.issued)',
+                                   [(allocator.partition, allocator.issued) for allocator in _allocators()])
+
+    def _refill_in_background(self, kind: str) -> None:
+        if self.kind(kind).make is None or not self._claim_refill(kind):
+            return
+        self._refills = [thread for thread in self._refills if thread.is_alive()]
+        thread = threading.Thread(target=self._background_refill, args=(kind,), name=f"data-pool-{kind}", daemon=True)
+        self._refills.append(thread)
+        thread.start()
+
+    def _background_refill(self, kind: str) -> None:
+        try:
+            self._generate(kind, None)
+        except Exception as e:
+            logger.error(f"Refilling the {kind} pool failed: {e}")
+        finally:
+            self._close_connection()
+
+    def _close_connection(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _insert(self, kind: str, records: List[Dict[str, Any]], fingerprint: bool = False) -> int:
+        now = time.time()
+        rows = [(kind, json.dumps(record), _fingerprint(record) if fingerprint else None,
+                 None if record.get('id') is None else str(record['id']), now) for record in records]
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany('INSERT OR IGNORE INTO records (kind, data, fingerprint, record_id, created_at) '
+                                   'VALUES (?, ?, ?, ?, ?)', rows)
+            return connection.total_changes - before
+
+    def _free(self, kind: str) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM records WHERE kind = ? AND state = 'free'",
+                                          (kind,)).fetchone()[0]
+
+    def _execute(self, query: str, parameters: tuple) -> sqlite3.Cursor:
+        with self._transaction() as connection:
+            return connection.execute(query, parameters)
+
+    def _transaction(self) -> '_Transaction':
+        return _Transaction(self._connection())
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections belong to the thread that opened them; the refill thread opens its own
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=Config.DATA_POOL_WAIT_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            self._local.connection = connection
+        return connection
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: takes the write lock up front, so concurrent claims are serialized"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+def _allocators() -> List[IdAllocator]:
+    # The unseeded allocators the built-in kinds draw from; an order also draws user and product IDs
+    return [shared_allocator(name, digits) for name, digits in ID_DIGITS.items()]
+
+
+def _fingerprint(record: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(record, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,81 @@
+import os
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """
+    Cross-process lock backed by an exclusively created lock file.
+    Works the same on Windows and POSIX, so xdist workers can share files safely.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0, stale_after: float = 60.0, poll_interval: float = 0.01):
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        """Block until the lock file can be created or raise TimeoutError"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(self._fd, str(os.getpid()).encode())
+                return
+            except FileExistsError:
+                self._break_if_stale()
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Could not acquire lock {self.path} within {self.timeout}s")
+                time.sleep(self.poll_interval)
+
+    def release(self) -> None:
+        """Release the lock if this instance holds it"""
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _break_if_stale(self) -> None:
+        """Remove a lock file left behind by a crashed process"""
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return
+        if age > self.stale_after:
+            logger.warning(f"Removing stale lock file: {self.path}")
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+def atomic_write(path: str, data: bytes, mode: Optional[int] = None) -> None:
+    """
+    Write a file so readers never observe a partially written version. mode (e.g. 0o600 for secrets)
+    is set on the temporary file before anything is written to it.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    opener = None if mode is None else lambda name, flags: os.open(name, flags, mode)
+    with open(tmp_path, "wb", opener=opener) as f:
+        if mode is not None:
+            os.fchmod(f.fileno(), mode)  # a leftover temporary file keeps its old mode
+        f.write(data)
+    os.replace(tmp_path, path)
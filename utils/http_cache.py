@@ -0,0 +1,353 @@
+"""
+HTTP cache for API GET requests
+
+Opt-in with API_CACHE_ENABLED, or by passing an HttpCache to API(cache=...). Responses are kept when
+their headers allow it: Cache-Control max-age (or Expires) makes them fresh for that long, and an ETag
+or Last-Modified lets stale entries be revalidated with If-None-Match / If-Modified-Since, so an
+unchanged resource costs a 304 instead of a full body. no-store responses are never kept. One variant
+per URL and credentials is kept: a request selecting another Vary variant misses and replaces it.
+
+Entries live in a bounded in-memory LRU per process. With API_CACHE_DIR set they are also written to a
+disk tier shared by all xdist workers; every write goes through atomic_write under the resource's
+FileLock, so workers never read a partial entry. A successful POST/PUT/PATCH/DELETE invalidates every
+cached variant of its URL, in memory and on disk, so other workers see the change too.
+
+Layout under API_CACHE_DIR:
+    <aa>/<resource sha1>/<key sha1>.entry   a JSON metadata line followed by the body
+"""
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from config.config import Config
+from utils.file_lock import FileLock, atomic_write
+
+logger = logging.getLogger(__name__)
+
+CACHEABLE_STATUSES = (200, 203)
+
+
+class CacheEntry:
+    def __init__(self, key: str, url: str, status: int, headers: Dict[str, str], content: bytes,
+                 stored_at: float, lifetime: float, vary: Dict[str, str]):
+        self.key = key
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.stored_at = stored_at
+        self.lifetime = lifetime
+        self.vary = vary
+        self.disk_version: Optional[Tuple[int, int]] = None
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) - self.stored_at < self.lifetime
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this entry"""
+        headers = CaseInsensitiveDict(self.headers)
+        validators = {}
+        if headers.get('ETag'):
+            validators['If-None-Match'] = headers['ETag']
+        if headers.get('Last-Modified'):
+            validators['If-Modified-Since'] = headers['Last-Modified']
+        return validators
+
+    def matches(self, request_headers: CaseInsensitiveDict) -> bool:
+        """Whether the request selects this variant (Vary)"""
+        return all(request_headers.get(name, '') == value for name, value in self.vary.items())
+
+    def to_response(self, request: requests.PreparedRequest) -> requests.Response:
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK'
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.elapsed = timedelta(0)
+        response.from_cache = True
+        return response
+
+    def dump(self) -> bytes:
+        meta = {'key': self.key, 'url': self.url, 'status': self.status, 'headers': self.headers,
+                'stored_at': self.stored_at, 'lifetime': self.lifetime, 'vary': self.vary}
+        return json.dumps(meta).encode() + b'\n' + self.content
+
+    @classmethod
+    def load(cls, data: bytes) -> 'CacheEntry':
+        meta, _, content = data.partition(b'\n')
+        fields = json.loads(meta)
+        return cls(fields['key'], fields['url'], fields['status'], fields['headers'], content,
+                   fields['stored_at'], fields['lifetime'], fields['vary'])
+
+
+class HttpCache:
+    def __init__(self, max_entries: Optional[int] = None, max_entry_bytes: Optional[int] = None,
+                 disk_dir: Optional[str] = None, default_ttl: Optional[float] = None):
+        """
+        max_entries: responses kept in the in-memory LRU
+        max_entry_bytes: bodies larger than this are never cached
+        disk_dir: directory of the shared disk tier; None uses API_CACHE_DIR, '' disables it
+        default_ttl: seconds a response without Cache-Control max-age or Expires stays fresh
+        """
+        self.max_entries = Config.API_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_entry_bytes = Config.API_CACHE_MAX_ENTRY_KB * 1024 if max_entry_bytes is None else max_entry_bytes
+        disk_dir = Config.API_CACHE_DIR if disk_dir is None else disk_dir
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.default_ttl = Config.API_CACHE_DEFAULT_TTL if default_ttl is None else default_ttl
+        self._memory: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stores': 0, 'invalidations': 0}
+
+    def get(self, request: requests.PreparedRequest,
+            send: Callable[[Dict[str, str]], requests.Response]) -> requests.Response:
+        """
+        Answer a GET from the cache, revalidating or fetching with send(extra_headers) when needed.
+        Responses served from the cache (fresh or revalidated) have from_cache set.
+        """
+        key = self.key(request)
+        entry = self._lookup(key, request.headers)
+        request_directives = _directives(request.headers.get('Cache-Control', ''))
+        if entry is not None and entry.is_fresh() and 'no-cache' not in request_directives:
+            self._count('hits')
+            return entry.to_response(request)
+
+        response = send(entry.validators() if entry is not None else {})
+        if response.status_code == 304 and entry is not None:
+            self._count('revalidated')
+            entry.headers.update({name: value for name, value in response.headers.items()
+                                  if name.lower() not in ('content-length', 'content-encoding', 'transfer-encoding')})
+            entry.stored_at = time.time()
+            entry.lifetime = self._lifetime(CaseInsensitiveDict(entry.headers))
+            self._store(entry)
+            return entry.to_response(request)
+
+        self._count('misses')
+        response.from_cache = False
+        if 'no-store' not in request_directives:
+            new_entry = self._entry_for(key, request, response)
+            if new_entry is not None:
+                self._store(new_entry)
+                self._count('stores')
+        return response
+
+    def invalidate(self, url: str) -> None:
+        """Drop every cached variant of a resource (any query string, any credentials)"""
+        resource = _resource(url)
+        with self._lock:
+            stale = [key for key, entry in self._memory.items() if _resource(entry.url) == resource]
+            for key in stale:
+                del self._memory[key]
+        if self.disk_dir is not None:
+            directory = self._resource_dir(resource)
+            with FileLock(f"{directory}.lock"):
+                shutil.rmtree(directory, ignore_errors=True)
+        self._count('invalidations')
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir is not None:
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
+
+    @staticmethod
+    def key(request: requests.PreparedRequest) -> str:
+        """Method, full URL and a digest of the credentials, so users never share entries"""
+        credentials = request.headers.get('Authorization', '') + request.headers.get('Cookie', '')
+        digest = hashlib.sha1(credentials.encode()).hexdigest()[:16] if credentials else '-'
+        return f"{request.method} {request.url} {digest}"
+
+    def _lookup(self, key: str, request_headers: CaseInsensitiveDict) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if self.disk_dir is not None:
+            path = self._entry_path(key)
+            # Another worker may have refreshed or invalidated the entry since it was loaded
+            version = _version(path)
+            if entry is None or version != entry.disk_version:
+                entry = self._read_disk(path, version)
+                self._remember(key, entry)
+        if entry is None or not entry.matches(request_headers):
+            return None
+        return entry
+
+    def _store(self, entry: CacheEntry) -> None:
+        if self.disk_dir is not None:
+            path = self._entry_path(entry.key)
+            with FileLock(f"{path.parent}.lock"):
+                atomic_write(str(path), entry.dump())
+            entry.disk_version = _version(path)
+        self._remember(entry.key, entry)
+
+    def _remember(self, key: str, entry: Optional[CacheEntry]) -> None:
+        with self._lock:
+            if entry is None:
+                self._memory.pop(key, None)
+                return
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, path: Path, version: Optional[Tuple[int, int]]) -> Optional[CacheEntry]:
+        if version is None:
+            return None
+        try:
+            entry = CacheEntry.load(path.read_bytes())
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        entry.disk_version = version
+        return entry
+
+    def _entry_for(self, key: str, request: requests.PreparedRequest,
+                   response: requests.Response) -> Optional[CacheEntry]:
+        """A cache entry for the response, or None if its status or headers forbid caching"""
+        if response.status_code not in CACHEABLE_STATUSES or len(response.content) > self.max_entry_bytes:
+            return None
+        headers = response.headers
+        directives = _directives(headers.get('Cache-Control', ''))
+        vary = [name.strip() for name in headers.get('Vary', '').split(',') if name.strip()]
+        if 'no-store' in directives or '*' in vary:
+            return None
+        lifetime = self._lifetime(headers)
+        if lifetime <= 0 and not (headers.get('ETag') or headers.get('Last-Modified')):
+            return None  # Neither fresh nor revalidatable
+        return CacheEntry(key, request.url, response.status_code, _storable_headers(headers), response.content,
+                          time.time(), lifetime, {name: request.headers.get(name, '') for name in vary})
+
+    def _lifetime(self, headers: CaseInsensitiveDict) -> float:
+        """Seconds the response stays fresh (RFC 9111 4.2.1), less its Age"""
+        directives = _directives(headers.get('Cache-Control', ''))
+        if 'no-cache' in directives:
+            return 0.0
+        age = _number(headers.get('Age')) or 0.0
+        if 'max-age' in directives:
+            return (_number(directives['max-age']) or 0.0) - age
+        if headers.get('Expires'):
+            expires = _http_date(headers['Expires'])
+            date = _http_date(headers.get('Date', '')) or time.time()
+            return (expires - date - age) if expires else 0.0
+        return self.default_ttl
+
+    def _resource_dir(self, resource: str) -> Path:
+        digest = hashlib.sha1(resource.encode()).hexdigest()
+        return self.disk_dir / digest[:2] / digest
+
+    def _entry_path(self, key: str) -> Path:
+        resource = _resource(key.split(' ')[1])
+        return self._resource_dir(resource) / f"{hashlib.sha1(key.encode()).hexdigest()}.entry"
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+
+def format_stats(stats: Dict[str, int]) -> str:
+    """One-line summary for the terminal and HTML reports"""
+    requests_seen = stats.get('hits', 0) + stats.get('revalidated', 0) + stats.get('misses', 0)
+    if not requests_seen:
+        return "API cache: no cacheable requests"
+    hit_rate = 100 * stats.get('hits', 0) / requests_seen
+    saved = 100 * (stats.get('hits', 0) + stats.get('revalidated', 0)) / requests_seen
+    return (f"API cache: {requests_seen} GETs, {stats.get('hits', 0)} hits, {stats.get('revalidated', 0)} revalidated "
+            f"(304), {stats.get('misses', 0)} misses, {stats.get('invalidations', 0)} invalidations - "
+            f"{hit_rate:.1f}% hit rate, {saved:.1f}% served from cache")
+
+
+def write_worker_stats(worker_id: str, stats_dir: Optional[str] = None) -> None:
+    """Persist this process's cache statistics for the controller to merge"""
+    if _shared_cache is None:
+        return
+    path = os.path.join(stats_dir or Config.API_CACHE_STATS_DIR, f"{worker_id}.json")
+    atomic_write(path, json.dumps(_shared_cache.stats).encode())
+
+
+def merged_stats(stats_dir: Optional[str] = None) -> Dict[str, int]:
+    """Statistics of this process plus every worker that wrote them; empty when no cache was used"""
+    collected: List[Dict[str, int]] = [_shared_cache.stats] if _shared_cache is not None else []
+    directory = Path(stats_dir or Config.API_CACHE_STATS_DIR)
+    if directory.is_dir():
+        for path in sorted(directory.glob("*.json")):
+            try:
+                collected.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                logger.warning(f"Ignoring unreadable cache statistics {path}")
+    merged: Dict[str, int] = {}
+    for stats in collected:
+        for name, value in stats.items():
+            merged[name] = merged.get(name, 0) + value
+    return merged
+
+
+def reset_stats(stats_dir: Optional[str] = None) -> None:
+    """Remove statistics of a previous run"""
+    shutil.rmtree(stats_dir or Config.API_CACHE_STATS_DIR, ignore_errors=True)
+
+
+_shared_cache: Optional[HttpCache] = None
+
+
+def get_http_cache() -> HttpCache:
+    """The cache shared by every API client of this process"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = HttpCache()
+    return _shared_cache
+
+
+def _directives(value: str) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def _storable_headers(headers: CaseInsensitiveDict) -> Dict[str, str]:
+    # requests has already decoded the body, so its transfer headers no longer apply
+    return {name: value for name, value in headers.items()
+            if name.lower() not in ('content-encoding', 'transfer-encoding', 'content-length', 'set-cookie')}
+
+
+def _resource(url: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+
+
+def _version(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _http_date(value: str) -> Optional[float]:
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
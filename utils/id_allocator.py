@@ -0,0 +1,130 @@
+"""
+Collision-free test-data IDs across xdist workers and concurrent runs
+
+Each allocator hands out d-digit IDs for one namespace (users, products, orders). The ID space is split
+into partitions by run slot and xdist worker: partition p of P takes the p-th, (p+P)-th, (p+2P)-th...
+position, so workers and runs never draw the same position. Positions are mapped to IDs through a keyed
+permutation of the space (a small Feistel network with cycle walking), so IDs look random but no two
+positions give the same ID. Allocation is O(1) and nothing about issued IDs is remembered; only a
+counter is kept.
+
+The run slot comes from TEST_DATA_RUN_ID, the xdist run id shared by the workers of a run, or a random
+id for a single-process run, reduced modulo TEST_DATA_ID_RUN_SLOTS; runs in different slots never collide.
+With a seed (and no TEST_DATA_RUN_ID) the slot is 0 and the permutation is keyed by the seed, so the same
+seed and worker layout give the same IDs on every run.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config.config import Config
+
+_MASK32 = 0xFFFFFFFF
+
+
+class IdSpaceExhausted(Exception):
+    pass
+
+
+class IdAllocator:
+    def __init__(self, namespace: str, digits: int, seed: Optional[int] = None, worker: Optional[int] = None,
+                 workers: Optional[int] = None, run_slot: Optional[int] = None, run_slots: Optional[int] = None):
+        """
+        namespace: kind of record; namespaces draw from independent permutations
+        digits: length of the IDs, which range over [10**(digits-1), 10**digits)
+        worker/workers: this process's partition, from the xdist environment when not given
+        run_slot/run_slots: this run's partition, see the module docstring
+        """
+        self.namespace = namespace
+        self.low = 10 ** (digits - 1)
+        self.space = 10 ** digits - self.low
+        default_worker, default_workers = worker_partition()
+        self.worker = default_worker if worker is None else worker
+        self.workers = default_workers if workers is None else workers
+        self.run_slots = Config.TEST_DATA_ID_RUN_SLOTS if run_slots is None else run_slots
+        self.run_slot = _run_slot(seed, self.run_slots) if run_slot is None else run_slot
+        self.stride = self.workers * self.run_slots
+        self.offset = self.run_slot * self.workers + self.worker
+        self.capacity = max(0, (self.space - self.offset + self.stride - 1) // self.stride)
+        # Allocators with the same partition draw the same IDs in the same order
+        self.partition = f"{namespace}:{digits}:{seed}:{self.offset}/{self.stride}"
+        self.issued = 0
+        self._lock = threading.Lock()
+
+        bits = max(2, (self.space - 1).bit_length())
+        self._half = (bits + 1) // 2
+        self._mask = (1 << self._half) - 1
+        digest = hashlib.sha256(f"{namespace}:{seed}".encode()).digest()
+        self._keys = [int.from_bytes(digest[i:i + 4], 'big') for i in range(0, 16, 4)]
+
+    def next(self) -> int:
+        """The next ID of this partition"""
+        return self.take(1)[0]
+
+    def take(self, n: int) -> List[int]:
+        """The next n IDs of this partition, permuted together with numpy"""
+        with self._lock:
+            start = self.issued
+            if start + n > self.capacity:
+                raise IdSpaceExhausted(
+                    f"{self.namespace}: {self.capacity} IDs of {self.space} per partition ({self.workers} workers x "
+                    f"{self.run_slots} run slots) are used up; use more digits or fewer TEST_DATA_ID_RUN_SLOTS")
+            self.issued += n
+        positions = np.arange(start, start + n, dtype=np.uint64) * np.uint64(self.stride) + np.uint64(self.offset)
+        return (self._permute(positions) + np.uint64(self.low)).tolist()
+
+    def skip_to(self, issued: int) -> None:
+        """Continue after the first issued positions, e.g. where an earlier run of this partition stopped"""
+        with self._lock:
+            self.issued = max(self.issued, issued)
+
+    def _permute(self, values: np.ndarray) -> np.ndarray:
+        # Cycle walking: values that land outside the space are permuted again until they are inside
+        values = self._encrypt(values)
+        outside = values >= np.uint64(self.space)
+        while outside.any():
+            values[outside] = self._encrypt(values[outside])
+            outside = values >= np.uint64(self.space)
+        return values
+
+    def _encrypt(self, values: np.ndarray) -> np.ndarray:
+        half, mask = np.uint64(self._half), np.uint64(self._mask)
+        left, right = values >> half, values & mask
+        for key in self._keys:
+            left, right = right, left ^ (_round(right, key) & mask)
+        return (left << half) | right
+
+
+def _round(values: np.ndarray, key: int) -> np.ndarray:
+    # Any function works in a Feistel round; products stay below 2**64, so uint64 never overflows
+    mixed = ((values & np.uint64(_MASK32)) * np.uint64(0x9E3779B1)) & np.uint64(_MASK32)
+    mixed = ((mixed ^ np.uint64(key)) * np.uint64(0x85EBCA6B)) & np.uint64(_MASK32)
+    return mixed ^ (mixed >> np.uint64(13))
+
+
+def worker_partition() -> Tuple[int, int]:
+    """(index, count) of this xdist worker, (0, 1) outside xdist"""
+    worker = os.getenv('PYTEST_XDIST_WORKER', '')
+    if not worker.startswith('gw'):
+        return 0, 1
+    return int(worker[2:]), int(os.getenv('PYTEST_XDIST_WORKER_COUNT', '1'))
+
+
+def _run_slot(seed: Optional[int], run_slots: int) -> int:
+    run_id = Config.TEST_DATA_RUN_ID or ('' if seed is not None else os.getenv('PYTEST_XDIST_TESTRUNUID') or _process_run_id)
+    return int(hashlib.sha1(run_id.encode()).hexdigest(), 16) % run_slots if run_id else 0
+
+
+_process_run_id = uuid.uuid4().hex
+_shared: Dict[Tuple[str, int], IdAllocator] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_allocator(namespace: str, digits: int) -> IdAllocator:
+    """The unseeded allocator of a namespace used by every generator of this process"""
+    with _shared_lock:
+        if (namespace, digits) not in _shared:
+            _shared[(namespace, digits)] = IdAllocator(namespace, digits)
+        return _shared[(namespace, digits)]
@@ -0,0 +1,273 @@
+"""
+Streaming JSON for large API responses
+
+API.stream() returns the items of a JSON array as they arrive from the socket instead of after the whole
+body is read and parsed, so a multi-megabyte claim list is held in memory one chunk (API_STREAM_CHUNK_KB)
+and one item at a time. The array may be the whole body or sit inside an object ('claims' or
+'data.claims'); the fields around it (totals, cursors) are collected in stream.envelope. JSON-lines bodies
+(application/x-ndjson, application/jsonl) are read line by line. API.paginate() follows a cursor from page
+to page, streaming each page.
+
+Each item is decoded once, by json's C decoder; chunk boundaries only cost a retry of the item they cut.
+When the endpoint has a schema (see utils.schema_validation) items are checked as they are consumed.
+
+    with api.stream('/api/claims', items='claims') as claims:
+        assert_items(claims, min_count=1000, fields=['id', 'vehicle.vin'])
+    assert claims.envelope['total'] == claims.count
+"""
+import codecs
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+import requests
+from config.config import Config
+
+JSON_LINES_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines', 'application/json-lines')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# What may follow a complete scalar; anything else (a '.', 'e', another digit) may continue it
+_VALUE_END = frozenset(' \t\n\r,]}')
+_decoder = json.JSONDecoder()
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+class JsonStream:
+    """Items of a streamed response. Iterate once; envelope and count are complete afterwards."""
+
+    def __init__(self, response: requests.Response, items: str = '', json_lines: Optional[bool] = None,
+                 chunk_size: Optional[int] = None, max_item_bytes: Optional[int] = None):
+        """
+        items: dotted path of the array inside the body, '' when the body is the array
+        json_lines: one JSON value per line; detected from the Content-Type when None
+        """
+        self.response = response
+        self.items = items
+        self.envelope: Dict[str, Any] = {}
+        self.count = 0
+        self.schema_violations: List[str] = []
+        self._closed = False
+        if json_lines is None:
+            json_lines = response.headers.get('Content-Type', '').split(';')[0].strip() in JSON_LINES_TYPES
+        self.bytes_read = 0
+        chunks = self._counted(response.iter_content(chunk_size or Config.API_STREAM_CHUNK_KB * 1024))
+        if json_lines:
+            self._source = iter_json_lines(_split_lines(chunks))
+        else:
+            self._source = iter_json_items(chunks, items, self.envelope,
+                                           max_item_bytes or Config.API_STREAM_MAX_ITEM_KB * 1024)
+
+    def _counted(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def validate(self, check: Callable[[Iterable[Any]], Iterator[Any]]) -> None:
+        """Pass the items through check (e.g. a schema validator's iter_validated) before they are yielded"""
+        self._source = check(self._source)
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            for item in self._source:
+                self.count += 1
+                yield item
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        timing = getattr(self.response, 'timing', None)
+        if timing is not None:
+            # urllib3 does not count chunked bodies, fall back to the (decoded) bytes read here
+            timing.bytes_received = (self.response.raw.tell() if self.response.raw is not None else 0) or self.bytes_read
+        self.response.close()
+
+    def __enter__(self) -> 'JsonStream':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def iter_json_items(chunks: Iterable[bytes], path: str = '', envelope: Optional[Dict[str, Any]] = None,
+                    max_item_bytes: int = 1024 * 1024) -> Iterator[Any]:
+    """
+    Items of the JSON array at path in a body delivered as byte chunks. Members of the enclosing objects
+    other than the array are stored in envelope, nested as in the body.
+    """
+    reader = _Reader(chunks, max_item_bytes)
+    yield from _walk(reader, [part for part in path.split('.') if part], {} if envelope is None else envelope)
+    if reader.peek():
+        raise JsonStreamError(f"Unexpected data after the JSON document: {reader.peek()!r}")
+
+
+def iter_json_lines(lines: Iterable[Any]) -> Iterator[Any]:
+    """Values of a JSON-lines body; blank lines are skipped"""
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise JsonStreamError(f"Line {number} is not JSON: {error}") from None
+
+
+def assert_items(items: Iterable[Any], count: Optional[int] = None, min_count: Optional[int] = None,
+                 max_count: Optional[int] = None, fields: Sequence[str] = (),
+                 where: Optional[Callable[[Any], bool]] = None, description: str = 'items') -> int:
+    """
+    Check items one at a time, without building a list of them, and return how many there were.
+    fields: keys every item must have, dotted for nested ones ('vehicle.vin')
+    where: predicate every item must satisfy
+    """
+    paths = [field.split('.') for field in fields]
+    seen = 0
+    for seen, item in enumerate(items, 1):
+        for field, path in zip(fields, paths):
+            if not _has_field(item, path):
+                raise AssertionError(f"{description}[{seen - 1}] has no field '{field}': {_short(item)}")
+        if where is not None and not where(item):
+            raise AssertionError(f"{description}[{seen - 1}] does not satisfy {_name(where)}: {_short(item)}")
+        if max_count is not None and seen > max_count:
+            raise AssertionError(f"More than {max_count} {description}")
+    if count is not None and seen != count:
+        raise AssertionError(f"Expected {count} {description}, got {seen}")
+    if min_count is not None and seen < min_count:
+        raise AssertionError(f"Expected at least {min_count} {description}, got {seen}")
+    return seen
+
+
+def lookup(document: Dict[str, Any], path: str) -> Any:
+    """Value at a dotted path of nested dicts, None when any step is missing"""
+    for part in path.split('.'):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+
+class _Reader:
+    """A text buffer over a chunked body, holding the unread part and at most one incomplete value"""
+
+    def __init__(self, chunks: Iterable[bytes], max_item_bytes: int):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._max_item_chars = max_item_bytes
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def _more(self) -> bool:
+        while not self.exhausted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                text = self._decoder.decode(b'', final=True)
+            else:
+                text = self._decoder.decode(chunk)
+            if text:
+                self.buffer = self.buffer[self.pos:] + text
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self) -> str:
+        """The next non-whitespace character, '' at the end of the body"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._more():
+                return ''
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise JsonStreamError(f"Expected {char!r} in the JSON body, found {found or 'the end of the body'!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number cut by a chunk may go on in the next one ('12' + '3', '12.' + '5', '1e' + '3')
+                if self.exhausted or (end < len(self.buffer) and
+                                      (self.buffer[self.pos] in '"[{' or self.buffer[end] in _VALUE_END)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as error:
+                if self.exhausted:
+                    raise JsonStreamError(f"Invalid JSON in the body: {error.msg}") from None
+            if len(self.buffer) - self.pos > self._max_item_chars:
+                raise JsonStreamError(f"A value in the body is larger than {self._max_item_chars} bytes")
+            self._more()
+
+
+def _walk(reader: _Reader, path: List[str], envelope: Dict[str, Any]) -> Iterator[Any]:
+    if not path:
+        reader.expect('[')
+        if reader.peek() == ']':
+            reader.pos += 1
+            return
+        while True:
+            yield reader.value()
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise JsonStreamError(f"Expected ',' or ']' between array items, found {separator or 'the end of the body'!r}")
+
+    reader.expect('{')
+    found = False
+    if reader.peek() == '}':
+        reader.pos += 1
+    else:
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key == path[0] and reader.peek() in ('[', '{'):
+                found = True
+                yield from _walk(reader, path[1:], envelope.setdefault(key, {}) if len(path) > 1 else envelope)
+            else:
+                envelope[key] = reader.value()
+                found = found or (key == path[0] and envelope[key] is None)
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == '}':
+                break
+            if separator != ',':
+                raise JsonStreamError(f"Expected ',' or '}}' between members, found {separator or 'the end of the body'!r}")
+    if not found:
+        raise JsonStreamError(f"The body has no '{path[0]}' array")
+
+
+def _split_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    pending = b''
+    for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b'\n')
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _has_field(item: Any, path: List[str]) -> bool:
+    for part in path:
+        if not isinstance(item, dict) or part not in item:
+            return False
+        item = item[part]
+    return True
+
+
+def _name(predicate: Callable[[Any], bool]) -> str:
+    name = getattr(predicate, '__name__', repr(predicate))
+    return 'the condition' if name == '<lambda>' else name
+
+
+def _short(value: Any, limit: int = 200) -> str:
+    text = json.dumps(value, default=str)
+    return text if len(text) <= limit else text[:limit - 3] + '...'
@@ -0,0 +1,399 @@
+"""
+Load generation with the framework's own client, auth and configuration
+
+A scenario is one iteration of a virtual user: an async function taking an AsyncAPI, or a scenario of a
+load feature file (see load_feature). run_load() drives scenarios in one of two modes:
+
+- closed loop (users=N): N virtual users each run scenarios back to back, with optional think time.
+  Throughput is whatever the system sustains with N requests in flight.
+- open loop (rate=R): R scenario iterations start per second on schedule, whether or not earlier ones
+  finished. Iteration latency is measured from the scheduled start, so a stalled system shows up as
+  latency instead of silently lowering the load (coordinated omission).
+
+Latencies are recorded in HDR-style histograms (constant time and memory per sample, 3 significant
+digits), per endpoint (ids folded as in the timing report) and per scenario. The report gives
+throughput, error counts and percentiles, and can be checked against latency budgets:
+
+    report = run(scenarios, users=20, duration=60, role='agent')
+    print(report.format())
+    assert not report.check([LatencyBudget.parse('p95 GET /api/claims/{id} < 300ms')])
+
+python run_load.py is the command line entry point.
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+from config.config import Config
+from utils.api_timing import LatencyBudget, normalize_endpoint
+from utils.async_api_client import APIResponse, AsyncAPI
+from utils.auth import token_provider
+
+ScenarioFunction = Callable[[AsyncAPI], Awaitable[Any]]
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of latencies in microseconds, in the manner of HdrHistogram: values below
+    2**bits are counted exactly, larger ones in buckets whose width is 1/2**(bits-1) of their value
+    (bits=11 keeps three significant digits). Recording is O(1) and memory grows with the range of
+    values seen, not with the number of samples.
+    """
+
+    def __init__(self, bits: int = 11):
+        self.bits = bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+
+    def record(self, seconds: float) -> None:
+        self.record_us(int(seconds * 1_000_000))
+
+    def record_us(self, value: int) -> None:
+        value = max(0, value)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.min_us = value if not self.count else min(self.min_us, value)
+        self.max_us = max(self.max_us, value)
+        self.count += 1
+        self.total_us += value
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        if other.count:
+            self.min_us = other.min_us if not self.count else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+        self.count += other.count
+        self.total_us += other.total_us
+
+    def value_at(self, percent: float) -> float:
+        """Latency in seconds that percent of the samples do not exceed (highest value of its bucket)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-percent * self.count // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._highest(index), self.max_us) / 1_000_000
+        return self.max_us / 1_000_000
+
+    @property
+    def mean(self) -> float:
+        return self.total_us / self.count / 1_000_000 if self.count else 0.0
+
+    def _index(self, value: int) -> int:
+        shift = value.bit_length() - self.bits
+        if shift <= 0:
+            return value
+        half = 1 << (self.bits - 1)
+        return (1 << self.bits) + (shift - 1) * half + (value >> shift) - half
+
+    def _highest(self, index: int) -> int:
+        if index < 1 << self.bits:
+            return index
+        half = 1 << (self.bits - 1)
+        shift, offset = divmod(index - (1 << self.bits), half)
+        return ((offset + half + 1) << (shift + 1)) - 1
+
+
+class Scenario:
+    def __init__(self, name: str, run: ScenarioFunction, weight: float = 1):
+        self.name = name
+        self.run = run
+        self.weight = weight
+
+    def __repr__(self) -> str:
+        return f"<Scenario {self.name} weight={self.weight:g}>"
+
+
+class LoadStats:
+    """Samples of one load run"""
+
+    def __init__(self):
+        self.requests: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.scenarios: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Counter = Counter()
+        self.dropped = 0
+        self.started_at = time.time()
+
+    def record_response(self, response: APIResponse) -> None:
+        label = f"{response.method} {normalize_endpoint(response.url)}"
+        self.requests[label].record(response.elapsed)
+        self.statuses[label][response.status_code] += 1
+
+    def record_iteration(self, scenario: str, seconds: float, error: Optional[BaseException] = None) -> None:
+        self.scenarios[scenario].record(seconds)
+        if error is not None:
+            self.errors[f"{scenario}: {type(error).__name__}: {error}"[:200]] += 1
+
+
+class LoadAPI(AsyncAPI):
+    """AsyncAPI that feeds the load statistics instead of the per-call log"""
+
+    def __init__(self, stats: LoadStats, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+
+    def _log_request_response(self, response: APIResponse, data: Optional[Dict[str, Any]] = None) -> None:
+        self.stats.record_response(response)
+
+
+class LoadReport:
+    def __init__(self, stats: LoadStats, mode: str, duration: float, concurrency: float):
+        self.stats = stats
+        self.mode = mode
+        self.duration = duration
+        self.concurrency = concurrency
+
+    @property
+    def requests(self) -> int:
+        return sum(histogram.count for histogram in self.stats.requests.values())
+
+    @property
+    def iterations(self) -> int:
+        return sum(histogram.count for histogram in self.stats.scenarios.values())
+
+    @property
+    def failed_requests(self) -> int:
+        return sum(count for statuses in self.stats.statuses.values()
+                   for status, count in statuses.items() if status >= 400)
+
+    @property
+    def throughput(self) -> float:
+        """Requests per second"""
+        return self.requests / self.duration if self.duration else 0.0
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """One row per endpoint and per scenario with counts, rate and percentiles in milliseconds"""
+        rows = []
+        for kind, histograms in (('request', self.stats.requests), ('scenario', self.stats.scenarios)):
+            for name, histogram in sorted(histograms.items()):
+                row = {'kind': kind, 'name': name, 'count': histogram.count,
+                       'rate': histogram.count / self.duration if self.duration else 0.0,
+                       'mean': histogram.mean * 1000, 'max': histogram.value_at(100) * 1000}
+                row.update({f"p{p:g}": histogram.value_at(p) * 1000 for p in PERCENTILES})
+                if kind == 'request':
+                    row['errors'] = sum(count for status, count in self.stats.statuses[name].items() if status >= 400)
+                rows.append(row)
+        return rows
+
+    def check(self, budgets: Iterable[LatencyBudget]) -> List[str]:
+        """Budgets whose percentile of the endpoint's latency is over the limit"""
+        violations = []
+        for budget in budgets:
+            histogram = self.stats.requests.get(f"{budget.method} {budget.endpoint}")
+            if histogram is None or not histogram.count:
+                continue
+            actual = histogram.value_at(budget.percentile) * 1000
+            if actual > budget.limit_ms:
+                violations.append(f"{budget}: p{budget.percentile:g} was {actual:.1f}ms over {histogram.count} calls")
+        return violations
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'started_at': self.stats.started_at, 'mode': self.mode, 'concurrency': self.concurrency, 'duration': self.duration,
+                'requests': self.requests, 'iterations': self.iterations, 'failed_requests': self.failed_requests,
+                'dropped_iterations': self.stats.dropped, 'throughput': self.throughput,
+                'errors': dict(self.stats.errors), 'rows': self.rows()}
+
+    def write(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def format(self) -> str:
+        shape = f"{self.concurrency:g} users" if self.mode == 'closed' else f"{self.concurrency:g} iterations/s"
+        lines = [f"{self.mode}-loop load, {shape}, {self.duration:.1f}s: {self.requests} requests "
+                 f"({self.throughput:.1f}/s), {self.iterations} iterations, {self.failed_requests} failed requests"
+                 + (f", {self.stats.dropped} iterations dropped" if self.stats.dropped else ''),
+                 f"{'':9}{'name':40} {'count':>7} {'rate/s':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'p99.9':>8} {'max':>8}"]
+        for row in self.rows():
+            lines.append(f"{row['kind']:9}{row['name'][:40]:40} {row['count']:>7} {row['rate']:>8.1f} {row['p50']:>8.1f} "
+                         f"{row['p90']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f} {row['p99.9']:>8.1f} {row['max']:>8.1f}")
+        for error, count in self.stats.errors.most_common(10):
+            lines.append(f"  {count} x {error}")
+        return "\n".join(lines)
+
+
+async def run_load(scenarios: Sequence[Scenario], users: Optional[int] = None, rate: Optional[float] = None,
+                   duration: float = 60, iterations: Optional[int] = None, base_url: Optional[str] = None,
+                   role: Optional[str] = None, think_time: float = 0, ramp_up: float = 0,
+                   max_in_flight: Optional[int] = None, seed: Optional[int] = None) -> LoadReport:
+    """
+    Run scenarios in closed loop (users) or open loop (rate, iterations started per second) for duration
+    seconds or until iterations scenario iterations have started, whichever comes first.
+    role: requests carry the role's shared token (see utils.auth)
+    max_in_flight: open loop only, iterations beyond it are dropped and counted instead of started
+    """
+    if (users is None) == (rate is None):
+        raise ValueError("Pass either users (closed loop) or rate (open loop)")
+    if not scenarios:
+        raise ValueError("No scenarios to run")
+    base_url = base_url or Config.API_BASE_URL
+    stats = LoadStats()
+    chooser = random.Random(seed)
+    weights = [scenario.weight for scenario in scenarios]
+    started = itertools.count()
+    limit = iterations if iterations is not None else float('inf')
+    max_in_flight = max_in_flight or Config.LOAD_MAX_IN_FLIGHT
+
+    async def iteration(api: AsyncAPI, scheduled: float) -> None:
+        scenario = chooser.choices(scenarios, weights)[0]
+        error = None
+        try:
+            await scenario.run(api)
+        except Exception as e:  # a failed iteration is a sample, not the end of the run
+            error = e
+        stats.record_iteration(scenario.name, time.perf_counter() - scheduled, error)
+
+    pool = users if users is not None else max_in_flight
+    async with LoadAPI(stats, base_url, pool_size=pool, per_host_limit=pool) as api:
+        if role:
+            api.set_token(token_provider.get_token(role, base_url))
+        start = time.perf_counter()
+        deadline = start + duration
+
+        if users is not None:
+            async def user(index: int) -> None:
+                await asyncio.sleep(ramp_up * index / users)
+                while time.perf_counter() < deadline and next(started) < limit:
+                    await iteration(api, time.perf_counter())
+                    if think_time:
+                        await asyncio.sleep(think_time)
+
+            await asyncio.gather(*(user(index) for index in range(users)))
+            concurrency: float = users
+        else:
+            in_flight = set()
+            for number in itertools.count():
+                scheduled = start + number / rate
+                if scheduled >= deadline or number >= limit:
+                    break
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                if len(in_flight) >= max_in_flight:
+                    stats.dropped += 1
+                    continue
+                task = asyncio.ensure_future(iteration(api, scheduled))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            await asyncio.gather(*in_flight)
+            concurrency = rate
+        elapsed = time.perf_counter() - start
+    return LoadReport(stats, 'closed' if users is not None else 'open', elapsed, concurrency)
+
+
+def run(scenarios: Sequence[Scenario], **kwargs: Any) -> LoadReport:
+    """run_load() from synchronous code, on a fresh event loop"""
+    return asyncio.run(run_load(scenarios, **kwargs))
+
+
+_STEP = re.compile(r'^(?:Given|When|Then|And|But|\*)\s+(.*)$')
+_REQUEST = re.compile(r'^I (GET|POST|PUT|PATCH|DELETE) "([^"]+)"(?: with (.+))?$', re.IGNORECASE)
+_STATUS = re.compile(r'^the (?:response )?status(?: code)? (?:should be|is) (\d{3})$', re.IGNORECASE)
+_WAIT = re.compile(r'^I wait (\d+(?:\.\d+)?) ?(ms|s|seconds?)$', re.IGNORECASE)
+_ROLE = re.compile(r'^I am (?:logged in|authenticated) as "([^"]+)"$', re.IGNORECASE)
+_RANDOM = re.compile(r'\{random:(\d+)-(\d+)\}')
+
+
+def load_feature(path: str, base_url: Optional[str] = None) -> List[Scenario]:
+    """
+    Scenarios of a load feature file. Steps (with Given/When/Then/And) may be:
+        I GET "/api/claims/{random:1-500}"          a request; {random:A-B} is a random integer
+        I POST "/api/claims" with {"vin": "..."}    a request with a JSON body
+        the status should be 201                    fails the iteration unless the last status matches
+        I wait 500 ms                               think time
+        I am logged in as "agent"                   later requests carry the role's shared token
+    Background steps run before each scenario; an @weight=N tag makes a scenario N times as frequent.
+    """
+    with open(path, encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    background: List[Callable] = []
+    scenarios: List[Scenario] = []
+    steps: Optional[List[Callable]] = None
+    name, weight, tag_weight = '', 1.0, 1.0
+    for number, line in enumerate(lines, 1):
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('@'):
+            match = re.search(r'@weight=(\d+(?:\.\d+)?)', line)
+            tag_weight = float(match.group(1)) if match else tag_weight
+        elif line.startswith('Background:'):
+            steps = background
+        elif line.startswith('Scenario:'):
+            if steps is not None and steps is not background:
+                scenarios.append(_feature_scenario(name, background, steps, weight))
+            name, weight, tag_weight, steps = line[len('Scenario:'):].strip(), tag_weight, 1.0, []
+        elif line.startswith(('Feature:', 'Scenario Outline:', 'Examples:', '|')) or steps is None:
+            if line.startswith(('Scenario Outline:', 'Examples:')):
+                raise ValueError(f"{path}:{number}: scenario outlines are not supported in load features")
+        else:
+            match = _STEP.match(line)
+            if not match:
+                raise ValueError(f"{path}:{number}: expected a step, got {line!r}")
+            steps.append(_step(match.group(1), f"{path}:{number}", base_url))
+    if steps is not None and steps is not background:
+        scenarios.append(_feature_scenario(name, background, steps, weight))
+    return scenarios
+
+
+def _feature_scenario(name: str, background: List[Callable], steps: List[Callable], weight: float) -> Scenario:
+    all_steps = list(background) + list(steps)
+
+    async def run_steps(api: AsyncAPI) -> None:
+        context: Dict[str, Any] = {'headers': {}, 'response': None}
+        for step in all_steps:
+            await step(api, context)
+    return Scenario(name, run_steps, weight)
+
+
+def _step(text: str, where: str, base_url: Optional[str]) -> Callable[[AsyncAPI, Dict[str, Any]], Awaitable[None]]:
+    match = _REQUEST.match(text)
+    if match:
+        method, endpoint, body = match.group(1).upper(), match.group(2), match.group(3)
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            raise ValueError(f"{where}: the body of {text!r} is not JSON") from None
+
+        async def request(api: AsyncAPI, context: Dict[str, Any]) -> None:
+            path = _RANDOM.sub(lambda m: str(random.randint(int(m.group(1)), int(m.group(2)))), endpoint)
+            kwargs = {'json': payload} if payload is not None else {}
+            context['response'] = await api.request(method, path, headers=dict(context['headers']), **kwargs)
+        return request
+    match = _STATUS.match(text)
+    if match:
+        expected = int(match.group(1))
+
+        async def status(api: AsyncAPI, context: Dict[str, Any]) -> None:
+            response = context['response']
+            if response is None or response.status_code != expected:
+                raise AssertionError(f"expected status {expected}, got {response and response.status_code}")
+        return status
+    match = _WAIT.match(text)
+    if match:
+        seconds = float(match.group(1)) / (1000 if match.group(2).lower() == 'ms' else 1)
+
+        async def wait(api: AsyncAPI, context: Dict[str, Any]) -> None:
+            await asyncio.sleep(seconds)
+        return wait
+    match = _ROLE.match(text)
+    if match:
+        role = match.group(1)
+
+        async def login(api: AsyncAPI, context: Dict[str, Any]) -> None:
+            # get_token blocks on a login only once per role and run, after that it is a cache read
+            token = token_provider.get_token(role, base_url or api.base_url)
+            context['headers']['Authorization'] = f"Bearer {token}"
+        return login
+    raise ValueError(f"{where}: unsupported load step {text!r}, see utils.load.load_feature")
@@ -0,0 +1,451 @@
+"""
+Contract validation of API responses against JSON Schemas
+
+Schemas live in API_SCHEMA_DIR, one file per endpoint and method, named after the endpoint with ids folded
+as in the timing report: GET /api/claims/42 is checked against api/claims/{id}.GET.json. API validates
+every 2xx JSON response of an endpoint that has a schema (API_SCHEMA_VALIDATION: off, warn or strict).
+
+A schema is compiled once into a tree of closures, so checking a response is a walk over the payload
+without re-reading the schema; compiled validators are cached by schema content, so a changed schema
+file (a new version) is compiled again and an unchanged one never is. Violations are reported as one
+line each, like '$.featuredProducts[2].rating: 7 is greater than maximum 5', capped at
+API_SCHEMA_MAX_ERRORS. For large arrays, iter_validated() checks items as they are consumed from a
+stream instead of after the whole list is built.
+
+Supported keywords: type, enum, const, properties, required, additionalProperties, patternProperties,
+items, prefixItems, minItems, maxItems, uniqueItems, minLength, maxLength, pattern, format (date,
+date-time, email, uri, uuid), minimum, maximum, exclusiveMinimum, exclusiveMaximum, multipleOf,
+minProperties, maxProperties, allOf, anyOf, oneOf, not, nullable and local $ref ('#/$defs/...').
+Other keywords (title, description, examples...) are ignored.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from config.config import Config
+from utils.api_timing import normalize_endpoint
+
+logger = logging.getLogger(__name__)
+
+# A compiled check appends violations for value (found at path) to errors
+Check = Callable[[Any, Any, List[str]], None]
+
+_TYPES: Dict[str, Callable[[Any], bool]] = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: (isinstance(value, int) and not isinstance(value, bool))
+                             or (isinstance(value, float) and value.is_integer()),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+
+_FORMATS = {
+    'date': re.compile(r'^\d{4}-\d{2}-\d{2}$'),
+    'date-time': re.compile(r'^\d{4}-\d{2}-\d{2}[Tt ]\d{2}:\d{2}:\d{2}(\.\d+)?([Zz]|[+-]\d{2}:?\d{2})?$'),
+    'email': re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$'),
+    'uri': re.compile(r'^[A-Za-z][A-Za-z0-9+.-]*:\S*$'),
+    'uuid': re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$'),
+}
+
+
+class SchemaViolation(AssertionError):
+    def __init__(self, context: str, violations: List[str], max_errors: Optional[int] = None):
+        self.violations = violations
+        super().__init__(format_violations(context, violations, max_errors))
+
+
+class SchemaValidator:
+    def __init__(self, schema: Dict[str, Any], max_errors: Optional[int] = None):
+        self.schema = schema
+        self.max_errors = Config.API_SCHEMA_MAX_ERRORS if max_errors is None else max_errors
+        self._compiler = _Compiler(schema)
+        self._check = self._compiler.compile(schema)
+
+    def errors(self, value: Any) -> List[str]:
+        """Every violation of the schema by value, one line each; empty when it is valid"""
+        errors: List[str] = []
+        self._check(value, None, errors)
+        return errors
+
+    def is_valid(self, value: Any) -> bool:
+        return not self.errors(value)
+
+    def validate(self, value: Any, context: str = 'response') -> None:
+        """Raise SchemaViolation listing the violations of value"""
+        errors = self.errors(value)
+        if errors:
+            raise SchemaViolation(context, errors, self.max_errors)
+
+    def iter_validated(self, items: Iterable[Any], pointer: str = '', context: str = 'response',
+                       violations: Optional[List[str]] = None) -> Iterator[Any]:
+        """
+        Pass items of a streamed array through, checking each against the array schema at pointer
+        ('' for a top-level array, '/properties/claims' for the claims list of an object) as it goes.
+        Item counts (minItems/maxItems) are checked when the stream ends. The first violation raises
+        SchemaViolation, unless a violations list is passed to collect them in instead.
+        """
+        schema = self._compiler.resolve(_pointer(self.schema, pointer)) if pointer else self._compiler.resolve(self.schema)
+        item_check = self._compiler.compile(schema.get('items', True))
+        prefix = [self._compiler.compile(item) for item in schema.get('prefixItems', [])]
+        base = None
+        for key in pointer.strip('/').split('/')[1::2]:  # the names between the 'properties' steps
+            base = (base, key)
+        errors: List[str] = [] if violations is None else violations
+        count = 0
+        for item in items:
+            (prefix[count] if count < len(prefix) else item_check)(item, (base, count), errors)
+            if errors and violations is None:
+                raise SchemaViolation(context, errors, self.max_errors)
+            count += 1
+            yield item
+        _check_count(schema, count, base, errors)
+        if errors and violations is None:
+            raise SchemaViolation(context, errors, self.max_errors)
+
+
+class SchemaRegistry:
+    """Schemas per endpoint, compiled on first use and again only when their file changes"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or Config.API_SCHEMA_DIR)
+        self._validators: Dict[str, Tuple[Optional[Tuple[int, int]], Optional[SchemaValidator]]] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, method: str, url: str) -> Path:
+        return self.directory / f"{normalize_endpoint(url).strip('/') or 'index'}.{method.upper()}.json"
+
+    def for_endpoint(self, method: str, url: str) -> Optional[SchemaValidator]:
+        """The validator of an endpoint, or None when it has no schema"""
+        path = self.path_for(method, url)
+        try:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            version = None
+        cached = self._validators.get(str(path))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        validator = compile_schema(json.loads(path.read_text())) if version else None
+        with self._lock:
+            self._validators[str(path)] = (version, validator)
+        return validator
+
+
+_compiled: Dict[str, SchemaValidator] = {}
+
+
+def compile_schema(schema: Dict[str, Any]) -> SchemaValidator:
+    """A validator for the schema, compiled once per distinct schema content"""
+    digest = hashlib.sha1(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+    validator = _compiled.get(digest)
+    if validator is None:
+        validator = _compiled[digest] = SchemaValidator(schema)
+    return validator
+
+
+def format_violations(context: str, violations: List[str], max_errors: Optional[int] = None) -> str:
+    """'GET /api/home violates its schema (2):' followed by one indented line per violation"""
+    limit = Config.API_SCHEMA_MAX_ERRORS if max_errors is None else max_errors
+    lines = [f"{context} violates its schema ({len(violations)}):"] + [f"  {v}" for v in violations[:limit]]
+    if len(violations) > limit:
+        lines.append(f"  ... and {len(violations) - limit} more")
+    return "\n".join(lines)
+
+
+def format_path(path: Any) -> str:
+    """'$.claims[3].status' from the (parent, key) chain built while walking a payload"""
+    keys = []
+    while path is not None:
+        path, key = path
+        keys.append(key)
+    return '$' + ''.join(f"[{key}]" if isinstance(key, int) else f".{key}" for key in reversed(keys))
+
+
+class _Compiler:
+    def __init__(self, root: Dict[str, Any]):
+        self.root = root
+        self._refs: Dict[str, List[Check]] = {}
+
+    def resolve(self, schema: Any) -> Any:
+        while isinstance(schema, dict) and '$ref' in schema:
+            schema = _pointer(self.root, schema['$ref'].lstrip('#'))
+        return schema
+
+    def compile(self, schema: Any) -> Check:
+        if schema is True or schema == {}:
+            return _accept
+        if schema is False:
+            return lambda value, path, errors: errors.append(f"{format_path(path)}: no value is allowed here")
+        if '$ref' in schema:
+            return self._ref(schema['$ref'])
+
+        checks: List[Check] = []
+        types = schema.get('type')
+        if types is not None:
+            names = [types] if isinstance(types, str) else list(types)
+            if schema.get('nullable') and 'null' not in names:
+                names.append('null')
+            checks.append(_type_check(names))
+        if 'enum' in schema:
+            checks.append(_enum_check(schema['enum']))
+        if 'const' in schema:
+            checks.append(_enum_check([schema['const']]))
+        checks += self._object_checks(schema) + self._array_checks(schema) + _string_checks(schema) + _number_checks(schema)
+        checks += self._combinators(schema)
+
+        if not checks:
+            return _accept
+        if len(checks) == 1:
+            return checks[0]
+        if len(checks) == 2:  # the usual type plus one constraint, without the loop
+            first, second = checks
+
+            def check_both(value: Any, path: Any, errors: List[str]) -> None:
+                first(value, path, errors)
+                second(value, path, errors)
+            return check_both
+
+        def check_all(value: Any, path: Any, errors: List[str]) -> None:
+            for check in checks:
+                check(value, path, errors)
+        return check_all
+
+    def _ref(self, ref: str) -> Check:
+        """Compile a $ref once; recursive schemas refer to themselves through the slot"""
+        if ref not in self._refs:
+            slot: List[Check] = []
+            self._refs[ref] = slot
+            slot.append(self.compile(_pointer(self.root, ref.lstrip('#'))))
+        slot = self._refs[ref]
+
+        def check_ref(value: Any, path: Any, errors: List[str]) -> None:
+            slot[0](value, path, errors)
+        return check_ref
+
+    def _object_checks(self, schema: Dict[str, Any]) -> List[Check]:
+        properties = {name: self.compile(sub) for name, sub in schema.get('properties', {}).items()}
+        patterns = [(re.compile(pattern), self.compile(sub)) for pattern, sub in schema.get('patternProperties', {}).items()]
+        required = list(schema.get('required', []))
+        additional = schema.get('additionalProperties', True)
+        additional_check = None if additional is True else self.compile(additional) if additional else False
+        min_properties, max_properties = schema.get('minProperties'), schema.get('maxProperties')
+        if not (properties or patterns or required or additional_check is not None
+                or min_properties is not None or max_properties is not None):
+            return []
+        property_items = list(properties.items())
+
+        def check_object(value: Any, path: Any, errors: List[str]) -> None:
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    errors.append(f"{format_path(path)}: missing required property '{name}'")
+            for name, check in property_items:
+                if name in value:
+                    check(value[name], (path, name), errors)
+            if patterns or additional_check is not None:
+                for name, item in value.items():
+                    matched = name in properties
+                    for pattern, check in patterns:
+                        if pattern.search(name):
+                            matched = True
+                            check(item, (path, name), errors)
+                    if not matched and additional_check is False:
+                        errors.append(f"{format_path(path)}: unexpected property '{name}'")
+                    elif not matched and additional_check is not None:
+                        additional_check(item, (path, name), errors)
+            if min_properties is not None and len(value) < min_properties:
+                errors.append(f"{format_path(path)}: {len(value)} properties, fewer than minProperties {min_properties}")
+            if max_properties is not None and len(value) > max_properties:
+                errors.append(f"{format_path(path)}: {len(value)} properties, more than maxProperties {max_properties}")
+        return [check_object]
+
+    def _array_checks(self, schema: Dict[str, Any]) -> List[Check]:
+        items = schema.get('items', True)
+        if isinstance(items, list):  # draft 4-7 tuple form
+            prefix, items = [self.compile(item) for item in items], schema.get('additionalItems', True)
+        else:
+            prefix = [self.compile(item) for item in schema.get('prefixItems', [])]
+        item_check = self.compile(items)
+        unique = schema.get('uniqueItems', False)
+        counted = 'minItems' in schema or 'maxItems' in schema
+        if item_check is _accept and not (prefix or unique or counted):
+            return []
+
+        def check_array(value: Any, path: Any, errors: List[str]) -> None:
+            if not isinstance(value, list):
+                return
+            for index, check in enumerate(prefix[:len(value)]):
+                check(value[index], (path, index), errors)
+            if item_check is not _accept:
+                for index in range(len(prefix), len(value)):
+                    item_check(value[index], (path, index), errors)
+            if counted:
+                _check_count(schema, len(value), path, errors)
+            if unique:
+                seen = set()
+                for item in value:
+                    marker = json.dumps(item, sort_keys=True)
+                    if marker in seen:
+                        errors.append(f"{format_path(path)}: items are not unique")
+                        break
+                    seen.add(marker)
+        return [check_array]
+
+    def _combinators(self, schema: Dict[str, Any]) -> List[Check]:
+        checks: List[Check] = []
+        for sub in schema.get('allOf', []):
+            checks.append(self.compile(sub))
+        for keyword in ('anyOf', 'oneOf'):
+            if keyword in schema:
+                checks.append(_options_check(keyword, [self.compile(sub) for sub in schema[keyword]]))
+        if 'not' in schema:
+            negated = self.compile(schema['not'])
+
+            def check_not(value: Any, path: Any, errors: List[str]) -> None:
+                if _passes(negated, value, path):
+                    errors.append(f"{format_path(path)}: must not match the 'not' schema")
+            checks.append(check_not)
+        return checks
+
+
+def _options_check(keyword: str, options: List[Check]) -> Check:
+    """anyOf: at least one option passes; oneOf: exactly one does"""
+    def check_options(value: Any, path: Any, errors: List[str]) -> None:
+        matches = sum(1 for option in options if _passes(option, value, path))
+        if matches == 0:
+            errors.append(f"{format_path(path)}: matches none of the {keyword} schemas")
+        elif keyword == 'oneOf' and matches > 1:
+            errors.append(f"{format_path(path)}: matches {matches} of the oneOf schemas, expected exactly one")
+    return check_options
+
+
+def _accept(value: Any, path: Any, errors: List[str]) -> None:
+    pass
+
+
+def _passes(check: Check, value: Any, path: Any) -> bool:
+    errors: List[str] = []
+    check(value, path, errors)
+    return not errors
+
+
+def _type_check(names: List[str]) -> Check:
+    # One isinstance() call per value; bool (an int subclass) and non-integral floats are the exceptions
+    python_types = tuple({'object': dict, 'array': list, 'string': str, 'integer': (int, float), 'number': (int, float),
+                          'boolean': bool, 'null': type(None)}[name] for name in names)
+    python_types = tuple(t for group in python_types for t in (group if isinstance(group, tuple) else (group,)))
+    reject_bool = 'boolean' not in names
+    integral_only = 'integer' in names and 'number' not in names
+    expected = ' or '.join(names)
+
+    def check_type(value: Any, path: Any, errors: List[str]) -> None:
+        if isinstance(value, python_types):
+            kind = value.__class__
+            if not ((kind is bool and reject_bool) or (kind is float and integral_only and not value.is_integer())):
+                return
+        errors.append(f"{format_path(path)}: expected {expected}, got {_json_type(value)}")
+    return check_type
+
+
+def _enum_check(allowed: List[Any]) -> Check:
+    # bool is an int in Python, so True would otherwise equal 1
+    keys = {(type(item) is bool, json.dumps(item, sort_keys=True)) for item in allowed}
+    shown = ', '.join(json.dumps(item) for item in allowed[:5]) + (', ...' if len(allowed) > 5 else '')
+
+    def check_enum(value: Any, path: Any, errors: List[str]) -> None:
+        if (type(value) is bool, json.dumps(value, sort_keys=True)) not in keys:
+            errors.append(f"{format_path(path)}: {_short(value)} is not one of {shown}")
+    return check_enum
+
+
+def _string_checks(schema: Dict[str, Any]) -> List[Check]:
+    min_length, max_length = schema.get('minLength'), schema.get('maxLength')
+    pattern = re.compile(schema['pattern']) if 'pattern' in schema else None
+    format_pattern = _FORMATS.get(schema.get('format', ''))
+    if min_length is None and max_length is None and pattern is None and format_pattern is None:
+        return []
+
+    def check_string(value: Any, path: Any, errors: List[str]) -> None:
+        if not isinstance(value, str):
+            return
+        if min_length is not None and len(value) < min_length:
+            errors.append(f"{format_path(path)}: {_short(value)} is shorter than minLength {min_length}")
+        if max_length is not None and len(value) > max_length:
+            errors.append(f"{format_path(path)}: {_short(value)} is longer than maxLength {max_length}")
+        if pattern is not None and not pattern.search(value):
+            errors.append(f"{format_path(path)}: {_short(value)} does not match {pattern.pattern}")
+        if format_pattern is not None and not format_pattern.match(value):
+            errors.append(f"{format_path(path)}: {_short(value)} is not a valid {schema['format']}")
+    return [check_string]
+
+
+def _number_checks(schema: Dict[str, Any]) -> List[Check]:
+    minimum, maximum = _bound(schema, 'minimum'), _bound(schema, 'maximum')
+    exclusive_minimum, exclusive_maximum = _bound(schema, 'exclusiveMinimum'), _bound(schema, 'exclusiveMaximum')
+    multiple_of = schema.get('multipleOf')
+    if minimum is maximum is exclusive_minimum is exclusive_maximum is multiple_of is None:
+        return []
+
+    def check_number(value: Any, path: Any, errors: List[str]) -> None:
+        if not isinstance(value, (int, float)) or value.__class__ is bool:
+            return
+        if minimum is not None and value < minimum:
+            errors.append(f"{format_path(path)}: {value} is less than minimum {minimum}")
+        if maximum is not None and value > maximum:
+            errors.append(f"{format_path(path)}: {value} is greater than maximum {maximum}")
+        if exclusive_minimum is not None and value <= exclusive_minimum:
+            errors.append(f"{format_path(path)}: {value} is not greater than exclusiveMinimum {exclusive_minimum}")
+        if exclusive_maximum is not None and value >= exclusive_maximum:
+            errors.append(f"{format_path(path)}: {value} is not less than exclusiveMaximum {exclusive_maximum}")
+        if multiple_of is not None and not _is_multiple(value, multiple_of):
+            errors.append(f"{format_path(path)}: {value} is not a multiple of {multiple_of}")
+    return [check_number]
+
+
+def _is_multiple(value: float, multiple_of: float) -> bool:
+    # Binary floats make 19.99 / 0.01 come out as 1998.9999999999998, so allow a relative tolerance
+    quotient = value / multiple_of
+    return abs(quotient - round(quotient)) <= 1e-9 * max(1.0, abs(quotient))
+
+
+def _bound(schema: Dict[str, Any], keyword: str) -> Optional[float]:
+    # Draft 4 spells exclusive bounds as booleans next to minimum/maximum; only numeric bounds are enforced
+    bound = schema.get(keyword)
+    return bound if isinstance(bound, (int, float)) and not isinstance(bound, bool) else None
+
+
+def _check_count(schema: Dict[str, Any], count: int, path: Any, errors: List[str]) -> None:
+    if 'minItems' in schema and count < schema['minItems']:
+        errors.append(f"{format_path(path)}: {count} items, fewer than minItems {schema['minItems']}")
+    if 'maxItems' in schema and count > schema['maxItems']:
+        errors.append(f"{format_path(path)}: {count} items, more than maxItems {schema['maxItems']}")
+
+
+def _pointer(document: Any, pointer: str) -> Any:
+    for part in pointer.strip('/').split('/') if pointer.strip('/') else []:
+        part = part.replace('~1', '/').replace('~0', '~')
+        document = document[int(part)] if isinstance(document, list) else document[part]
+    return document
+
+
+def _json_type(value: Any) -> str:
+    for name in ('null', 'boolean', 'integer', 'number', 'string', 'array', 'object'):
+        if _TYPES[name](value):
+            return name
+    return type(value).__name__
+
+
+def _short(value: Any, limit: int = 40) -> str:
+    text = json.dumps(value)
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+# Shared by every API client of this process
+schema_registry = SchemaRegistry()
@@ -1,19 +1,172 @@
 from faker import Faker
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterator, List, Any, Optional, Sequence, Union
 import json
 import os
 from datetime import datetime, timedelta
+import numpy as np
+from utils.id_allocator import IdAllocator, shared_allocator
+
+# Distinct values drawn once per generator for each pooled field of the batch methods
+POOL_SIZE = 512
+PRODUCT_CATEGORIES = ['Electronics', 'Clothing', 'Books', 'Home', 'Sports']
+ORDER_STATUSES = ['pending', 'processing', 'shipped', 'delivered']
+# Length of the IDs of each kind of record: split over workers x TEST_DATA_ID_RUN_SLOTS partitions, each
+# partition must still hold every ID a run draws (an order batch takes up to five products per order)
+ID_DIGITS = {'user': 8, 'product': 8, 'order': 10}
+
+Column = Union[Sequence[Any], Callable[[int], Any]]
+
+
+class RecordBatch:
+    """
+    Columnar records: one list per field, rows built as dicts only when they are read. Dotted column
+    names become nested dicts ('address.city'), and a column may be a function of the row index for
+    values that are only worth building on demand (order items).
+    """
+
+    def __init__(self, columns: Dict[str, Column], size: int):
+        self.columns = columns
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        row: Dict[str, Any] = {}
+        for name, column in self.columns.items():
+            value = column(index) if callable(column) else column[index]
+            *parents, key = name.split('.')
+            target = row
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[key] = value
+        return row
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.size):
+            yield self[index]
+
+    def column(self, name: str) -> List[Any]:
+        column = self.columns[name]
+        return [column(index) for index in range(self.size)] if callable(column) else list(column)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self)
+
 
 class TestDataGenerator:
+    __test__ = False  # not a test class, despite the name pytest collects
+
     def __init__(self, locale: str = 'en_US', seed: Optional[int] = None):
         self.fake = Faker(locale)
         if seed is not None:
             Faker.seed(seed)
-            
+        # Batch methods draw from numpy and from value pools built once with their own Faker
+        self.rng = np.random.default_rng(seed)
+        self._pool_fake = Faker(locale)
+        self._pool_fake.seed_instance(seed)
+        self._pools: Dict[str, List[str]] = {}
+        # IDs never collide across xdist workers and runs; seeded generators keep their own, reproducible counters
+        # while unseeded ones share the process's, so two generators in a test don't collide either
+        self.ids = {name: shared_allocator(name, digits) if seed is None else IdAllocator(name, digits, seed=seed)
+                    for name, digits in ID_DIGITS.items()}
+
+    def _pool(self, name: str, make: Callable[[Faker], str], size: int = POOL_SIZE) -> np.ndarray:
+        """Values of a Faker field drawn once, then sampled by index"""
+        if name not in self._pools:
+            self._pools[name] = np.array([make(self._pool_fake) for _ in range(size)], dtype=object)
+        return self._pools[name]
+
+    def _choose(self, name: str, make: Callable[[Faker], str], n: int) -> List[str]:
+        pool = self._pool(name, make)
+        return pool[self.rng.integers(0, len(pool), n)].tolist()
+
+    def _timestamps_this_year(self, n: int) -> List[str]:
+        # Up to the start of today rather than now, so a seeded batch is the same all day
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today.replace(month=1, day=1)
+        seconds = self.rng.integers(0, max(1, int((today - start).total_seconds())), n)
+        return (np.datetime64(start, 's') + seconds.astype('timedelta64[s]')).astype(str).tolist()
+
+    def generate_users(self, n: int, include_address: bool = False) -> RecordBatch:
+        """n users shaped like generate_user(), drawn in bulk; ids come from the generator's ID allocator"""
+        first = self._choose('first_name', lambda fake: fake.first_name(), n)
+        last = self._choose('last_name', lambda fake: fake.last_name(), n)
+        suffixes = self.rng.integers(0, 1000, n).tolist()
+        domains = self._choose('free_email_domain', lambda fake: fake.free_email_domain(), n)
+        usernames = [f"{f.lower()}.{l.lower()}{s}" for f, l, s in zip(first, last, suffixes)]
+        area, exchange, line = (self.rng.integers(low, high, n).tolist()
+                                for low, high in ((200, 1000), (200, 1000), (0, 10000)))
+        columns: Dict[str, Column] = {
+            'id': self.ids['user'].take(n),
+            'username': usernames,
+            'email': [f"{username}@{domain}" for username, domain in zip(usernames, domains)],
+            'first_name': first,
+            'last_name': last,
+            'phone': [f"{a}-{e}-{l:04d}" for a, e, l in zip(area, exchange, line)],
+            'created_at': self._timestamps_this_year(n),
+        }
+        if include_address:
+            columns.update({
+                'address.street': self._choose('street_address', lambda fake: fake.street_address(), n),
+                'address.city': self._choose('city', lambda fake: fake.city(), n),
+                'address.state': self._choose('state', lambda fake: fake.state(), n),
+                'address.country': self._choose('country', lambda fake: fake.country(), n),
+                'address.postcode': self._choose('postcode', lambda fake: fake.postcode(), n),
+            })
+        return RecordBatch(columns, n)
+
+    def generate_products(self, n: int) -> RecordBatch:
+        """n products shaped like generate_product(), drawn in bulk; ids come from the generator's ID allocator"""
+        return RecordBatch({
+            'id': self.ids['product'].take(n),
+            'name': self._choose('catch_phrase', lambda fake: fake.catch_phrase(), n),
+            'description': self._choose('description', lambda fake: fake.text(max_nb_chars=200), n),
+            'price': (self.rng.integers(0, 10000, n) / 100).tolist(),
+            'category': np.array(PRODUCT_CATEGORIES, dtype=object)[self.rng.integers(0, len(PRODUCT_CATEGORIES), n)].tolist(),
+            'stock': self.rng.integers(0, 1001, n).tolist(),
+            'rating': np.round(self.rng.uniform(1, 5, n), 1).tolist(),
+            'created_at': self._timestamps_this_year(n),
+        }, n)
+
+    def generate_orders(self, n: int, num_items: Optional[int] = None) -> RecordBatch:
+        """
+        n orders shaped like generate_order(), drawn in bulk. Line items are drawn as one product batch
+        for all orders; each order's items list is built when its row is read.
+        """
+        counts = np.full(n, num_items) if num_items is not None else self.rng.integers(1, 6, n)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        products = self.generate_products(int(offsets[-1]))
+        product_ids, names, prices = (products.columns[name] for name in ('id', 'name', 'price'))
+        quantities = self.rng.integers(1, 6, int(offsets[-1]))
+        line_totals = np.asarray(prices, dtype=float) * quantities
+        totals = np.zeros(n)
+        np.add.at(totals, np.repeat(np.arange(n), counts), line_totals)
+        quantities, line_totals, offsets = quantities.tolist(), line_totals.tolist(), offsets.tolist()
+
+        def items(index: int) -> List[Dict[str, Any]]:
+            return [{'product_id': product_ids[i], 'product_name': names[i], 'quantity': quantities[i],
+                     'unit_price': prices[i], 'total': line_totals[i]}
+                    for i in range(offsets[index], offsets[index + 1])]
+
+        return RecordBatch({
+            'id': self.ids['order'].take(n),
+            'user_id': self.ids['user'].take(n),
+            'items': items,
+            'total': np.round(totals, 2).tolist(),
+            'status': np.array(ORDER_STATUSES, dtype=object)[self.rng.integers(0, len(ORDER_STATUSES), n)].tolist(),
+            'created_at': self._timestamps_this_year(n),
+        }, n)
+
+    
     def generate_user(self, include_address: bool = False) -> Dict[str, Any]:
         """Generate random user data"""
         user = {
-            'id': self.fake.unique.random_number(digits=6),
+            'id': self.ids['user'].next(),
             'username': self.fake.user_name(),
             'email': self.fake.email(),
             'first_name': self.fake.first_name(),
@@ -36,7 +189,7 @@ class TestDataGenerator:
     def generate_product(self) -> Dict[str, Any]:
         """Generate random product data"""
         return {
-            'id': self.fake.unique.random_number(digits=6),
+            'id': self.ids['product'].next(),
             'name': self.fake.catch_phrase(),
             'description': self.fake.text(max_nb_chars=200),
             'price': round(self.fake.random_number(4) / 100, 2),
@@ -70,8 +223,8 @@ class TestDataGenerator:
             total += item_total
         
         return {
-            'id': self.fake.unique.random_number(digits=8),
-            'user_id': self.fake.unique.random_number(digits=6),
+            'id': self.ids['order'].next(),
+            'user_id': self.ids['user'].next(),
             'items': items,
             'total': round(total, 2),
             'status': self.fake.random_element(['pending', 'processing', 'shipped', 'delivered']),
@@ -1,37 +1,91 @@
+import atexit
+import hashlib
+import itertools
+import json
 import logging
 import os
+import re
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import Tuple
-from PIL import Image, ImageChops
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from PIL import Image, ImageChops, ImageOps
+from config.config import Config
+from page_objects.base_page import BasePage
+from utils.baseline_store import BaselineStore
+from utils.file_lock import FileLock, atomic_write
+from utils.visual_report import VisualReport
 
 logger = logging.getLogger(__name__)
 
-class VisualComparison:
-    def __init__(self, baseline_dir: str, diff_dir: str):
-        self.baseline_dir = Path(baseline_dir)
-        self.diff_dir = Path(diff_dir)
-        self.baseline_dir.mkdir(parents=True, exist_ok=True)
-        self.diff_dir.mkdir(parents=True, exist_ok=True)
+# Serializes an element subtree in a single round trip: markup, computed styles, box,
+# plus the font and image state that can change rendering without touching the DOM
+ELEMENT_FINGERPRINT_SCRIPT = """
+(root) => {
+    const styleOf = (el) => {
+        const style = getComputedStyle(el);
+        const parts = [];
+        for (let i = 0; i < style.length; i++) {
+            parts.push(style[i] + ':' + style.getPropertyValue(style[i]));
+        }
+        return parts.join(';');
+    };
+    const rect = root.getBoundingClientRect();
+    const fonts = [];
+    document.fonts.forEach(f => fonts.push([f.family, f.weight, f.style, f.status].join(' ')));
+    const images = Array.from(root.querySelectorAll('img')).concat(root.tagName === 'IMG' ? [root] : [])
+        .map(img => [img.currentSrc, img.complete, img.naturalWidth, img.naturalHeight].join(' '));
+    return JSON.stringify({
+        html: root.outerHTML,
+        styles: [root, ...root.querySelectorAll('*')].map(styleOf),
+        box: [rect.x, rect.y, rect.width, rect.height, window.devicePixelRatio],
+        fonts: [document.fonts.status, fonts.sort()],
+        images: images
+    });
+}
+"""
 
-    def compare_screenshots(self, actual_screenshot: bytes, screenshot_name: str) -> Tuple[bool, str]:
-        baseline_path = self.baseline_dir / f"{screenshot_name}.png"
-        diff_path = self.diff_dir / f"{screenshot_name}_diff.png"
-        actual_path = self.diff_dir / f"{screenshot_name}_actual.png"
+# One comparison pool per process (i.e. per xdist worker), shared by all tests it runs
+_comparison_pool: Optional[ProcessPoolExecutor] = None
 
-        # Save actual screenshot
-        with open(actual_path, "wb") as f:
-            f.write(actual_screenshot)
+# Soft checks deferred to the end of the session: (test_id, screenshot_name, future)
+_soft_checks: List[Tuple[str, str, Future]] = []
 
-        # If baseline doesn't exist, create it
-        if not baseline_path.exists():
-            logger.info(f"Creating baseline image: {baseline_path}")
-            with open(baseline_path, "wb") as f:
-                f.write(actual_screenshot)
-            return True, "Baseline created"
+# Every submission writes its own actual/diff/heatmap images, <name>.<pid>-<n>_<kind>.png, so comparisons
+# of the same name still running in the pool never see each other's files
+_submission_numbers = itertools.count(1)
+SUBMISSION_IMAGE = re.compile(r"^(?P<name>.+)\.\d+-\d+_(?P<kind>actual|diff|heatmap)\.png$")
 
-        # Compare images
-        actual_image = Image.open(actual_path)
-        baseline_image = Image.open(baseline_path)
+
+def get_comparison_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Return the process pool shared by all comparisons in this worker, creating it on first use"""
+    global _comparison_pool
+    if _comparison_pool is None:
+        _comparison_pool = ProcessPoolExecutor(max_workers=max_workers or Config.VISUAL_POOL_WORKERS)
+        atexit.register(shutdown_comparison_pool)
+        logger.info(f"Started visual comparison pool with {_comparison_pool._max_workers} processes")
+    return _comparison_pool
+
+
+def shutdown_comparison_pool() -> None:
+    """Wait for outstanding comparisons and stop the shared process pool"""
+    global _comparison_pool
+    if _comparison_pool is not None:
+        _comparison_pool.shutdown(wait=True)
+        _comparison_pool = None
+
+
+def compare_images(baseline_path: str, actual_path: str, diff_path: str,
+                   thumbnail_prefix: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Decode and diff two images on disk, saving a diff and heatmap image when they differ.
+    With a thumbnail_prefix, report thumbnails are rendered here as well so that all image
+    work stays off the browser thread. Kept at module level so it can be shipped to the process pool.
+    """
+    with Image.open(actual_path) as actual_image, Image.open(baseline_path) as baseline_image:
+        if thumbnail_prefix:
+            _save_thumbnail(baseline_image, f"{thumbnail_prefix}_baseline.png")
+            _save_thumbnail(actual_image, f"{thumbnail_prefix}_actual.png")
 
         if actual_image.size != baseline_image.size:
             logger.error(f"Size mismatch: Baseline {baseline_image.size} vs Actual {actual_image.size}")
@@ -39,16 +93,307 @@ class VisualComparison:
 
         diff = ImageChops.difference(actual_image, baseline_image)
         if diff.getbbox():
-            # Save diff image
             diff.save(diff_path)
+            heatmap = ImageOps.colorize(diff.convert("L").point(lambda value: min(255, value * 8)),
+                                        black="black", white="red")
+            heatmap.save(heatmap_path_for(diff_path))
+            if thumbnail_prefix:
+                _save_thumbnail(heatmap, f"{thumbnail_prefix}_heatmap.png")
             logger.error(f"Visual difference detected. Diff saved to: {diff_path}")
             return False, f"Visual difference detected. Check diff at {diff_path}"
 
-        return True, "Images match"
+    return True, "Images match"
+
+
+def heatmap_path_for(diff_path: str) -> str:
+    return diff_path[:-len("_diff.png")] + "_heatmap.png"
+
+
+def clear_submission_images(diff_dir: str) -> int:
+    """Remove the actual/diff/heatmap images of a previous run under diff_dir and its combo directories"""
+    removed = 0
+    for path in Path(diff_dir).glob("**/*.png"):
+        if SUBMISSION_IMAGE.match(path.name):
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def _save_thumbnail(image: Image.Image, path: str, size: Tuple[int, int] = (240, 240)) -> None:
+    thumbnail = image.copy()
+    thumbnail.thumbnail(size)
+    thumbnail.save(path)
+
+
+def element_fingerprint(locator: Any) -> str:
+    """Return a digest of the element's subtree, computed with one evaluate call"""
+    return hashlib.sha256(locator.evaluate(ELEMENT_FINGERPRINT_SCRIPT).encode()).hexdigest()
+
+
+def collect_soft_failures() -> Dict[str, List[str]]:
+    """Wait for all deferred soft checks and return failure messages grouped by test id"""
+    failures: Dict[str, List[str]] = {}
+    while _soft_checks:
+        test_id, screenshot_name, future = _soft_checks.pop(0)
+        match_result, message = _result_of(future)
+        if not match_result:
+            failures.setdefault(test_id, []).append(f"{screenshot_name}: {message}")
+    return failures
+
+
+class FingerprintCache:
+    """
+    Element fingerprints of matching baselines with their skip counters, shared by xdist workers.
+    Kept in a sidecar under reports/visual/ instead of the committed baseline index, so runs don't
+    rewrite it; an entry only counts while the baseline blob it was recorded against is current.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or Config.VISUAL_FINGERPRINT_PATH)
+        self._lock_path = f"{self.path}.lock"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._load().get(key)
+
+    def update(self, key: str, **fields: Any) -> None:
+        with FileLock(self._lock_path):
+            entries = self._load()
+            entries.setdefault(key, {}).update(fields)
+            atomic_write(str(self.path), json.dumps(entries, indent=2, sort_keys=True).encode())
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+def _then(future: Future, callback: Callable[[Future], None]) -> Future:
+    """
+    Return a future that completes only after callback has run on the finished future.
+    Plain done callbacks of pool futures may still be running when result() returns.
+    """
+    chained = Future()
+
+    def run(done: Future) -> None:
+        try:
+            callback(done)
+        except Exception as e:
+            logger.error(f"Visual comparison callback failed: {e}")
+        if done.exception() is not None:
+            chained.set_exception(done.exception())
+        else:
+            chained.set_result(done.result())
+
+    future.add_done_callback(run)
+    return chained
+
+
+def _result_of(future: Future) -> Tuple[bool, str]:
+    """Unwrap a comparison future, turning worker errors into a failed comparison"""
+    try:
+        return future.result()
+    except Exception as e:
+        return False, f"Comparison raised {type(e).__name__}: {e}"
+
+
+class VisualComparison:
+    def __init__(self, baseline_dir: str, diff_dir: str,
+                 pool_workers: Optional[int] = None, test_id: str = "",
+                 store: Optional[BaselineStore] = None, env: Optional[str] = None, combo: str = "default",
+                 report: Optional[VisualReport] = None, fingerprints: Optional[FingerprintCache] = None):
+        self.baseline_dir = Path(baseline_dir)
+        # With a baseline store, baselines are keyed by (env, combo, name) and
+        # actual/diff images are kept per combo so names from different combos don't collide
+        self.store = store
+        self.env = env or Config.ENV
+        self.combo = combo
+        self.diff_dir = Path(diff_dir) / combo if store else Path(diff_dir)
+        self.baseline_dir.mkdir(parents=True, exist_ok=True)
+        self.diff_dir.mkdir(parents=True, exist_ok=True)
+        # 0 workers compares inline on the calling thread
+        self.pool_workers = Config.VISUAL_POOL_WORKERS if pool_workers is None else pool_workers
+        self.test_id = test_id
+        self.report = report
+        self.fingerprints = fingerprints
+        self._pending: List[Tuple[str, Future]] = []
+
+    def compare_screenshots(self, actual_screenshot: bytes, screenshot_name: str) -> Tuple[bool, str]:
+        return _result_of(self._submit(actual_screenshot, screenshot_name))
+
+    def submit_comparison(self, actual_screenshot: bytes, screenshot_name: str, soft: bool = False) -> Future:
+        """
+        Queue a comparison and return immediately with its future.
+        Hard checks are asserted by assert_all_match() at test teardown,
+        soft checks by collect_soft_failures() at session end.
+        """
+        return self._register(self._submit(actual_screenshot, screenshot_name), screenshot_name, soft)
+
+    def _register(self, future: Future, screenshot_name: str, soft: bool) -> Future:
+        if soft:
+            _soft_checks.append((self.test_id, screenshot_name, future))
+        else:
+            self._pending.append((screenshot_name, future))
+        return future
+
+    def compare_element(self, locator: Any, screenshot_name: str, soft: bool = False) -> Future:
+        """
+        Queue a comparison of an element screenshot.
+        With VISUAL_FINGERPRINT enabled and a baseline store, the screenshot is skipped while the
+        element's fingerprint matches the one recorded when it last matched its baseline, except that
+        a capture is forced after VISUAL_FINGERPRINT_MAX_SKIPS skips or VISUAL_FINGERPRINT_MAX_AGE_HOURS.
+        A skip is collected and reported like any other comparison.
+        """
+        if not (Config.VISUAL_FINGERPRINT and self.store):
+            return self.submit_comparison(locator.screenshot(), screenshot_name, soft)
+
+        if self.fingerprints is None:
+            self.fingerprints = FingerprintCache()
+        key = self.store.key(self.env, self.combo, screenshot_name)
+        fingerprint = element_fingerprint(locator)
+        entry = self.store.get_entry(self.env, self.combo, screenshot_name)
+        cached = self.fingerprints.get(key)
+        if (entry and cached and cached.get("blob") == entry["blob"] and cached.get("fingerprint") == fingerprint
+                and not self._capture_due(cached)):
+            self.fingerprints.update(key, skips=cached.get("skips", 0) + 1)
+            logger.info(f"Fingerprint of {screenshot_name} unchanged, skipping screenshot")
+            future = self._report_when_done(self._completed((True, "Fingerprint unchanged")), None, screenshot_name,
+                                            {"baseline": os.fspath(self.store.blob_path(entry["blob"]))})
+            return self._register(future, screenshot_name, soft)
+
+        future = _then(self._submit(locator.screenshot(), screenshot_name),
+                       lambda done: self._record_fingerprint(done, screenshot_name, fingerprint))
+        return self._register(future, screenshot_name, soft)
+
+    def iter_variants(self, page: Any, variants: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Step an already loaded page through viewport/color-scheme variants without navigating again.
+        Each variant is a dict with a 'name' and optional 'viewport' and 'color_scheme'; a missing
+        viewport keeps the page's original one. The page has settled when each variant is yielded.
+        """
+        base_page = BasePage(page)
+        original_viewport = page.viewport_size
+        color_scheme = "null"
+        try:
+            for variant in variants:
+                viewport = variant.get("viewport") or original_viewport
+                if viewport and viewport != page.viewport_size:
+                    page.set_viewport_size(viewport)
+                if variant.get("color_scheme", "null") != color_scheme:
+                    color_scheme = variant.get("color_scheme", "null")
+                    page.emulate_media(color_scheme=color_scheme)
+                base_page.wait_for_layout_stable()
+                yield variant
+        finally:
+            if original_viewport and page.viewport_size != original_viewport:
+                page.set_viewport_size(original_viewport)
+            if color_scheme != "null":
+                page.emulate_media(color_scheme="null")
+
+    def capture_variants(self, page: Any, variants: List[Dict[str, Any]], soft: bool = False) -> Dict[str, Future]:
+        """Screenshot every variant of a loaded page and queue its comparison under the variant name"""
+        return {
+            variant["name"]: self.submit_comparison(page.screenshot(), variant["name"], soft)
+            for variant in self.iter_variants(page, variants)
+        }
+
+    @staticmethod
+    def _capture_due(cached: Dict[str, Any]) -> bool:
+        age_hours = (time.time() - cached.get("captured_at", 0)) / 3600
+        return (cached.get("skips", 0) >= Config.VISUAL_FINGERPRINT_MAX_SKIPS
+                or age_hours >= Config.VISUAL_FINGERPRINT_MAX_AGE_HOURS)
+
+    def _record_fingerprint(self, future: Future, screenshot_name: str, fingerprint: str) -> None:
+        """Remember the fingerprint only once the screenshot is known to match its baseline"""
+        match_result, _ = _result_of(future)
+        entry = self.store.get_entry(self.env, self.combo, screenshot_name)
+        if match_result and entry:
+            self.fingerprints.update(self.store.key(self.env, self.combo, screenshot_name), fingerprint=fingerprint,
+                                     blob=entry["blob"], captured_at=time.time(), skips=0)
+
+    def collect_results(self) -> List[Tuple[str, Tuple[bool, str]]]:
+        """
+        Wait for all pending hard checks of this instance and return (screenshot name, result) in
+        submission order; a name compared more than once appears once per comparison
+        """
+        results = []
+        while self._pending:
+            screenshot_name, future = self._pending.pop(0)
+            results.append((screenshot_name, _result_of(future)))
+        return results
+
+    def assert_all_match(self) -> None:
+        """Raise a single AssertionError listing every pending comparison that failed"""
+        failures = [f"{name}: {message}" for name, (match_result, message) in self.collect_results()
+                    if not match_result]
+        assert not failures, "Visual differences detected:\n" + "\n".join(failures)
+
+    def _submit(self, actual_screenshot: bytes, screenshot_name: str) -> Future:
+        baseline_path = self._baseline_path(screenshot_name)
+        submission = f"{screenshot_name}.{os.getpid()}-{next(_submission_numbers)}"
+        diff_path = self.diff_dir / f"{submission}_diff.png"
+        actual_path = self.diff_dir / f"{submission}_actual.png"
+
+        with open(actual_path, "wb") as f:
+            f.write(actual_screenshot)
+
+        # If baseline doesn't exist, create it
+        if baseline_path is None or not baseline_path.exists():
+            self.update_baseline(actual_screenshot, screenshot_name)
+            return self._report_when_done(self._completed((True, "Baseline created")), None, screenshot_name,
+                                          {"actual": os.fspath(actual_path)})
+
+        entry_id = self.report.new_entry_id() if self.report else None
+        args = (os.fspath(baseline_path), os.fspath(actual_path), os.fspath(diff_path),
+                self.report.thumbnail_prefix(entry_id) if self.report else None)
+        if self.pool_workers <= 0:
+            try:
+                future = self._completed(compare_images(*args))
+            except Exception as e:
+                future = Future()
+                future.set_exception(e)
+        else:
+            future = get_comparison_pool(self.pool_workers).submit(compare_images, *args)
+
+        return self._report_when_done(future, entry_id, screenshot_name, {
+            "baseline": args[0], "actual": args[1], "diff": args[2], "heatmap": heatmap_path_for(args[2])
+        })
+
+    def _report_when_done(self, future: Future, entry_id: Optional[str], screenshot_name: str,
+                          images: Dict[str, str]) -> Future:
+        """Write the report entry as soon as the comparison finishes"""
+        if not self.report:
+            return future
+
+        def add_entry(done: Future) -> None:
+            match_result, message = _result_of(done)
+            status = ("new" if message == "Baseline created" else "skipped" if message == "Fingerprint unchanged"
+                      else "passed" if match_result else "failed")
+            kinds = ("baseline", "actual") if match_result else tuple(images)
+            existing = {kind: images[kind] for kind in kinds if kind in images and os.path.exists(images[kind])}
+            self.report.add_entry(entry_id or self.report.new_entry_id(), self.test_id,
+                                  f"{self.combo}/{screenshot_name}", status, message, existing)
+
+        return _then(future, add_entry)
+
+    @staticmethod
+    def _completed(result: Tuple[bool, str]) -> Future:
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def _baseline_path(self, screenshot_name: str) -> Optional[Path]:
+        if self.store:
+            return self.store.get_path(self.env, self.combo, screenshot_name)
+        return self.baseline_dir / f"{screenshot_name}.png"
 
     def update_baseline(self, screenshot: bytes, screenshot_name: str) -> None:
         """Update or create baseline image"""
+        if self.store:
+            self.store.put(self.env, self.combo, screenshot_name, screenshot)
+            return
         baseline_path = self.baseline_dir / f"{screenshot_name}.png"
         with open(baseline_path, "wb") as f:
             f.write(screenshot)
-        logger.info(f"Updated baseline image: {baseline_path}")
\ No newline at end of file
+        logger.info(f"Updated baseline image: {baseline_path}")
@@ -0,0 +1,149 @@
+"""
+Incremental HTML report for visual comparisons
+
+Every xdist worker appends one JSON line per finished comparison to its own file, so workers never
+contend for the same file. Thumbnails are rendered next to the comparison (see compare_images) and
+full-size images are only linked, never inlined, so the merged index.html stays small and cheap to
+build no matter how many screenshots a run produces.
+
+Layout under the report directory:
+    entries/<worker>.jsonl        one entry per comparison
+    thumbs/<entry>_<kind>.png     baseline/actual/heatmap thumbnails
+    index.html                    merged report, rebuilt by build_index()
+"""
+import html
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from config.config import Config
+from utils.file_lock import atomic_write
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_KINDS = ("baseline", "actual", "heatmap")
+
+
+class VisualReport:
+    def __init__(self, report_dir: Optional[str] = None, worker_id: Optional[str] = None):
+        self.report_dir = Path(report_dir or Config.VISUAL_REPORT_DIR)
+        self.worker_id = worker_id or os.getenv("PYTEST_XDIST_WORKER", "main")
+        self.entries_dir = self.report_dir / "entries"
+        self.thumbs_dir = self.report_dir / "thumbs"
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+        self.thumbs_dir.mkdir(parents=True, exist_ok=True)
+        self._entries_path = self.entries_dir / f"{self.worker_id}.jsonl"
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def reset(self) -> None:
+        """Remove entries and thumbnails of a previous run"""
+        shutil.rmtree(self.entries_dir, ignore_errors=True)
+        shutil.rmtree(self.thumbs_dir, ignore_errors=True)
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+        self.thumbs_dir.mkdir(parents=True, exist_ok=True)
+
+    def new_entry_id(self) -> str:
+        """Return an id that is unique across workers, used to name the entry's thumbnails"""
+        with self._lock:
+            self._sequence += 1
+            return f"{self.worker_id}-{os.getpid()}-{self._sequence}"
+
+    def thumbnail_prefix(self, entry_id: str) -> str:
+        return str(self.thumbs_dir / entry_id)
+
+    def add_entry(self, entry_id: str, test_id: str, name: str, status: str, message: str,
+                  images: Dict[str, Optional[str]]) -> None:
+        """
+        Append a finished comparison. images maps baseline/actual/diff/heatmap to full-size paths;
+        thumbnails are picked up from thumbnail_prefix(entry_id) when they were rendered.
+        """
+        entry = {
+            "id": entry_id,
+            "test_id": test_id,
+            "name": name,
+            "status": status,
+            "message": message,
+            "time": time.time(),
+            "images": {kind: self._relative(path) for kind, path in images.items() if path},
+            "thumbs": {
+                kind: self._relative(f"{self.thumbnail_prefix(entry_id)}_{kind}.png")
+                for kind in THUMBNAIL_KINDS
+                if os.path.exists(f"{self.thumbnail_prefix(entry_id)}_{kind}.png")
+            },
+        }
+        line = json.dumps(entry) + "\n"
+        with self._lock, open(self._entries_path, "a") as f:
+            f.write(line)
+
+    def load_entries(self) -> List[Dict[str, Any]]:
+        """Read the entries of all workers, failures first"""
+        entries = []
+        for path in sorted(self.entries_dir.glob("*.jsonl")):
+            with open(path, "r") as f:
+                entries.extend(json.loads(line) for line in f if line.strip())
+        return sorted(entries, key=lambda entry: (entry["status"] != "failed", entry["test_id"], entry["time"]))
+
+    def build_index(self) -> Optional[str]:
+        """Merge all worker entries into index.html and return its path, or None if nothing was compared"""
+        entries = self.load_entries()
+        if not entries:
+            return None
+        failed = sum(1 for entry in entries if entry["status"] == "failed")
+        rows = "\n".join(self._render_entry(entry) for entry in entries)
+        page = _PAGE_TEMPLATE.format(total=len(entries), failed=failed, rows=rows)
+        index_path = self.report_dir / "index.html"
+        atomic_write(str(index_path), page.encode())
+        logger.info(f"Visual report with {len(entries)} comparisons ({failed} failed) written to {index_path}")
+        return str(index_path)
+
+    def _relative(self, path: str) -> str:
+        return Path(os.path.relpath(path, self.report_dir)).as_posix()
+
+    @staticmethod
+    def _render_entry(entry: Dict[str, Any]) -> str:
+        thumbs = "".join(
+            f'<figure><img loading="lazy" src="{html.escape(src)}" alt="{kind}"><figcaption>{kind}</figcaption></figure>'
+            for kind, src in entry["thumbs"].items()
+        )
+        links = " ".join(
+            f'<a href="{html.escape(src)}" target="_blank">{kind}</a>' for kind, src in entry["images"].items()
+        )
+        return (
+            f'<tr class="{entry["status"]}">'
+            f'<td>{html.escape(entry["name"])}<br><small>{html.escape(entry["test_id"])}</small></td>'
+            f'<td>{entry["status"]}<br><small>{html.escape(entry["message"])}</small></td>'
+            f'<td class="thumbs">{thumbs}</td><td>{links}</td></tr>'
+        )
+
+
+_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Visual Comparison Report</title>
+<style>
+body {{ font-family: sans-serif; margin: 1em; }}
+table {{ border-collapse: collapse; width: 100%; }}
+td {{ border-bottom: 1px solid #ddd; padding: 6px; vertical-align: top; }}
+tr.failed td:first-child {{ border-left: 4px solid #c62828; }}
+tr.passed td:first-child {{ border-left: 4px solid #2e7d32; }}
+tr.skipped td:first-child {{ border-left: 4px solid #9e9e9e; }}
+tr.new td:first-child {{ border-left: 4px solid #1565c0; }}
+figure {{ display: inline-block; margin: 0 6px 0 0; text-align: center; }}
+figure img {{ max-width: 240px; max-height: 240px; border: 1px solid #ccc; }}
+</style>
+</head>
+<body>
+<h1>Visual Comparison Report</h1>
+<p>{total} comparisons, {failed} failed</p>
+<table>
+{rows}
+</table>
+</body>
+</html>
+"""